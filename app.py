@@ -1,35 +1,391 @@
+import os
+from pathlib import Path
+from typing import IO
+
+import pandas as pd
 import streamlit as st
 
-from parser import parse_lprof
-from ui import render_func_summary, render_function_viewer, render_line_details
+from archive import ArchiveError, SourceArchive
+from cache import ParseCache, profiles_key
+from diagnostics import activate
+from jobs import CANCELLED, FAILED, ParseExecutor
+from packed import MAGIC, PackedFormatError, PackedProfile, is_packed
+from parser import ProfileError, open_lprof
+from source import SrcFilesDict, UploadedSources
+from tail import WatcherLease, WatcherPool
+from ui import (
+    LiveSettings,
+    enable_diagnostics,
+    live_controls,
+    overhead_controls,
+    profile_with_overhead,
+    render_diagnostics,
+    render_diff,
+    render_func_summary,
+    render_function_viewer,
+    render_line_details,
+    render_live_status,
+    render_memory_report,
+    render_parse_progress,
+    render_rollup,
+    render_run_stats,
+    runs_mean_profile,
+)
 
 st.set_page_config(page_title="LProf Viewer", layout="wide")
+
+activate(enable_diagnostics())
+
+
+@st.cache_resource
+def get_parse_cache() -> ParseCache:
+    """Общий для всех сессий кэш распарсенных профилей."""
+    return ParseCache()
+
+
+@st.cache_resource
+def get_parse_executor() -> ParseExecutor:
+    """Общий для всех сессий пул фонового разбора профилей."""
+    return ParseExecutor(get_parse_cache())
+
+
+@st.cache_resource
+def get_watcher_pool() -> WatcherPool:
+    """Общий для всех сессий пул наблюдателей живого режима."""
+    return WatcherPool()
+
+
+@st.cache_resource(scope="session", max_entries=1, on_release=WatcherLease.release)
+def get_watcher(pattern: str) -> WatcherLease:
+    """Ссылка сессии на общий наблюдатель за путём или glob.
+
+    Сессия держит не больше одной ссылки: смена пути, выключение живого
+    режима (get_watcher.clear()) и отключение сессии освобождают её,
+    и наблюдатель останавливается, когда на него не ссылается ни одна сессия.
+    """
+    return get_watcher_pool().acquire(pattern)
+
+
+@st.cache_resource(max_entries=8)
+def get_source_archive(file_id: str, _uploaded: IO[bytes]) -> SourceArchive:
+    """Оглавление загруженного архива исходников, общее для перезапусков и сессий.
+
+    Args:
+        file_id: идентификатор загрузки Streamlit (ключ кэша)
+        _uploaded: загруженный архив (не хэшируется)
+    """
+    return SourceArchive(_uploaded)
+
+
+@st.cache_resource(max_entries=8)
+def get_uploaded_sources(file_ids: tuple[str, ...], _uploaded: list) -> UploadedSources:
+    """Загруженные .py файлы, декодированные один раз на набор загрузок.
+
+    Args:
+        file_ids: идентификаторы загрузок Streamlit (ключ кэша)
+        _uploaded: загруженные файлы (не хэшируются)
+    """
+    return UploadedSources({f.name: f.getvalue() for f in _uploaded})
+
+
+@st.cache_resource(max_entries=4)
+def get_packed_upload(file_id: str, _uploaded: IO[bytes]) -> PackedProfile:
+    """Загруженный профиль .lpb поверх байтов загрузки, без копирования колонок."""
+    return PackedProfile(_uploaded.getvalue())
+
+
+@st.cache_resource(max_entries=4)
+def get_packed_path(path: str, mtime_ns: int, size: int) -> PackedProfile:
+    """Профиль .lpb на сервере через mmap; (mtime_ns, size) входят в ключ кэша."""
+    return PackedProfile.open(path)
+
+
+def open_packed(lprof_files: list, profile_path: str) -> PackedProfile | None:
+    """Возвращает PackedProfile, если на входе один профиль в формате .lpb.
+
+    Args:
+        lprof_files: загруженные файлы профиля
+        profile_path: путь к профилю на сервере
+
+    Returns:
+        PackedProfile или None для .lprof и нескольких файлов.
+    """
+    try:
+        if profile_path:
+            with open(profile_path, "rb") as f:
+                if not is_packed(f.read(len(MAGIC))):
+                    return None
+            stat = os.stat(profile_path)
+            return get_packed_path(profile_path, stat.st_mtime_ns, stat.st_size)
+
+        if len(lprof_files) == 1 and is_packed(lprof_files[0].getvalue()[: len(MAGIC)]):
+            return get_packed_upload(lprof_files[0].file_id, lprof_files[0])
+    except (OSError, PackedFormatError):
+        # ошибку формата уже показал основной разбор профиля
+        return None
+
+    return None
+
+
+def load_live_profile(live: LiveSettings) -> tuple[pd.DataFrame | None, str]:
+    """Берёт последний снимок живого профиля, не дожидаясь разбора.
+
+    Args:
+        live: настройки живого режима
+
+    Returns:
+        (DataFrame или None, пока файлы не прочитаны; ключ снимка).
+    """
+    try:
+        watcher = get_watcher(live.pattern).watcher
+    except RuntimeError as e:
+        st.error(str(e))
+        return None, ""
+    snapshot = watcher.snapshot()
+    st.session_state["live_version"] = snapshot.version
+
+    with st.sidebar:
+        render_live_status(watcher, live.refresh_s)
+
+    if snapshot.df is None:
+        st.info("📡 Ожидание .lprof файлов по пути из живого режима.")
+    return snapshot.df, snapshot.key
+
+
+def load_in_background(key: str, inputs: list, show_progress: bool = True) -> pd.DataFrame | None:
+    """Берёт профиль из кэша или разбирает его в общем фоновом пуле.
+
+    Пока разбор идёт, показывает прогресс с кнопкой отмены; страница
+    перезапускается, когда задача завершится. Ошибки и предупреждения
+    разбора показываются на странице.
+
+    Args:
+        key: хэш содержимого из profiles_key
+        inputs: загруженные .lprof/.lpb файлы или пути к ним на сервере
+        show_progress: показывать ли прогресс, пока разбор идёт
+
+    Returns:
+        DataFrame профиля или None, пока разбор не завершён или если ни один файл не прочитан.
+    """
+    executor = get_parse_executor()
+    job = executor.job(key)
+    if job is None:
+        df = get_parse_cache().get(key)
+        if df is not None:
+            return df
+        job = executor.submit(key, inputs)
+
+    if not job.finished:
+        if show_progress:
+            render_parse_progress(job, executor.queued_ahead(job))
+        return None
+
+    if job.state == FAILED:
+        st.error(job.error)
+        return None
+
+    if job.state == CANCELLED:
+        st.info("Разбор профиля отменён.")
+        if st.button("Запустить снова", key=f"restart_{key}"):
+            executor.submit(key, inputs, restart=True)
+            st.rerun()
+        return None
+
+    for message in job.messages:
+        st.warning(message)
+    return job.df
+
+
+def load_runs(uploaded_lprofs: list) -> list[pd.DataFrame] | None:
+    """Разбирает профили повторных прогонов по отдельности, без суммирования.
+
+    Все файлы ставятся в фоновый пул сразу, прогресс показывается
+    для первого ещё не разобранного. Непрочитанный файл пропускается.
+
+    Args:
+        uploaded_lprofs: загруженные профили прогонов
+
+    Returns:
+        DataFrame прогонов или None, пока не все файлы разобраны
+        или если прочитано меньше двух.
+    """
+    executor = get_parse_executor()
+    frames = []
+    pending = 0
+
+    for uploaded in uploaded_lprofs:
+        key = profiles_key([uploaded])
+        df = load_in_background(key, [uploaded], show_progress=not pending)
+        if df is not None:
+            frames.append(df)
+        elif (job := executor.job(key)) is not None and not job.finished:
+            pending += 1
+
+    if pending:
+        st.caption(f"Разобрано прогонов: {len(frames)} из {len(uploaded_lprofs)}")
+        return None
+    if len(frames) < 2:
+        st.warning("Для статистики по прогонам нужно хотя бы два прочитанных профиля.")
+        return None
+    return frames
+
+
+def load_profile_path(path: str) -> tuple[pd.DataFrame | None, str]:
+    """Читает профиль с диска сервера через mmap, кэш и фоновый пул.
+
+    Хэш содержимого пересчитывается только при смене (mtime, size) файла.
+
+    Args:
+        path: путь к .lprof на сервере
+
+    Returns:
+        (DataFrame или None, если файл не прочитан или ещё разбирается; ключ кэша).
+    """
+    try:
+        stat = os.stat(path)
+        signature = (path, stat.st_mtime_ns, stat.st_size)
+        known = st.session_state.get("profile_path_key")
+        if known is not None and known[0] == signature:
+            key = known[1]
+        else:
+            with open_lprof(path) as mapped:
+                key = profiles_key([mapped])
+            st.session_state["profile_path_key"] = (signature, key)
+    except OSError as e:
+        st.error(f"Не удалось открыть {path}: {e}")
+        return None, ""
+    except ProfileError as e:
+        st.error(str(e))
+        return None, ""
+
+    return load_in_background(key, [Path(path)]), key
+
+
 st.title("Аналитика lprof файлов профилировщика Python")
 
+input_mode = st.radio(
+    "Источник данных",
+    ["Загрузка файлов", "Путь на сервере"],
+    horizontal=True,
+    help="Путь на сервере не копирует профиль через браузер и не ограничен размером загрузки; "
+    "исходники читаются из каталога только для файлов, встречающихся в профиле.",
+)
+
+lprof_files: list = []
+src_files_uploaded: list = []
+src_archive_uploaded = None
+profile_path = ""
+source_root: str | None = None
+
 upload_cols = st.columns(2)
 
-with upload_cols[0]:
-    lprof_file = st.file_uploader("Загрузите .lprof файл", type="lprof")
+if input_mode == "Путь на сервере":
+    with upload_cols[0]:
+        profile_path = os.path.expanduser(st.text_input("Путь к .lprof или .lpb на сервере").strip())
 
-with upload_cols[1]:
-    src_files_uploaded = st.file_uploader(
-        "Загрузите исходники (.py файлы)", type="py", accept_multiple_files=True
+    with upload_cols[1]:
+        root_input = st.text_input("Каталог исходников на сервере (необязательно)").strip()
+
+    if root_input:
+        if Path(root_input).expanduser().is_dir():
+            source_root = os.path.expanduser(root_input)
+        else:
+            st.warning(f"Каталог исходников {root_input} не найден, код будет искаться по путям из профиля.")
+else:
+    with upload_cols[0]:
+        lprof_files = st.file_uploader(
+            "Загрузите .lprof или .lpb файлы (несколько — будут объединены)",
+            type=["lprof", "lpb"],
+            accept_multiple_files=True,
+        )
+
+    with upload_cols[1]:
+        src_files_uploaded = st.file_uploader(
+            "Загрузите исходники (.py файлы)", type="py", accept_multiple_files=True
+        )
+        src_archive_uploaded = st.file_uploader(
+            "…или архив исходников (.zip, .tar.gz)",
+            type=["zip", "tar", "gz", "tgz", "bz2", "xz"],
+            help="Из архива читается только оглавление; файлы распаковываются, "
+            "когда их код впервые нужен на странице.",
+        )
+
+with st.sidebar:
+    base_lprof_files = st.file_uploader(
+        "Базовый профиль для сравнения (до изменений)",
+        type=["lprof", "lpb"],
+        accept_multiple_files=True,
     )
 
-src_files: dict[str, list[str]] = {}
-if src_files_uploaded:
-    for f in src_files_uploaded:
-        src_files[f.name] = f.getvalue().decode("utf-8").splitlines()
+live = live_controls()
+overhead_s = overhead_controls()
 
+with st.sidebar:
+    runs_mode = st.toggle(
+        "📈 Повторные прогоны",
+        key="runs_mode",
+        disabled=len(lprof_files) < 2,
+        help="Загруженные профили — повторы одного и того же кода: вместо суммы показываются "
+        "средние по прогонам и разброс времени по строкам и функциям.",
+    )
+
+src_files: SrcFilesDict = {}
+if src_archive_uploaded is not None:
+    try:
+        src_files = get_source_archive(src_archive_uploaded.file_id, src_archive_uploaded)
+    except ArchiveError as e:
+        st.error(str(e))
+    if src_files_uploaded:
+        st.caption("Загружен архив исходников — отдельные .py файлы не используются.")
+elif src_files_uploaded:
+    src_files = get_uploaded_sources(tuple(f.file_id for f in src_files_uploaded), src_files_uploaded)
 
-if not lprof_file:
-    st.stop()
 
-df_profile = parse_lprof(lprof_file)
+if live is None:
+    # наблюдатель больше не нужен этой сессии
+    get_watcher.clear()
+
+run_frames: list[pd.DataFrame] | None = None
+if live is not None:
+    df_profile, profile_key = load_live_profile(live)
+elif profile_path:
+    df_profile, profile_key = load_profile_path(profile_path)
+elif runs_mode and len(lprof_files) >= 2:
+    run_frames = load_runs(lprof_files)
+    if run_frames is None:
+        st.stop()
+    profile_key = f"runs:{profiles_key(lprof_files)}"
+    df_profile = runs_mean_profile(run_frames, profile_key)
+elif lprof_files:
+    profile_key = profiles_key(lprof_files)
+    df_profile = load_in_background(profile_key, lprof_files)
+else:
+    st.stop()
 
 if df_profile is None or df_profile.empty:
     st.stop()
 
-func_summary = render_func_summary(df_profile)
-render_line_details(df_profile, src_files)
-render_function_viewer(df_profile, func_summary, src_files)
\ No newline at end of file
+packed = open_packed(lprof_files, profile_path) if live is None else None
+
+if overhead_s is not None:
+    profile_key = f"{profile_key}:overhead={overhead_s:.3e}"
+    df_profile = profile_with_overhead(df_profile, overhead_s, profile_key)
+    # сводка по оглавлению .lpb и срезы его колонок не знают исправленного времени
+    packed = None
+
+render_memory_report(df_profile, profile_key)
+func_summary = render_func_summary(df_profile, profile_key, packed)
+render_rollup(df_profile, src_files, profile_key, source_root)
+if run_frames is not None:
+    render_run_stats(run_frames, src_files, profile_key, source_root)
+render_line_details(df_profile, src_files, profile_key, source_root)
+render_function_viewer(df_profile, func_summary, src_files, profile_key, source_root, packed)
+
+if base_lprof_files:
+    base_key = profiles_key(base_lprof_files)
+    df_base = load_in_background(base_key, base_lprof_files)
+    if df_base is not None and not df_base.empty:
+        render_diff(df_base, df_profile, src_files, base_key, profile_key, source_root)
+
+with st.sidebar:
+    render_diagnostics()
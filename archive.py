@@ -0,0 +1,158 @@
+"""Архив исходников (zip, tar, tar.gz и т.п.) с ленивым чтением файлов."""
+
+import hashlib
+import io
+import sys
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Mapping
+from typing import IO
+
+from diagnostics import count, stage
+
+
+DEFAULT_LINES_BUDGET = 128 * 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """Файл не является поддерживаемым архивом."""
+
+
+def _member_key(name: str) -> str:
+    name = name.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name.lstrip("/")
+
+
+def _lines_size(lines: list[str]) -> int:
+    return sys.getsizeof(lines) + sum(map(sys.getsizeof, lines))
+
+
+class SourceArchive(Mapping[str, list[str]]):
+    """Исходники из одного архива как словарь {путь в архиве -> строки}.
+
+    При создании читается только оглавление архива: ключи — пути .py файлов,
+    поэтому SourceIndex и resolve_source_file сопоставляют с ними пути
+    из профиля так же, как с загруженными файлами. Файл распаковывается
+    и декодируется при первом обращении через get / [], декодированные
+    строки держатся в LRU-кэше, пока их суммарный размер не превышает
+    lines_budget. Объект можно разделять между сессиями.
+    """
+
+    def __init__(self, uploaded: IO[bytes], lines_budget: int = DEFAULT_LINES_BUDGET) -> None:
+        """Строит оглавление архива.
+
+        Args:
+            uploaded: файловый объект с содержимым zip или tar (в том числе .gz, .bz2, .xz)
+            lines_budget: максимальный суммарный размер декодированных строк, байт
+
+        Raises:
+            ArchiveError: если формат не распознан или архив повреждён
+        """
+        self.lines_budget = lines_budget
+
+        self._lock = threading.Lock()
+        self._lines: OrderedDict[str, tuple[list[str], int]] = OrderedDict()
+        self._lines_used = 0
+
+        uploaded.seek(0)
+        data = uploaded.read()
+        self.key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self._file = io.BytesIO(data)
+
+        with stage("archive.index"):
+            try:
+                if zipfile.is_zipfile(self._file):
+                    self._zip: zipfile.ZipFile | None = zipfile.ZipFile(self._file)
+                    self._tar: tarfile.TarFile | None = None
+                    members = {
+                        _member_key(info.filename): info
+                        for info in self._zip.infolist()
+                        if not info.is_dir() and info.filename.endswith(".py")
+                    }
+                else:
+                    self._file.seek(0)
+                    self._zip = None
+                    self._tar = tarfile.open(fileobj=self._file, mode="r:*")
+                    members = {
+                        _member_key(info.name): info
+                        for info in self._tar.getmembers()
+                        if info.isfile() and info.name.endswith(".py")
+                    }
+            except tarfile.ReadError as e:
+                raise ArchiveError("Архив исходников не распознан: ожидается zip или tar (.gz, .bz2, .xz).") from e
+            except (tarfile.TarError, zipfile.BadZipFile, EOFError, OSError) as e:
+                raise ArchiveError(f"Не удалось прочитать архив исходников: {e}") from e
+
+        self._members = members
+        count("archive.members", len(members))
+
+    def __getitem__(self, key: str) -> list[str]:
+        with self._lock:
+            entry = self._lines.get(key)
+            if entry is not None:
+                self._lines.move_to_end(key)
+                count("archive.cache_hits")
+                return entry[0]
+
+            info = self._members[key]
+            lines = self._read(info)
+            self._remember(key, lines)
+            return lines
+
+    def __contains__(self, key: object) -> bool:
+        # по оглавлению, без распаковки
+        return key in self._members
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._members)
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        """Распаковывает ещё не прочитанные файлы в порядке их следования в архиве.
+
+        Для сжатого tar это один проход вперёд по потоку вместо перемотки
+        к началу на каждый файл; для zip порядок не важен.
+
+        Args:
+            keys: ключи архива; незнакомые пропускаются
+        """
+        with self._lock:
+            pending = [(self._members[k], k) for k in set(keys) if k in self._members and k not in self._lines]
+            pending.sort(key=lambda item: self._offset(item[0]))
+            for info, key in pending:
+                self._remember(key, self._read(info))
+
+    @property
+    def lines_used(self) -> int:
+        """Суммарный размер декодированных строк в кэше, байт."""
+        return self._lines_used
+
+    def _offset(self, info: zipfile.ZipInfo | tarfile.TarInfo) -> int:
+        return info.offset_data if self._tar is not None else info.header_offset
+
+    def _read(self, info: zipfile.ZipInfo | tarfile.TarInfo) -> list[str]:
+        count("archive.members_read")
+        with stage("archive.extract"):
+            if self._zip is not None:
+                payload = self._zip.read(info)
+            else:
+                payload = self._tar.extractfile(info).read()
+        return payload.decode("utf-8", errors="replace").splitlines()
+
+    def _remember(self, key: str, lines: list[str]) -> None:
+        size = _lines_size(lines)
+        if size > self.lines_budget:
+            return
+
+        self._lines[key] = (lines, size)
+        self._lines_used += size
+
+        while self._lines_used > self.lines_budget:
+            _, (_, evicted_size) = self._lines.popitem(last=False)
+            self._lines_used -= evicted_size
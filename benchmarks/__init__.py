@@ -0,0 +1 @@
+"""Бенчмарки LProf Viewer. Запуск из корня проекта: python -m benchmarks.<имя>."""
@@ -0,0 +1,31 @@
+"""Сценарий для bench_interaction: та же раскладка секций, что в app.py, на синтетическом профиле."""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st  # noqa: E402
+
+from benchmarks._synthetic import as_file, make_lprof_bytes, make_sources  # noqa: E402
+from parser import parse_lprof  # noqa: E402
+from ui import render_func_summary, render_function_viewer, render_line_details  # noqa: E402
+
+
+N_LINES = int(os.environ.get("BENCH_LINES", "200000"))
+LINES_PER_FUNC = int(os.environ.get("BENCH_LINES_PER_FUNC", "2000"))
+
+
+@st.cache_resource
+def _data():
+    payload = make_lprof_bytes(N_LINES, lines_per_func=LINES_PER_FUNC)
+    return parse_lprof(as_file(payload)), make_sources(N_LINES, lines_per_func=LINES_PER_FUNC)
+
+
+df_profile, src_files = _data()
+profile_key = f"synthetic-{N_LINES}-{LINES_PER_FUNC}"
+
+func_summary = render_func_summary(df_profile, profile_key)
+render_line_details(df_profile, src_files, profile_key)
+render_function_viewer(df_profile, func_summary, src_files, profile_key)
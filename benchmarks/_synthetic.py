@@ -0,0 +1,257 @@
+"""Генерация синтетических данных профилирования для бенчмарков."""
+
+import io
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import numpy as np
+
+try:
+    from line_profiler import LineStats
+except ImportError:
+    LineStats = None
+
+
+HIT_DISTRIBUTIONS = ["uniform", "zipf", "lognormal"]
+
+# шаблоны строк тела функции; {v} — имя переменной, {j} — номер строки
+_STATEMENTS = [
+    "{v} = {v} * {j} + 1",
+    "{v} = min({v}, {j} * 1000)",
+    "items.append({v} % {j})",
+    "{v} = {v} if {v} > {j} else -{v}",
+    "total += len(items)",
+    "{v} = abs({v} - {j})",
+    "cache[{j}] = {v}",
+]
+
+
+def make_lprof_bytes(n_lines: int, lines_per_func: int = 50, n_files: int = 100, seed: int = 0) -> bytes:
+    """Создаёт pickle в формате LineStats с заданным числом строк.
+
+    Args:
+        n_lines: общее количество строк профиля
+        lines_per_func: количество строк в одной функции
+        n_files: количество различных файлов
+        seed: зерно генератора случайных чисел
+
+    Returns:
+        Байты, которые parse_lprof читает как .lprof.
+    """
+    rng = np.random.default_rng(seed)
+    timings = {}
+
+    n_funcs = max(1, n_lines // lines_per_func)
+    for i in range(n_funcs):
+        fn = f"/srv/app/pkg{i % n_files}/module_{i % n_files}.py"
+        start = 1 + (i // n_files) * (lines_per_func + 2)
+        hits = rng.integers(1, 10_000, lines_per_func)
+        times = hits * rng.integers(50, 5_000, lines_per_func)
+        timings[(fn, start, f"func_{i}")] = [
+            (start + 1 + j, int(h), int(t)) for j, (h, t) in enumerate(zip(hits, times))
+        ]
+
+    stats = SimpleNamespace(timings=timings, unit=1e-9)
+    return pickle.dumps(stats, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def make_sources(n_lines: int, lines_per_func: int = 50, n_files: int = 100) -> dict[str, list[str]]:
+    """Создаёт исходники, совпадающие по строкам с make_lprof_bytes.
+
+    Args:
+        n_lines: общее количество строк профиля
+        lines_per_func: количество строк в одной функции
+        n_files: количество различных файлов
+
+    Returns:
+        Словарь {путь -> строки файла} в формате src_files.
+    """
+    src_files: dict[str, list[str]] = {}
+
+    n_funcs = max(1, n_lines // lines_per_func)
+    for i in range(n_funcs):
+        fn = f"/srv/app/pkg{i % n_files}/module_{i % n_files}.py"
+        lines = src_files.setdefault(fn, [])
+        lines.append(f"def func_{i}(x):")
+        lines.extend(f"    x = x * {j} + 1" for j in range(lines_per_func))
+        lines.append("")
+
+    return src_files
+
+
+class SyntheticProfile(NamedTuple):
+    """Синтетический профиль и совпадающие с ним исходники."""
+
+    timings: dict[tuple[str, int, str], list[tuple[int, int, int]]]
+    sources: dict[str, list[str]]
+    unit: float = 1e-9
+
+
+def make_profile(
+    n_lines: int,
+    n_files: int = 100,
+    n_funcs: int | None = None,
+    hits: str = "zipf",
+    seed: int = 0,
+) -> SyntheticProfile:
+    """Создаёт профиль, похожий на настоящий, вместе с деревом исходников.
+
+    Длины функций распределены логнормально, часть функций — методы
+    классов (имя в профиле — qualname, как у line_profiler), часть —
+    с декоратором (start указывает на строку декоратора). Строки внутри
+    циклов получают кратно больше хитов, время строки — хиты, умноженные
+    на логнормальную стоимость хита. Комментарии в профиль не попадают.
+
+    Args:
+        n_lines: общее количество профилированных строк
+        n_files: количество файлов
+        n_funcs: количество функций, по умолчанию n_lines // 50
+        hits: распределение хитов по функциям, одно из HIT_DISTRIBUTIONS
+        seed: зерно генератора случайных чисел
+
+    Returns:
+        SyntheticProfile; sources — {путь -> строки файла}.
+
+    Raises:
+        ValueError: если hits не из HIT_DISTRIBUTIONS
+    """
+    if hits not in HIT_DISTRIBUTIONS:
+        raise ValueError(f"Неизвестное распределение хитов: {hits}")
+
+    rng = np.random.default_rng(seed)
+    n_funcs = max(1, min(n_funcs or n_lines // 50, n_lines))
+    n_files = max(1, min(n_files, n_funcs))
+
+    weights = rng.lognormal(0.0, 0.8, n_funcs)
+    lengths = 1 + rng.multinomial(n_lines - n_funcs, weights / weights.sum())
+    func_files = np.sort(rng.integers(0, n_files, n_funcs))
+    func_hits = _function_hits(rng, hits, n_funcs)
+    is_method = rng.random(n_funcs) < 0.3
+    is_decorated = rng.random(n_funcs) < 0.15
+
+    timings: dict[tuple[str, int, str], list[tuple[int, int, int]]] = {}
+    sources: dict[str, list[str]] = {}
+    class_of_file: dict[int, int] = {}
+
+    for i in range(n_funcs):
+        file_idx = int(func_files[i])
+        path = f"/srv/app/pkg{file_idx % 7}/sub{file_idx % 5}/module_{file_idx}.py"
+        lines = sources.setdefault(path, ['"""Сгенерированный модуль."""', ""])
+
+        indent = ""
+        qualname = f"func_{i}"
+        if is_method[i]:
+            if file_idx not in class_of_file:
+                class_of_file[file_idx] = i
+                lines.extend([f"class Handler{i}:", '    """Сгенерированный класс."""', ""])
+            indent = "    "
+            qualname = f"Handler{class_of_file[file_idx]}.method_{i}"
+        elif file_idx in class_of_file:
+            # функция после класса закрывает его
+            del class_of_file[file_idx]
+
+        if is_decorated[i]:
+            lines.append(f"{indent}@functools.lru_cache(maxsize=None)")
+        start = len(lines) if is_decorated[i] else len(lines) + 1
+        args = "self, x" if is_method[i] else "x"
+        lines.append(f"{indent}def {qualname.rsplit('.', 1)[-1]}({args}):")
+
+        body = _function_body(rng, int(lengths[i]), int(func_hits[i]), len(lines) + 1, indent + "    ")
+        profiled = []
+        for lineno, text, line_hits in body:
+            lines.append(text)
+            if line_hits is not None:
+                profiled.append((lineno, line_hits))
+
+        line_hits = np.array([h for _, h in profiled], dtype=np.int64)
+        cost = rng.lognormal(np.log(150.0), 1.0, len(profiled))
+        line_times = np.maximum(1, (line_hits * cost).astype(np.int64))
+        timings[(path, start, qualname)] = [
+            (lineno, int(h), int(t)) for (lineno, h), t in zip(profiled, line_times.tolist())
+        ]
+        lines.append("")
+
+    return SyntheticProfile(timings, sources)
+
+
+def _function_hits(rng: np.random.Generator, hits: str, n_funcs: int) -> np.ndarray:
+    if hits == "uniform":
+        return rng.integers(1, 10_000, n_funcs)
+    if hits == "zipf":
+        # немного горячих функций и длинный хвост редко вызываемых
+        return np.minimum(rng.zipf(1.6, n_funcs) * 10, 10_000_000)
+    return np.maximum(1, rng.lognormal(5.0, 2.0, n_funcs).astype(np.int64))
+
+
+def _function_body(
+    rng: np.random.Generator,
+    n_profiled: int,
+    calls: int,
+    first_lineno: int,
+    indent: str,
+) -> list[tuple[int, str, int | None]]:
+    """Строки тела функции: (номер, текст, хиты или None для непрофилируемых)."""
+    body: list[tuple[int, str, int | None]] = []
+    lineno = first_lineno
+    loop_left = 0
+    loop_hits = calls
+    j = 0
+
+    while j < n_profiled:
+        if loop_left == 0 and n_profiled - j > 2 and rng.random() < 0.1:
+            iterations = int(rng.integers(2, 50))
+            body.append((lineno, f"{indent}for i in range({iterations}):", calls * (iterations + 1)))
+            loop_left = int(rng.integers(1, min(8, n_profiled - j - 1) + 1))
+            loop_hits = calls * iterations
+        elif rng.random() < 0.05:
+            body.append((lineno, f"{indent}# шаг {j}", None))
+            lineno += 1
+            continue
+        else:
+            text = _STATEMENTS[j % len(_STATEMENTS)].format(v="x", j=j + 1)
+            if loop_left:
+                body.append((lineno, f"{indent}    {text}", loop_hits))
+                loop_left -= 1
+            else:
+                body.append((lineno, f"{indent}{text}", calls))
+        lineno += 1
+        j += 1
+
+    return body
+
+
+def dump_line_stats(timings: dict, unit: float = 1e-9) -> bytes:
+    """Сериализует timings так же, как kernprof: pickle объекта LineStats.
+
+    Без установленного line_profiler пишется SimpleNamespace с теми же
+    атрибутами — parse_lprof читает оба варианта.
+    """
+    stats = LineStats(timings, unit) if LineStats is not None else SimpleNamespace(timings=timings, unit=unit)
+    return pickle.dumps(stats, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_source_tree(sources: dict[str, list[str]], root: Path | str) -> list[Path]:
+    """Пишет исходники на диск, отрезая общий префикс /srv/app/.
+
+    Args:
+        sources: словарь {путь -> строки файла} из make_profile
+        root: каталог, в котором создаётся дерево
+
+    Returns:
+        Пути записанных файлов.
+    """
+    root = Path(root)
+    written = []
+    for path, lines in sources.items():
+        target = root / Path(path).relative_to("/srv/app")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        written.append(target)
+    return written
+
+
+def as_file(payload: bytes) -> io.BytesIO:
+    """Оборачивает байты в файловый объект, как у st.file_uploader."""
+    return io.BytesIO(payload)
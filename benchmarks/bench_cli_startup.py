@@ -0,0 +1,64 @@
+"""Холодный старт CLI: время отчёта по маленькому профилю в новом процессе.
+
+Завершается с кодом 1, если медиана превышает бюджет или при импорте
+CLI подтягивается streamlit.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._synthetic import make_lprof_bytes
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _median_ms(cmd: list[str], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--max-ms", type=float, default=800.0, help="бюджет на медиану холодного старта")
+    args = ap.parse_args()
+
+    leaked = subprocess.run(
+        [sys.executable, "-c", "import sys, cli; sys.exit('streamlit' in sys.modules)"],
+        cwd=ROOT,
+    ).returncode
+    if leaked:
+        print("FAIL: импорт cli подтягивает streamlit")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lprof = Path(tmp) / "small.lprof"
+        lprof.write_bytes(make_lprof_bytes(1_000))
+
+        t_python = _median_ms([sys.executable, "-c", "pass"], args.repeat)
+        t_report = _median_ms(
+            [sys.executable, "-m", "lprof_viewer", "report", str(lprof), "--no-source"],
+            args.repeat,
+        )
+
+    print(f"python -c pass: {t_python:.0f} ms")
+    print(f"report:         {t_report:.0f} ms (бюджет {args.max_ms:.0f} ms)")
+
+    if t_report > args.max_ms:
+        print("FAIL: холодный старт CLI превышает бюджет")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
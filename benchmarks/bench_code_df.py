@@ -0,0 +1,65 @@
+"""Микробенчмарк _build_code_df на большой функции."""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ui import _build_code_df
+
+
+def build_code_df_scan(func_lines: list[tuple[int, str]], df_one_func: pd.DataFrame) -> pd.DataFrame:
+    """Прежняя реализация: булева маска по df_one_func на каждую строку."""
+    rows = []
+    for ln, text in func_lines:
+        prof_row = df_one_func[df_one_func["lineno"] == ln]
+        time_s = float(prof_row["time_s"].iloc[0]) if not prof_row.empty else 0.0
+        hits = int(prof_row["hits"].iloc[0]) if not prof_row.empty else 0
+        rows.append({"Line": ln, "Hits": hits, "Time (s)": time_s, "Code": text})
+    return pd.DataFrame(rows)
+
+
+def make_function(n_lines: int, seed: int = 0) -> tuple[list[tuple[int, str]], pd.DataFrame]:
+    """Функция из n_lines строк, примерно 2/3 из которых есть в профиле."""
+    rng = np.random.default_rng(seed)
+    func_lines = [(ln, f"    x_{ln} = x_{ln - 1} + 1") for ln in range(1, n_lines + 1)]
+    profiled = np.sort(rng.choice(np.arange(1, n_lines + 1), size=n_lines * 2 // 3, replace=False))
+    df_one_func = pd.DataFrame(
+        {
+            "file": "gen.py",
+            "func": "generated",
+            "start": np.int32(1),
+            "lineno": profiled.astype(np.int32),
+            "hits": rng.integers(1, 1000, profiled.size),
+            "time_s": rng.random(profiled.size),
+        }
+    )
+    return func_lines, df_one_func
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=5_000)
+    args = ap.parse_args()
+
+    func_lines, df_one_func = make_function(args.lines)
+
+    t0 = time.perf_counter()
+    expected = build_code_df_scan(func_lines, df_one_func)
+    t_scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    actual = _build_code_df(func_lines, df_one_func)
+    t_merge = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    print(f"lines:    {args.lines:,}")
+    print(f"per-line: {t_scan:.3f}s")
+    print(f"reindex:  {t_merge:.4f}s")
+    print(f"speedup:  {t_scan / t_merge:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
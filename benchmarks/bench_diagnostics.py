@@ -0,0 +1,53 @@
+"""Накладные расходы самодиагностики: выключенной и включённой."""
+
+import argparse
+import timeit
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from diagnostics import Recorder, count, recording, stage, timed
+from parser import build_func_summary, parse_lprof
+
+
+def _plain() -> None:
+    pass
+
+
+@timed("bench.decorated")
+def _decorated() -> None:
+    pass
+
+
+def _with_stage() -> None:
+    with stage("bench.stage"):
+        pass
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=100_000)
+    ap.add_argument("--calls", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    df_profile = parse_lprof(as_file(make_lprof_bytes(args.lines)))
+
+    for label, recorder in (("disabled", None), ("enabled", Recorder())):
+        with recording(recorder):
+            per_call = {
+                name: min(timeit.repeat(func, number=args.calls, repeat=3)) / args.calls * 1e9
+                for name, func in (
+                    ("plain call", _plain),
+                    ("@timed", _decorated),
+                    ("stage()", _with_stage),
+                    ("count()", lambda: count("bench.counter")),
+                )
+            }
+            summary_s = min(timeit.repeat(lambda: build_func_summary(df_profile), number=10, repeat=3)) / 10
+
+        print(label)
+        for name, ns in per_call.items():
+            print(f"  {name:<12} {ns:7.0f} ns")
+        print(f"  build_func_summary ({args.lines:,} lines): {summary_s * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
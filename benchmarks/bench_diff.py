@@ -0,0 +1,33 @@
+"""Время построения сравнения двух больших профилей."""
+
+import argparse
+import time
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from diff import diff_func_summaries, diff_profiles
+from parser import parse_lprof
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    df_before = parse_lprof(as_file(make_lprof_bytes(args.lines, seed=1)))
+    df_after = parse_lprof(as_file(make_lprof_bytes(args.lines, seed=2)))
+
+    t0 = time.perf_counter()
+    df_diff = diff_profiles(df_before, df_after)
+    t_lines = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    func_diff = diff_func_summaries(df_before, df_after)
+    t_funcs = time.perf_counter() - t0
+
+    print(f"lines:          {args.lines:,} per profile")
+    print(f"diff_profiles:  {t_lines:.3f}s ({len(df_diff):,} rows)")
+    print(f"diff_summaries: {t_funcs:.3f}s ({len(func_diff):,} functions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Задержка взаимодействия с UI: перемещение слайдера и выбор функции.
+
+Сценарий прогоняется через streamlit.testing.AppTest, который
+перезапускает скрипт целиком, поэтому замер показывает выигрыш
+от кэширования производных данных в session_state; в браузере
+фрагменты дополнительно избавляют от перезапуска остальных секций.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+
+SCRIPT = Path(__file__).resolve().parent / "_interaction_app.py"
+
+
+def _timed(action) -> float:
+    t0 = time.perf_counter()
+    action()
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=200_000)
+    ap.add_argument("--lines-per-func", type=int, default=2_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    os.environ["BENCH_LINES"] = str(args.lines)
+    os.environ["BENCH_LINES_PER_FUNC"] = str(args.lines_per_func)
+
+    at = AppTest.from_file(str(SCRIPT), default_timeout=300)
+    t_initial = _timed(at.run)
+
+    slider = at.slider[0]
+    hi = slider.max
+    t_slider = [
+        _timed(lambda i=i: at.slider[0].set_value(hi * (i + 1) / (args.repeat + 2)).run())
+        for i in range(args.repeat)
+    ]
+
+    options = at.selectbox[1].options
+    t_select = [
+        _timed(lambda i=i: at.selectbox[1].set_value(options[(i + 1) % len(options)]).run())
+        for i in range(args.repeat)
+    ]
+    # возврат к уже открытым функциям
+    t_reselect = [
+        _timed(lambda i=i: at.selectbox[1].set_value(options[(i + 1) % len(options)]).run())
+        for i in range(args.repeat)
+    ]
+
+    print(f"profile:         {args.lines:,} lines, {args.lines_per_func:,} lines per function")
+    print(f"initial run:     {t_initial:.3f}s")
+    print(f"slider move:     {statistics.median(t_slider):.3f}s (median)")
+    print(f"select function: {statistics.median(t_select):.3f}s (median)")
+    print(f"reselect:        {statistics.median(t_reselect):.3f}s (median)")
+
+
+if __name__ == "__main__":
+    main()
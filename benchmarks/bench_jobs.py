@@ -0,0 +1,72 @@
+"""Фоновый разбор: задержка небольшого профиля рядом с огромным и время отмены.
+
+Небольшой профиль ставится в очередь, пока в исполнителе уже идёт разбор
+большого дампа; сравнивается время до его готовности с разбором в пустом
+исполнителе. Затем меряется, через сколько после cancel() задача
+действительно завершается — в потоке и в отдельном процессе.
+"""
+
+import argparse
+import io
+import time
+
+from benchmarks._synthetic import make_lprof_bytes
+from jobs import ParseExecutor, ParseJob
+
+
+def _wait(job: ParseJob) -> float:
+    t0 = time.perf_counter()
+    while not job.finished:
+        time.sleep(0.001)
+    return time.perf_counter() - t0
+
+
+def _small_latency(big: bytes | None, small: bytes, process_threshold: int) -> float:
+    """Время до готовности небольшого профиля, секунд."""
+    executor = ParseExecutor(process_threshold=process_threshold)
+    try:
+        if big is not None:
+            big_job = executor.submit("big", [io.BytesIO(big)])
+            while big_job.started_at is None:
+                time.sleep(0.001)
+        return _wait(executor.submit("small", [io.BytesIO(small)]))
+    finally:
+        executor.shutdown()
+
+
+def _cancel_latency(big: bytes, process_threshold: int) -> float:
+    """Время от cancel() до завершения задачи посреди разбора, секунд."""
+    executor = ParseExecutor(process_threshold=process_threshold)
+    try:
+        job = executor.submit("big", [io.BytesIO(big)])
+        while job.progress < 0.1:
+            time.sleep(0.001)
+        job.cancel()
+        return _wait(job)
+    finally:
+        executor.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    ap.add_argument("--small-lines", type=int, default=10_000)
+    args = ap.parse_args()
+
+    big = make_lprof_bytes(args.lines)
+    small = make_lprof_bytes(args.small_lines, seed=1)
+    # порог между размерами: большой дамп уходит в процесс, небольшой — в поток
+    threshold = (len(big) + len(small)) // 2
+
+    alone = _small_latency(None, small, threshold)
+    busy = _small_latency(big, small, threshold)
+    print(f"small profile alone:          {alone * 1000:.0f} ms")
+    print(f"small profile next to big:    {busy * 1000:.0f} ms")
+
+    for label, process_threshold in (("thread", len(big) + 1), ("process", 0)):
+        latency = _cancel_latency(big, process_threshold)
+        print(f"cancel latency, {label + ':':<14}{latency * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
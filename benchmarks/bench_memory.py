@@ -0,0 +1,35 @@
+"""Память профиля по колонкам и время группировок по функциям."""
+
+import argparse
+import time
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from parser import build_func_summary, memory_report, merge_profiles, parse_lprof
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    df_profile = parse_lprof(as_file(make_lprof_bytes(args.lines)))
+
+    print(memory_report(df_profile).to_string(index=False))
+
+    t0 = time.perf_counter()
+    summary = build_func_summary(df_profile)
+    t_summary = time.perf_counter() - t0
+
+    frames = [df_profile, parse_lprof(as_file(make_lprof_bytes(args.lines, seed=1)))]
+    t0 = time.perf_counter()
+    merged = merge_profiles(frames)
+    t_merge = time.perf_counter() - t0
+
+    print()
+    print(f"lines:              {args.lines:,}")
+    print(f"build_func_summary: {t_summary:.3f}s ({len(summary):,} functions)")
+    print(f"merge_profiles x2:  {t_merge:.3f}s ({len(merged):,} merged lines)")
+
+
+if __name__ == "__main__":
+    main()
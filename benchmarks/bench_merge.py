@@ -0,0 +1,34 @@
+"""Параллельный парсинг и объединение дампов нескольких воркеров."""
+
+import argparse
+import time
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from parser import parse_lprof, parse_lprof_many
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--files", type=int, default=64)
+    ap.add_argument("--lines", type=int, default=50_000, help="строк в одном дампе")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+
+    # одинаковый набор функций с разным временем, как у воркеров одного сервиса
+    payloads = [make_lprof_bytes(args.lines, seed=i) for i in range(args.files)]
+
+    t0 = time.perf_counter()
+    parse_lprof(as_file(max(payloads, key=len)))
+    t_one = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    merged = parse_lprof_many([as_file(p) for p in payloads], max_workers=args.workers)
+    t_all = time.perf_counter() - t0
+
+    print(f"files:         {args.files} x {args.lines:,} lines")
+    print(f"largest alone: {t_one:.3f}s")
+    print(f"parse + merge: {t_all:.3f}s ({len(merged):,} merged lines)")
+
+
+if __name__ == "__main__":
+    main()
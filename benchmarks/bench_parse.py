@@ -0,0 +1,71 @@
+"""Сравнение колоночного parse_lprof с построчной сборкой словарей и чтением .lpb."""
+
+import argparse
+import io
+import pickle
+import time
+
+import pandas as pd
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from packed import PackedProfile, write_packed
+from parser import parse_lprof
+
+
+def parse_lprof_rows(payload: bytes) -> pd.DataFrame:
+    """Прежняя реализация: список словарей на каждую строку."""
+    data = pickle.loads(payload)
+    result = []
+    for (fn, start, func), raw_lines in data.timings.items():
+        for lineno, hits, time_us in raw_lines:
+            result.append(
+                {
+                    "file": fn,
+                    "func": func,
+                    "start": start,
+                    "lineno": lineno,
+                    "hits": hits,
+                    "time_s": time_us / 1_000_000,
+                }
+            )
+    return pd.DataFrame(result)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    payload = make_lprof_bytes(args.lines)
+
+    t_pickle = _best_of(lambda: pickle.loads(payload), args.repeat)
+    t_rows = _best_of(lambda: parse_lprof_rows(payload), args.repeat)
+    t_cols = _best_of(lambda: parse_lprof(as_file(payload)), args.repeat)
+
+    packed = io.BytesIO()
+    write_packed(parse_lprof(as_file(payload)), packed)
+    packed_payload = packed.getvalue()
+    t_packed = _best_of(lambda: parse_lprof(as_file(packed_payload)), args.repeat)
+    t_directory = _best_of(lambda: PackedProfile(packed_payload).summary(), args.repeat)
+
+    print(f"lines:     {args.lines:,}")
+    print(f"unpickle:  {t_pickle:.3f}s")
+    print(f"row dicts: {t_rows:.3f}s")
+    print(f"columnar:  {t_cols:.3f}s")
+    print(f"speedup:   {t_rows / t_cols:.1f}x")
+    print(f".lpb:      {t_packed:.3f}s ({len(packed_payload) / 2**20:.1f} MB vs {len(payload) / 2**20:.1f} MB pickle)")
+    print(f"summary:   {t_directory:.3f}s (.lpb directory only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Статистика по повторным прогонам: выравнивание в матрицу и расчёт по строкам и функциям."""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks._synthetic import as_file, make_lprof_bytes
+from parser import parse_lprof
+from repeats import func_stats, line_stats, mean_profile, stack_runs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=100_000)
+    ap.add_argument("--runs", type=int, default=30)
+    args = ap.parse_args()
+
+    base = parse_lprof(as_file(make_lprof_bytes(args.lines)))
+    rng = np.random.default_rng(0)
+    times = base["time_s"].to_numpy()
+    # повторы одного кода: тот же профиль с 5% шумом времени
+    frames = [
+        base.assign(time_s=(times * rng.normal(1.0, 0.05, len(times))).astype(np.float32))
+        for _ in range(args.runs)
+    ]
+
+    t0 = time.perf_counter()
+    stack = stack_runs(frames)
+    t_stack = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    lines = line_stats(stack)
+    t_lines = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    func_stats(stack)
+    mean_profile(stack)
+    t_rest = time.perf_counter() - t0
+
+    print(f"runs x lines:  {args.runs} x {args.lines:,}")
+    print(f"stack_runs:    {t_stack:.3f}s")
+    print(f"line_stats:    {t_lines:.3f}s")
+    print(f"func + mean:   {t_rest:.3f}s")
+    print("statuses:      " + ", ".join(f"{k} {v:,}" for k, v in lines["status"].value_counts().items()))
+
+
+if __name__ == "__main__":
+    main()
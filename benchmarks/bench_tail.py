@@ -0,0 +1,51 @@
+"""Живой режим: задержка основного потока, пока наблюдатель разбирает большой дамп.
+
+Основной поток спит по 1 мс и запоминает самую долгую паузу — так видно,
+насколько разбор в фоне держит GIL. Сравниваются разбор в потоке
+наблюдателя и в отдельном процессе.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._synthetic import make_lprof_bytes
+from tail import ProfileWatcher
+
+
+def _worst_stall(directory: str, use_processes: bool) -> tuple[float, float]:
+    """Время до первого снимка и худшая пауза основного потока, секунд."""
+    watcher = ProfileWatcher(directory, poll_interval=0.05, use_processes=use_processes)
+    if use_processes:
+        # прогрев процесса разбора, чтобы не мерить его запуск
+        watcher._parse(make_lprof_bytes(100))
+
+    watcher.start()
+    worst = 0.0
+    t_start = time.perf_counter()
+    try:
+        while not watcher.snapshot().version:
+            t0 = time.perf_counter()
+            time.sleep(0.001)
+            worst = max(worst, time.perf_counter() - t0)
+    finally:
+        watcher.stop()
+
+    return time.perf_counter() - t_start, worst
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "dump.lprof").write_bytes(make_lprof_bytes(args.lines))
+        for label, use_processes in (("thread", False), ("process", True)):
+            elapsed, worst = _worst_stall(tmp, use_processes)
+            print(f"{label:<8} первый снимок через {elapsed:.2f}s, худшая пауза основного потока {worst * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
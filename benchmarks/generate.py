@@ -0,0 +1,38 @@
+"""Генерация синтетического .lprof и дерева исходников к нему.
+
+Пример:
+    python -m benchmarks.generate /tmp/synthetic --lines 100000 --files 50 --hits zipf
+
+Создаёт /tmp/synthetic/profile.lprof и /tmp/synthetic/src/... — их можно
+загрузить в приложение вместо профиля из test_profile.py.
+"""
+
+import argparse
+from pathlib import Path
+
+from benchmarks._synthetic import HIT_DISTRIBUTIONS, dump_line_stats, make_profile, write_source_tree
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("out_dir", type=Path)
+    ap.add_argument("--lines", type=int, default=100_000)
+    ap.add_argument("--files", type=int, default=100)
+    ap.add_argument("--funcs", type=int, default=None, help="по умолчанию lines / 50")
+    ap.add_argument("--hits", choices=HIT_DISTRIBUTIONS, default="zipf")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    profile = make_profile(args.lines, n_files=args.files, n_funcs=args.funcs, hits=args.hits, seed=args.seed)
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    lprof_path = args.out_dir / "profile.lprof"
+    lprof_path.write_bytes(dump_line_stats(profile.timings, profile.unit))
+    written = write_source_tree(profile.sources, args.out_dir / "src")
+
+    print(f"{lprof_path}: {len(profile.timings):,} functions, {args.lines:,} lines")
+    print(f"{args.out_dir / 'src'}: {len(written):,} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Набор бенчмарков конвейера: время и пик памяти каждой стадии.
+
+Стадии повторяют путь данных в приложении: parse_lprof, build_func_summary,
+разрешение исходников (SourceLineStore, разбор ast, поиск определений),
+_build_code_df и HTML тепловой карты для самой длинной функции, экспорт CSV
+всех строк с кодом, дерево свёртки пакет → модуль → класс → функция → строка.
+Время — лучшее из --repeat прогонов; пик памяти
+меряется отдельным прогоном под tracemalloc (учитывает аллокации Python
+и NumPy), чтобы трассировка не искажала время.
+
+Результаты пишутся в JSON (по умолчанию benchmarks/results/<ревизия>.json);
+с --baseline рядом печатается отношение к прошлому прогону.
+
+Пример:
+    python -m benchmarks.suite --sizes 10000 100000 1000000
+    python -m benchmarks.suite --baseline benchmarks/results/abc1234.json
+"""
+
+import argparse
+import functools
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._synthetic import as_file, dump_line_stats, make_profile
+from parser import build_func_summary, parse_lprof
+from rollup import build_rollup
+from source import SourceLineStore, span_lines
+from ui import _build_code_df, _heatmap_html, _qualname
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return out.stdout.strip()
+
+
+def _measure(stage: Callable[[], Any], repeat: int) -> tuple[float, int]:
+    """Лучшее время из repeat прогонов и пик памяти отдельного прогона, байт."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        stage()
+        best = min(best, time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def run_size(n_lines: int, repeat: int, seed: int = 0) -> dict[str, dict[str, float]]:
+    """Прогоняет все стадии на профиле из n_lines строк.
+
+    Args:
+        n_lines: размер синтетического профиля
+        repeat: число прогонов для замера времени
+        seed: зерно генератора
+
+    Returns:
+        {стадия: {"time_s": ..., "peak_mb": ...}}.
+    """
+    profile = make_profile(n_lines, seed=seed)
+    payload = dump_line_stats(profile.timings, profile.unit)
+    # в приложении исходники загружаются через file_uploader и известны по имени файла
+    src_files = {Path(path).name: lines for path, lines in profile.sources.items()}
+
+    df_profile = parse_lprof(as_file(payload))
+    summary = build_func_summary(df_profile)
+
+    def resolve_sources() -> SourceLineStore:
+        store = SourceLineStore(src_files)
+        for file_name, start in df_profile[["file", "start"]].drop_duplicates().itertuples(index=False):
+            func_index = store.function_index(file_name)
+            if func_index is not None:
+                func_index.find(int(start))
+        return store
+
+    store = resolve_sources()
+
+    # самая длинная функция — худший случай для просмотра кода
+    lengths = df_profile.groupby(["file", "start"], observed=True).size()
+    file_name, start = lengths.idxmax()
+    df_one_func = df_profile[(df_profile["file"] == file_name) & (df_profile["start"] == start)]
+    func_lines = span_lines(store.lines(file_name), store.function_index(file_name).find(int(start)))
+    df_code = _build_code_df(func_lines, df_one_func)
+
+    def export_csv() -> bytes:
+        rows = df_profile.sort_values("time_s", ascending=False)
+        rows = rows.assign(Code=SourceLineStore(src_files).lookup(rows["file"], rows["lineno"]))
+        return rows.to_csv(index=False).encode("utf-8")
+
+    stages: dict[str, Callable[[], Any]] = {
+        "parse_lprof": lambda: parse_lprof(as_file(payload)),
+        "build_func_summary": lambda: build_func_summary(df_profile),
+        "resolve_sources": resolve_sources,
+        "build_code_df": lambda: _build_code_df(func_lines, df_one_func),
+        "heatmap_html": lambda: _heatmap_html(df_code),
+        "export_csv": export_csv,
+        "build_rollup": lambda: build_rollup(df_profile, functools.partial(_qualname, store)),
+    }
+
+    results = {}
+    for name, stage in stages.items():
+        # на больших размерах достаточно одного прогона медленных стадий
+        elapsed, peak = _measure(stage, repeat if n_lines < 1_000_000 else 1)
+        results[name] = {"time_s": round(elapsed, 6), "peak_mb": round(peak / 1024 / 1024, 3)}
+
+    results["_shape"] = {
+        "functions": len(summary),
+        "files": len(src_files),
+        "longest_function_lines": len(func_lines),
+    }
+    return results
+
+
+def _compare(current: dict, baseline: dict) -> None:
+    print()
+    print(f"сравнение с {baseline['meta']['revision']}:")
+    for size, stages in current["results"].items():
+        base_stages = baseline["results"].get(size, {})
+        for name, values in stages.items():
+            base = base_stages.get(name)
+            if name.startswith("_") or not base or not base["time_s"]:
+                continue
+            ratio = values["time_s"] / base["time_s"]
+            mark = "  <-- медленнее" if ratio > 1.1 else ""
+            print(f"{int(size):>10,} {name:<20} {base['time_s']:>9.4f}s -> {values['time_s']:>9.4f}s  x{ratio:.2f}{mark}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("-o", "--output", type=Path, default=None, help="по умолчанию benchmarks/results/<ревизия>.json")
+    ap.add_argument("--baseline", type=Path, default=None, help="JSON прошлого прогона для сравнения")
+    args = ap.parse_args()
+
+    revision = _git_revision()
+    report = {
+        "meta": {
+            "revision": revision,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+
+    for n_lines in args.sizes:
+        results = run_size(n_lines, args.repeat)
+        report["results"][str(n_lines)] = results
+        for name, values in results.items():
+            if not name.startswith("_"):
+                print(f"{n_lines:>10,} {name:<20} {values['time_s']:>9.4f}s {values['peak_mb']:>9.1f} MB")
+
+    output = args.output or RESULTS_DIR / f"{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"результаты: {output}")
+
+    if args.baseline:
+        _compare(report, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
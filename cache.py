@@ -0,0 +1,253 @@
+"""Кэш распарсенных профилей с адресацией по содержимому."""
+
+import hashlib
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Callable
+
+import pandas as pd
+
+from diagnostics import count
+from parser import parse_lprof, parse_lprof_many
+
+
+# меняется вместе со схемой DataFrame из parse_lprof, чтобы не читать устаревшие файлы
+CACHE_VERSION = "2"
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("LPROF_VIEWER_CACHE_DIR", Path.home() / ".cache" / "lprof_viewer")
+)
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+DEFAULT_DISK_BUDGET = 4 * 1024 * 1024 * 1024
+
+_HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+
+def profile_key(uploaded_lprof: IO[bytes]) -> str:
+    """Считает ключ кэша по содержимому файла.
+
+    Args:
+        uploaded_lprof: файловый объект с содержимым .lprof
+
+    Returns:
+        Hex-строка хэша содержимого.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(CACHE_VERSION.encode())
+
+    uploaded_lprof.seek(0)
+    for chunk in iter(lambda: uploaded_lprof.read(1024 * 1024), b""):
+        h.update(chunk)
+    uploaded_lprof.seek(0)
+
+    return h.hexdigest()
+
+
+def profiles_key(uploaded_lprofs: list[IO[bytes]]) -> str:
+    """Считает ключ кэша для набора файлов, не зависящий от их порядка.
+
+    Args:
+        uploaded_lprofs: файловые объекты с содержимым .lprof
+
+    Returns:
+        Hex-строка хэша; для одного файла совпадает с profile_key.
+    """
+    if len(uploaded_lprofs) == 1:
+        return profile_key(uploaded_lprofs[0])
+
+    keys = sorted(profile_key(f) for f in uploaded_lprofs)
+    return hashlib.blake2b("".join(keys).encode(), digest_size=16).hexdigest()
+
+
+class ParseCache:
+    """LRU-кэш DataFrame профилей в памяти со сбросом в Parquet на диск.
+
+    В памяти держатся последние использованные профили, пока их суммарный
+    размер не превышает memory_budget. Каждый распарсенный профиль также
+    пишется в cache_dir как <ключ>.parquet, поэтому после перезапуска
+    сервера повторное открытие того же файла — это колоночное чтение,
+    а не unpickle. Без pyarrow работает только кэш в памяти.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | str | None = DEFAULT_CACHE_DIR,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        disk_budget: int = DEFAULT_DISK_BUDGET,
+    ) -> None:
+        """Создаёт кэш.
+
+        Args:
+            cache_dir: каталог для Parquet-файлов или None, чтобы не писать на диск
+            memory_budget: максимальный суммарный размер профилей в памяти, байт
+            disk_budget: максимальный суммарный размер Parquet-файлов, байт
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir and _HAS_PARQUET else None
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+
+        self._entries: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_or_parse(
+        self,
+        uploaded_lprof: IO[bytes],
+        parse: Callable[[IO[bytes]], pd.DataFrame] = parse_lprof,
+        key: str | None = None,
+    ) -> pd.DataFrame:
+        """Возвращает профиль из кэша или парсит и кэширует его.
+
+        Args:
+            uploaded_lprof: файловый объект с содержимым .lprof
+            parse: функция парсинга, по умолчанию parse_lprof
+            key: заранее посчитанный profile_key, если есть
+
+        Returns:
+            DataFrame профиля.
+
+        Raises:
+            ProfileError: если файл не удалось распарсить
+        """
+        key = key or profile_key(uploaded_lprof)
+
+        df = self.get(key)
+        if df is None:
+            df = parse(uploaded_lprof)
+            self.put(key, df)
+
+        return df
+
+    def get_or_parse_many(self, uploaded_lprofs: list[IO[bytes]], key: str | None = None) -> pd.DataFrame:
+        """Возвращает объединённый профиль нескольких файлов из кэша или парсит их.
+
+        Args:
+            uploaded_lprofs: файловые объекты с содержимым .lprof
+            key: заранее посчитанный profiles_key, если есть
+
+        Returns:
+            Объединённый DataFrame.
+
+        Raises:
+            ProfileError: если не прочитан ни один файл
+        """
+        key = key or profiles_key(uploaded_lprofs)
+
+        df = self.get(key)
+        if df is None:
+            df = parse_lprof_many(uploaded_lprofs)
+            self.put(key, df)
+
+        return df
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """Ищет профиль сначала в памяти, затем на диске.
+
+        Args:
+            key: ключ из profile_key
+
+        Returns:
+            DataFrame или None, если профиль не закэширован.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                count("cache.memory_hits")
+                return entry[0]
+
+        path = self._path(key)
+        if path is None or not path.exists():
+            count("cache.misses")
+            return None
+
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            path.unlink(missing_ok=True)
+            count("cache.misses")
+            return None
+
+        count("cache.disk_hits")
+
+        # mtime служит отметкой последнего использования для вытеснения с диска
+        os.utime(path)
+        self._remember(key, df)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """Кладёт профиль в память и на диск.
+
+        Args:
+            key: ключ из profile_key
+            df: DataFrame из parse_lprof
+        """
+        self._remember(key, df)
+
+        path = self._path(key)
+        if path is None:
+            return
+
+        tmp = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            return
+
+        self._evict_disk()
+
+    def clear(self) -> None:
+        """Очищает кэш в памяти и удаляет Parquet-файлы."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = 0
+
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob("*.parquet"):
+                path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{key}.parquet"
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.memory_budget:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_used -= old[1]
+
+            self._entries[key] = (df, size)
+            self._memory_used += size
+
+            while self._memory_used > self.memory_budget:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._memory_used -= evicted_size
+
+    def _evict_disk(self) -> None:
+        files = []
+        for path in self.cache_dir.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if used <= self.disk_budget:
+                break
+            path.unlink(missing_ok=True)
+            used -= size
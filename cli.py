@@ -0,0 +1,293 @@
+"""Консольный интерфейс LProf Viewer, не требующий Streamlit.
+
+Запуск из корня проекта:
+    python -m lprof_viewer report run.lprof --top 50 --format text
+    python -m lprof_viewer check --baseline base.lprof --candidate new.lprof --format junit
+    python -m lprof_viewer ingest nightly.lprof --run build-1234
+    python -m lprof_viewer convert run.lprof -o run.lpb
+    python -m lprof_viewer calibrate
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gate import GateThresholds, check_regressions, format_rel, report_json, report_junit
+from history import DEFAULT_HISTORY_DB, ProfileStore
+from overhead import DEFAULT_CALIBRATION_FILE, apply_overhead, calibrate, load_calibration, save_calibration
+from packed import EXTENSION, write_packed
+from parser import CORRECTED_COLUMN, ProfileError, build_func_summary, parse_lprof_many
+from source import SourceLineStore
+
+
+REPORT_FORMATS = ["text", "csv", "json", "html"]
+CHECK_FORMATS = ["json", "junit"]
+
+
+def hottest_lines(df_profile: pd.DataFrame, top: int, with_source: bool = True) -> pd.DataFrame:
+    """Выбирает top самых долгих строк профиля.
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        top: количество строк
+        with_source: добавить колонку Code, читая исходники по путям из профиля
+
+    Returns:
+        DataFrame строк профиля, отсортированный по времени по убыванию
+        (по исправленному, если в профиле есть CORRECTED_COLUMN).
+    """
+    column = CORRECTED_COLUMN if CORRECTED_COLUMN in df_profile.columns else "time_s"
+    times = df_profile[column].to_numpy()
+    top = min(top, len(times))
+    idx = np.argpartition(times, -top)[-top:] if top else np.array([], dtype=np.int64)
+    lines = df_profile.iloc[idx].sort_values(column, ascending=False)
+
+    if with_source:
+        lines = lines.assign(Code=SourceLineStore({}).lookup(lines["file"], lines["lineno"]))
+
+    return lines
+
+
+def format_report(functions: pd.DataFrame, lines: pd.DataFrame, fmt: str) -> str:
+    """Форматирует отчёт из таблиц функций и строк.
+
+    Args:
+        functions: DataFrame из build_func_summary
+        lines: DataFrame из hottest_lines
+        fmt: один из REPORT_FORMATS
+
+    Returns:
+        Текст отчёта.
+    """
+    if fmt == "text":
+        return (
+            "Функции\n"
+            f"{functions.to_string(index=False)}\n\n"
+            "Горячие строки\n"
+            f"{lines.to_string(index=False)}\n"
+        )
+
+    if fmt == "csv":
+        return (
+            "# functions\n"
+            f"{functions.to_csv(index=False)}\n"
+            "# lines\n"
+            f"{lines.to_csv(index=False)}"
+        )
+
+    if fmt == "json":
+        report = {
+            "functions": json.loads(functions.to_json(orient="records")),
+            "lines": json.loads(lines.to_json(orient="records")),
+        }
+        return json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+
+    if fmt == "html":
+        return (
+            "<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>LProf report</title></head><body>\n"
+            "<h2>Функции</h2>\n"
+            f"{functions.to_html(index=False)}\n"
+            "<h2>Горячие строки</h2>\n"
+            f"{lines.to_html(index=False)}\n"
+            "</body></html>\n"
+        )
+
+    raise ValueError(f"Неизвестный формат отчёта: {fmt}")
+
+
+def _open_profiles(paths: list[Path]) -> pd.DataFrame:
+    files = [open(p, "rb") for p in paths]
+    try:
+        return parse_lprof_many(files)
+    finally:
+        for f in files:
+            f.close()
+
+
+def _write(text: str, output: Path | None) -> None:
+    if output is None:
+        sys.stdout.write(text)
+    else:
+        output.write_text(text, encoding="utf-8")
+
+
+def _positive_int(value: str) -> int:
+    """Значение --top: целое число не меньше 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число, получено {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"ожидается число ≥ 1, получено {value!r}")
+    return number
+
+
+def _overhead_s(value: str) -> float:
+    """Значение --overhead: auto (сохранённая калибровка) или наносекунды на хит."""
+    if value == "auto":
+        calibration = load_calibration()
+        if calibration is None:
+            raise argparse.ArgumentTypeError("калибровки для этой машины нет, выполните команду calibrate")
+        overhead_s = calibration.overhead_s
+    else:
+        try:
+            overhead_s = float(value) * 1e-9
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"ожидается auto или число наносекунд, получено {value!r}") from None
+    # как и в интерфейсе: отрицательная поправка увеличила бы время строк
+    if not math.isfinite(overhead_s) or overhead_s < 0:
+        raise argparse.ArgumentTypeError(f"накладные расходы должны быть конечным числом ≥ 0, получено {value!r}")
+    return overhead_s
+
+
+def cmd_report(args: argparse.Namespace) -> int:
+    """Команда report: статистика по функциям и самые горячие строки."""
+    df_profile = _open_profiles(args.lprof)
+    if args.overhead is not None:
+        df_profile = apply_overhead(df_profile, args.overhead)
+
+    functions = build_func_summary(df_profile).head(args.top)
+    lines = hottest_lines(df_profile, args.top, with_source=not args.no_source)
+
+    _write(format_report(functions, lines, args.format), args.output)
+    return 0
+
+
+def cmd_check(args: argparse.Namespace) -> int:
+    """Команда check: 1, если относительно базового профиля есть регрессии."""
+    thresholds = GateThresholds(max_rel=args.max_rel, max_abs_s=args.max_abs, min_hits=args.min_hits)
+    report = check_regressions(
+        _open_profiles(args.baseline),
+        _open_profiles(args.candidate),
+        thresholds,
+    )
+
+    formatter = report_junit if args.format == "junit" else report_json
+    _write(formatter(report, thresholds), args.output)
+
+    regressions = report[report["verdict"] == "regression"]
+    for row in regressions.itertuples(index=False):
+        print(
+            f"REGRESSION {row.file}:{row.func} "
+            f"{row.time_before_s:.6f}s -> {row.time_after_s:.6f}s ({format_rel(row.rel_time)})",
+            file=sys.stderr,
+        )
+
+    return 1 if len(regressions) else 0
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    """Команда ingest: сохраняет профиль прогона в историю."""
+    df_profile = _open_profiles(args.lprof)
+
+    store = ProfileStore(args.db)
+    try:
+        run_id = store.ingest(df_profile, args.run)
+    except sqlite3.IntegrityError:
+        print(f"Прогон {args.run} уже есть в {args.db}", file=sys.stderr)
+        return 2
+    finally:
+        store.close()
+
+    print(f"{args.run}: run_id={run_id}, {len(df_profile):,} строк")
+    return 0
+
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    """Команда convert: переводит .lprof в компактный формат .lpb."""
+    df_profile = _open_profiles(args.lprof)
+    output = args.output or args.lprof[0].with_suffix(EXTENSION)
+
+    with open(output, "wb") as f:
+        size = write_packed(df_profile, f)
+
+    print(f"{output}: {len(df_profile):,} строк, {size / 1024 / 1024:.1f} МБ")
+    return 0
+
+
+def cmd_calibrate(args: argparse.Namespace) -> int:
+    """Команда calibrate: меряет накладные расходы line_profiler на хит."""
+    try:
+        calibration = calibrate()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"{calibration.overhead_s * 1e9:.1f} нс на хит ({calibration.machine})")
+    if not args.no_save:
+        save_calibration(calibration, args.file)
+        print(f"сохранено в {args.file}")
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Создаёт парсер аргументов командной строки."""
+    ap = argparse.ArgumentParser(prog="lprof_viewer", description="LProf Viewer без UI.")
+    commands = ap.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="отчёт по профилю")
+    report.add_argument("lprof", nargs="+", type=Path, help=".lprof файлы (несколько — суммируются)")
+    report.add_argument("--top", type=_positive_int, default=50, help="количество функций и строк в отчёте")
+    report.add_argument("--format", choices=REPORT_FORMATS, default="text")
+    report.add_argument("-o", "--output", type=Path, help="файл отчёта, по умолчанию stdout")
+    report.add_argument("--no-source", action="store_true", help="не читать исходники для колонки Code")
+    report.add_argument(
+        "--overhead",
+        type=_overhead_s,
+        help="вычесть накладные расходы line_profiler: auto (калибровка этой машины) или нс на хит",
+    )
+    report.set_defaults(handler=cmd_report)
+
+    defaults = GateThresholds()
+    check = commands.add_parser("check", help="проверка на регрессии относительно базового профиля")
+    check.add_argument("--baseline", nargs="+", type=Path, required=True, help="базовые .lprof")
+    check.add_argument("--candidate", nargs="+", type=Path, required=True, help="проверяемые .lprof")
+    check.add_argument("--max-rel", type=float, default=defaults.max_rel, help="допустимый относительный рост")
+    check.add_argument("--max-abs", type=float, default=defaults.max_abs_s, help="допустимый рост, секунд")
+    check.add_argument("--min-hits", type=int, default=defaults.min_hits, help="минимум хитов для проверки функции")
+    check.add_argument("--format", choices=CHECK_FORMATS, default="json")
+    check.add_argument("-o", "--output", type=Path, help="файл отчёта, по умолчанию stdout")
+    check.set_defaults(handler=cmd_check)
+
+    ingest = commands.add_parser("ingest", help="сохранить профиль прогона в историю")
+    ingest.add_argument("lprof", nargs="+", type=Path, help=".lprof файлы прогона (несколько — суммируются)")
+    ingest.add_argument("--run", required=True, help="уникальное имя прогона, например номер сборки")
+    ingest.add_argument("--db", type=Path, default=DEFAULT_HISTORY_DB, help="файл базы SQLite")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    convert = commands.add_parser("convert", help="перевести профиль в компактный формат .lpb")
+    convert.add_argument("lprof", nargs="+", type=Path, help=".lprof файлы (несколько — суммируются)")
+    convert.add_argument("-o", "--output", type=Path, help=f"файл {EXTENSION}, по умолчанию рядом с первым входным")
+    convert.set_defaults(handler=cmd_convert)
+
+    calibration = commands.add_parser("calibrate", help="измерить накладные расходы line_profiler на этой машине")
+    calibration.add_argument("--file", type=Path, default=DEFAULT_CALIBRATION_FILE, help="файл калибровок")
+    calibration.add_argument("--no-save", action="store_true", help="только напечатать результат")
+    calibration.set_defaults(handler=cmd_calibrate)
+
+    return ap
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Точка входа CLI.
+
+    Returns:
+        Код возврата процесса.
+    """
+    args = build_arg_parser().parse_args(argv)
+
+    try:
+        return args.handler(args)
+    except (ProfileError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
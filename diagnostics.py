@@ -0,0 +1,185 @@
+"""Самодиагностика: таймеры стадий и счётчики внутри самого просмотрщика.
+
+Замеры пишутся в Recorder, активный в текущем контексте (ContextVar).
+Когда диагностика выключена, активного Recorder нет, и обёртки сводятся
+к одному ContextVar.get и проверке на None.
+"""
+
+import functools
+import json
+import threading
+import time
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, TypeVar
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_current: ContextVar["Recorder | None"] = ContextVar("lprof_viewer_diagnostics", default=None)
+
+
+class Recorder:
+    """Накопитель времени стадий и счётчиков.
+
+    Стадия — именованный участок кода: для неё копятся число вызовов,
+    суммарное и максимальное время. Счётчики — произвольные целые
+    (обработанные строки, файлы с диска, попадания в кэш).
+    """
+
+    def __init__(self) -> None:
+        """Создаёт пустой накопитель."""
+        self._lock = threading.Lock()
+        self._stages: dict[str, list[float]] = {}
+        self._counters: dict[str, int] = {}
+        self.started_at = datetime.now(timezone.utc)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Учитывает один вызов стадии.
+
+        Args:
+            name: имя стадии
+            seconds: длительность вызова
+        """
+        with self._lock:
+            stat = self._stages.get(name)
+            if stat is None:
+                self._stages[name] = [1, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                stat[2] = max(stat[2], seconds)
+
+    def add(self, name: str, n: int = 1) -> None:
+        """Увеличивает счётчик.
+
+        Args:
+            name: имя счётчика
+            n: приращение
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        """Сбрасывает все замеры."""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = datetime.now(timezone.utc)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Возвращает копию замеров.
+
+        Returns:
+            Словарь с ключами started_at, stages (список словарей name, calls,
+            total_s, mean_s, max_s по убыванию total_s) и counters.
+        """
+        with self._lock:
+            stages = [
+                {
+                    "name": name,
+                    "calls": int(calls),
+                    "total_s": total,
+                    "mean_s": total / calls,
+                    "max_s": longest,
+                }
+                for name, (calls, total, longest) in self._stages.items()
+            ]
+            counters = dict(sorted(self._counters.items()))
+
+        stages.sort(key=lambda stage: stage["total_s"], reverse=True)
+        return {
+            "started_at": self.started_at.isoformat(),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def to_json(self) -> str:
+        """Замеры в JSON (формат snapshot)."""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + "\n"
+
+
+def current() -> Recorder | None:
+    """Активный Recorder или None, если диагностика выключена."""
+    return _current.get()
+
+
+def activate(recorder: Recorder | None) -> None:
+    """Делает recorder активным до конца текущего потока (или контекста).
+
+    Подходит для начала скрипта Streamlit: каждый перезапуск идёт в новом
+    потоке, поэтому значение не утекает в другие сессии.
+    """
+    _current.set(recorder)
+
+
+@contextmanager
+def recording(recorder: Recorder | None) -> Iterator[None]:
+    """Делает recorder активным внутри блока with."""
+    token = _current.set(recorder)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class _Stage:
+    __slots__ = ("recorder", "name", "t0")
+
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        self.recorder.add_time(self.name, time.perf_counter() - self.t0)
+
+
+# выключенная диагностика отдаёт один общий пустой контекст, без генератора на вызов
+_NO_STAGE = nullcontext()
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """Замеряет время блока with как стадию name."""
+    recorder = _current.get()
+    if recorder is None:
+        return _NO_STAGE
+    return _Stage(recorder, name)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Увеличивает счётчик name, если диагностика включена."""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(name, n)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Декоратор: замеряет каждый вызов функции как стадию name.
+
+    Args:
+        name: имя стадии
+
+    Returns:
+        Декоратор, не меняющий сигнатуру функции.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            recorder = _current.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.add_time(name, time.perf_counter() - t0)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
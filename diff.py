@@ -0,0 +1,210 @@
+"""Сравнение двух профилей (до и после оптимизации)."""
+
+import numpy as np
+import pandas as pd
+
+from parser import align_categories, build_func_summary, group_codes
+
+
+# относительные изменения меньше порога считаются шумом
+DIFF_TOLERANCE = 0.05
+
+DIFF_COLUMNS = [
+    "file",
+    "func",
+    "start",
+    "lineno",
+    "hits_before",
+    "hits_after",
+    "delta_hits",
+    "time_before_s",
+    "time_after_s",
+    "delta_time_s",
+    "rel_time",
+    "status",
+]
+
+
+def _with_alignment_key(df_profile: pd.DataFrame) -> pd.DataFrame:
+    """Добавляет ключ выравнивания строк, устойчивый к сдвигам кода.
+
+    Строка идентифицируется номером определения функции с этим именем
+    в файле (по порядку start) и смещением от начала функции, поэтому
+    код, добавленный выше функции, не ломает сопоставление.
+    """
+    df = df_profile[["file", "func", "start", "lineno", "hits", "time_s"]].copy()
+
+    # плотный ранг start среди определений одной (file, func) — по определениям, не по строкам
+    func_codes, _ = group_codes(df, ["file", "func"])
+    def_codes, def_first = group_codes(df, ["file", "func", "start"])
+    def_func = func_codes[def_first]
+    def_start = df["start"].to_numpy()[def_first]
+
+    order = np.lexsort((def_start, def_func))
+    sorted_func = def_func[order]
+    group_begin = np.flatnonzero(np.r_[True, sorted_func[1:] != sorted_func[:-1]])
+    group_len = np.diff(np.r_[group_begin, len(order)])
+
+    def_rank = np.empty(len(order), dtype=np.int32)
+    def_rank[order] = np.arange(len(order)) - np.repeat(group_begin, group_len) + 1
+
+    df["def_rank"] = def_rank[def_codes]
+    df["offset"] = df["lineno"] - df["start"]
+    return df
+
+
+def _take(values: np.ndarray, positions: np.ndarray, fill: float) -> np.ndarray:
+    """values[positions], где позиция -1 означает отсутствие строки и даёт fill."""
+    out = np.full(len(positions), fill, dtype=np.result_type(values.dtype, np.min_scalar_type(fill)))
+    present = positions >= 0
+    out[present] = values[positions[present]]
+    return out
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.full(len(num), np.nan)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def _status(
+    in_before: np.ndarray,
+    in_after: np.ndarray,
+    time_before: np.ndarray,
+    delta: np.ndarray,
+    rel: np.ndarray,
+) -> np.ndarray:
+    # при нулевом времени "до" rel не определён, рост с нуля — всегда регрессия
+    return np.select(
+        [
+            ~in_before,
+            ~in_after,
+            (rel > DIFF_TOLERANCE) | ((time_before == 0) & (delta > 0)),
+            rel < -DIFF_TOLERANCE,
+        ],
+        ["new", "removed", "regression", "improvement"],
+        default="same",
+    )
+
+
+def diff_profiles(df_before: pd.DataFrame, df_after: pd.DataFrame) -> pd.DataFrame:
+    """Построчное сравнение двух профилей.
+
+    Строки выравниваются по (file, func, номер определения, смещение от start):
+    словари file и func приводятся к общему через align_categories, ключи
+    обоих профилей нумеруются одним group_codes, и внешнее соединение
+    сводится к индексированию массивов. Номера строк в результате берутся
+    из профиля "после", а для удалённых строк — из "до".
+
+    Args:
+        df_before: DataFrame из parse_lprof для базового прогона
+        df_after: DataFrame из parse_lprof для нового прогона
+
+    Returns:
+        DataFrame с колонками DIFF_COLUMNS; rel_time — доля от времени "до"
+        (NaN, если времени "до" не было); status — new, removed,
+        regression, improvement или same; рост с нулевого времени
+        считается regression.
+    """
+    before, after = (_with_alignment_key(df) for df in align_categories([df_before, df_after]))
+    both = pd.concat([before, after], ignore_index=True)
+
+    codes, first = group_codes(both, ["file", "func", "def_rank", "offset"])
+    rows = np.arange(len(both))
+    pos_before = np.full(len(first), -1, dtype=np.int64)
+    pos_after = np.full(len(first), -1, dtype=np.int64)
+    pos_before[codes[: len(before)]] = rows[: len(before)]
+    pos_after[codes[len(before) :]] = rows[: len(after)]
+    in_before = pos_before >= 0
+    in_after = pos_after >= 0
+
+    hits_before = _take(before["hits"].to_numpy(dtype=np.int64), pos_before, 0)
+    hits_after = _take(after["hits"].to_numpy(dtype=np.int64), pos_after, 0)
+    time_before = _take(before["time_s"].to_numpy(dtype=np.float64), pos_before, 0.0)
+    time_after = _take(after["time_s"].to_numpy(dtype=np.float64), pos_after, 0.0)
+    delta_time = time_after - time_before
+    rel_time = _safe_div(delta_time, time_before)
+
+    start = np.where(
+        in_after,
+        _take(after["start"].to_numpy(), pos_after, 0),
+        _take(before["start"].to_numpy(), pos_before, 0),
+    )
+    lineno = np.where(
+        in_after,
+        _take(after["lineno"].to_numpy(), pos_after, 0),
+        _take(before["lineno"].to_numpy(), pos_before, 0),
+    )
+
+    result = pd.DataFrame(
+        {
+            "file": both["file"].take(first).reset_index(drop=True),
+            "func": both["func"].take(first).reset_index(drop=True),
+            "start": start.astype(np.int32),
+            "lineno": lineno.astype(np.int32),
+            "hits_before": hits_before,
+            "hits_after": hits_after,
+            "delta_hits": hits_after - hits_before,
+            "time_before_s": time_before,
+            "time_after_s": time_after,
+            "delta_time_s": delta_time,
+            "rel_time": rel_time,
+            "status": _status(in_before, in_after, time_before, delta_time, rel_time),
+        },
+        columns=DIFF_COLUMNS,
+    )
+
+    return result
+
+
+def diff_func_summaries(df_before: pd.DataFrame, df_after: pd.DataFrame) -> pd.DataFrame:
+    """Сравнение статистики по функциям.
+
+    Args:
+        df_before: DataFrame из parse_lprof для базового прогона
+        df_after: DataFrame из parse_lprof для нового прогона
+
+    Returns:
+        DataFrame с колонками: file, func, time_before_s, time_after_s,
+        delta_time_s, rel_time, hits_before, hits_after, per_hit_before_s,
+        per_hit_after_s, status; отсортирован по delta_time_s по убыванию.
+    """
+    merged = pd.merge(
+        build_func_summary(df_before)[["file", "func", "total_time_s", "total_hits"]],
+        build_func_summary(df_after)[["file", "func", "total_time_s", "total_hits"]],
+        on=["file", "func"],
+        how="outer",
+        suffixes=("_before", "_after"),
+        sort=False,
+    )
+
+    time_before = merged["total_time_s_before"].fillna(0.0).to_numpy(dtype=np.float64)
+    time_after = merged["total_time_s_after"].fillna(0.0).to_numpy(dtype=np.float64)
+    hits_before = merged["total_hits_before"].fillna(0).to_numpy(dtype=np.int64)
+    hits_after = merged["total_hits_after"].fillna(0).to_numpy(dtype=np.int64)
+    delta_time = time_after - time_before
+    rel_time = _safe_div(delta_time, time_before)
+
+    result = pd.DataFrame(
+        {
+            "file": merged["file"],
+            "func": merged["func"],
+            "time_before_s": time_before,
+            "time_after_s": time_after,
+            "delta_time_s": delta_time,
+            "rel_time": rel_time,
+            "hits_before": hits_before,
+            "hits_after": hits_after,
+            "per_hit_before_s": _safe_div(time_before, hits_before.astype(np.float64)),
+            "per_hit_after_s": _safe_div(time_after, hits_after.astype(np.float64)),
+            "status": _status(
+                merged["total_hits_before"].notna().to_numpy(),
+                merged["total_hits_after"].notna().to_numpy(),
+                time_before,
+                delta_time,
+                rel_time,
+            ),
+        }
+    )
+
+    return result.sort_values("delta_time_s", ascending=False, ignore_index=True)
@@ -0,0 +1,144 @@
+"""Проверка на регрессии производительности относительно базового профиля."""
+
+import json
+from typing import NamedTuple
+from xml.etree import ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+from diff import diff_func_summaries
+
+
+class GateThresholds(NamedTuple):
+    """Пороги срабатывания проверки.
+
+    Функция считается регрессией, если её время выросло больше чем на
+    max_rel и одновременно больше чем на max_abs_s секунд — либо суммарно,
+    либо по времени на один хит (в пересчёте на хиты нового прогона).
+    Рост с нулевого базового времени считается бесконечным относительным
+    ростом, поэтому проверяется только порог max_abs_s.
+    Функции, у которых в любом из прогонов меньше min_hits хитов,
+    не проверяются: на малом числе вызовов время слишком шумное.
+    """
+
+    max_rel: float = 0.10
+    max_abs_s: float = 0.001
+    min_hits: int = 10
+
+
+def check_regressions(
+    df_baseline: pd.DataFrame,
+    df_candidate: pd.DataFrame,
+    thresholds: GateThresholds = GateThresholds(),
+) -> pd.DataFrame:
+    """Сравнивает функции двух профилей и выносит вердикт по каждой.
+
+    Args:
+        df_baseline: DataFrame из parse_lprof для базового прогона
+        df_candidate: DataFrame из parse_lprof для проверяемого прогона
+        thresholds: пороги проверки
+
+    Returns:
+        DataFrame из diff_func_summaries с колонками rel_per_hit и verdict
+        (regression, ok, noise, new, removed); регрессии идут первыми.
+    """
+    report = diff_func_summaries(df_baseline, df_candidate)
+
+    per_hit_before = report["per_hit_before_s"].to_numpy()
+    per_hit_after = report["per_hit_after_s"].to_numpy()
+    hits_before = report["hits_before"].to_numpy()
+    hits_after = report["hits_after"].to_numpy()
+    delta_time = report["delta_time_s"].to_numpy()
+    rel_time = report["rel_time"].to_numpy()
+
+    rel_per_hit = np.full(len(report), np.nan)
+    np.divide(per_hit_after - per_hit_before, per_hit_before, out=rel_per_hit, where=per_hit_before > 0)
+
+    # регрессия на хит в секундах суммарного времени нового прогона
+    delta_per_hit_total = (per_hit_after - per_hit_before) * hits_after
+
+    # при нулевой базе rel не определён (NaN), рост с нуля — бесконечный относительный рост
+    grew_total = (rel_time > thresholds.max_rel) | (report["time_before_s"].to_numpy() == 0)
+    grew_per_hit = (rel_per_hit > thresholds.max_rel) | (per_hit_before == 0)
+    slower_total = (delta_time > thresholds.max_abs_s) & grew_total
+    slower_per_hit = (delta_per_hit_total > thresholds.max_abs_s) & grew_per_hit
+    noisy = (hits_before < thresholds.min_hits) | (hits_after < thresholds.min_hits)
+
+    status = report["status"].to_numpy()
+    report["rel_per_hit"] = rel_per_hit
+    report["verdict"] = np.select(
+        [
+            status == "new",
+            status == "removed",
+            noisy,
+            slower_total | slower_per_hit,
+        ],
+        ["new", "removed", "noise", "regression"],
+        default="ok",
+    )
+
+    order = np.argsort(report["verdict"].to_numpy() != "regression", kind="stable")
+    return report.iloc[order].reset_index(drop=True)
+
+
+def format_rel(rel: float) -> str:
+    """Относительное изменение для сообщений; NaN означает рост с нулевой базы."""
+    return "from zero" if np.isnan(rel) else f"{rel:+.1%}"
+
+
+def report_json(report: pd.DataFrame, thresholds: GateThresholds) -> str:
+    """Форматирует результат проверки в JSON.
+
+    Args:
+        report: DataFrame из check_regressions
+        thresholds: пороги, с которыми выполнялась проверка
+
+    Returns:
+        JSON-строка с полями passed, regressions, thresholds и functions.
+    """
+    regressions = int((report["verdict"] == "regression").sum())
+    payload = {
+        "passed": regressions == 0,
+        "regressions": regressions,
+        "thresholds": thresholds._asdict(),
+        "functions": json.loads(report.to_json(orient="records")),
+    }
+    return json.dumps(payload, ensure_ascii=False, indent=2) + "\n"
+
+
+def report_junit(report: pd.DataFrame, thresholds: GateThresholds) -> str:
+    """Форматирует результат проверки в JUnit XML: функция — тест-кейс.
+
+    Args:
+        report: DataFrame из check_regressions
+        thresholds: пороги, с которыми выполнялась проверка
+
+    Returns:
+        XML-строка с одним testsuite.
+    """
+    verdicts = report["verdict"].to_numpy()
+    suite = ET.Element(
+        "testsuite",
+        name="lprof-regression",
+        tests=str(len(report)),
+        failures=str(int((verdicts == "regression").sum())),
+        skipped=str(int(np.isin(verdicts, ["noise", "new", "removed"]).sum())),
+    )
+
+    properties = ET.SubElement(suite, "properties")
+    for name, value in thresholds._asdict().items():
+        ET.SubElement(properties, "property", name=name, value=str(value))
+
+    for row in report.itertuples(index=False):
+        case = ET.SubElement(suite, "testcase", classname=row.file, name=row.func, time=f"{row.time_after_s:.6f}")
+        if row.verdict == "regression":
+            message = (
+                f"{row.time_before_s:.6f}s -> {row.time_after_s:.6f}s "
+                f"({format_rel(row.rel_time)} total, {format_rel(row.rel_per_hit)} per hit)"
+            )
+            ET.SubElement(case, "failure", message=message, type="regression")
+        elif row.verdict != "ok":
+            ET.SubElement(case, "skipped", message=row.verdict)
+
+    return ET.tostring(suite, encoding="unicode", xml_declaration=True) + "\n"
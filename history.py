@@ -0,0 +1,270 @@
+"""История профилей по сборкам в локальной базе SQLite."""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache import DEFAULT_CACHE_DIR
+from parser import build_func_summary, category_codes, group_codes
+
+
+DEFAULT_HISTORY_DB = Path(os.environ.get("LPROF_VIEWER_HISTORY_DB", DEFAULT_CACHE_DIR / "history.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS functions (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    name TEXT NOT NULL,
+    UNIQUE (file_id, name)
+);
+CREATE TABLE IF NOT EXISTS function_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    function_id INTEGER NOT NULL REFERENCES functions(id),
+    total_hits INTEGER NOT NULL,
+    total_time_s REAL NOT NULL,
+    PRIMARY KEY (function_id, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS line_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    function_id INTEGER NOT NULL REFERENCES functions(id),
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    start INTEGER NOT NULL,
+    lineno INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    time_s REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS line_stats_function_run ON line_stats (function_id, run_id);
+CREATE INDEX IF NOT EXISTS line_stats_file_lineno ON line_stats (file_id, lineno);
+"""
+
+
+class ProfileStore:
+    """Хранилище профилей по прогонам (например, ночным сборкам).
+
+    Профиль раскладывается по нормализованным таблицам runs, files,
+    functions и line_stats; суммы по функциям сохраняются отдельно
+    в function_stats, поэтому тренд функции по тысяче прогонов — это
+    чтение тысячи строк по индексу, а не повторный парсинг.
+
+    Объект можно разделять между потоками (сессиями Streamlit): все
+    обращения к общему соединению идут под одной блокировкой, поэтому
+    транзакции разных потоков не перемешиваются.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_HISTORY_DB) -> None:
+        """Открывает (и при необходимости создаёт) базу.
+
+        Args:
+            path: путь к файлу SQLite или ":memory:"
+        """
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self.conn.close()
+
+    def ingest(self, df_profile: pd.DataFrame, run_name: str, created_at: datetime | None = None) -> int:
+        """Сохраняет профиль как новый прогон одной транзакцией.
+
+        Args:
+            df_profile: DataFrame из parse_lprof
+            run_name: уникальное имя прогона (номер сборки, коммит)
+            created_at: время прогона, по умолчанию текущее
+
+        Returns:
+            id созданного прогона.
+
+        Raises:
+            sqlite3.IntegrityError: если прогон с таким именем уже есть
+        """
+        created_at = created_at or datetime.now(timezone.utc)
+        row_func_keys, first = group_codes(df_profile, ["file", "func"])
+        func_keys = df_profile[["file", "func"]].take(first)
+        file_codes, file_uniques = category_codes(df_profile["file"])
+        summary = build_func_summary(df_profile)
+
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (name, created_at) VALUES (?, ?)",
+                (run_name, created_at.isoformat()),
+            )
+            run_id = cur.lastrowid
+
+            file_ids = self._ensure_files(func_keys["file"].unique().tolist())
+            func_ids = self._ensure_functions(
+                [(file_ids[fn], func) for fn, func in func_keys.itertuples(index=False)]
+            )
+
+            key_func_ids = np.array(
+                [func_ids[(file_ids[fn], func)] for fn, func in func_keys.itertuples(index=False)],
+                dtype=np.int64,
+            )
+            row_func_ids = key_func_ids[row_func_keys]
+
+            row_file_ids = np.array([file_ids.get(fn, -1) for fn in file_uniques], dtype=np.int64)[file_codes]
+
+            self.conn.executemany(
+                "INSERT INTO line_stats (run_id, function_id, file_id, start, lineno, hits, time_s) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip(
+                    [run_id] * len(df_profile),
+                    row_func_ids.tolist(),
+                    row_file_ids.tolist(),
+                    df_profile["start"].tolist(),
+                    df_profile["lineno"].tolist(),
+                    df_profile["hits"].tolist(),
+                    df_profile["time_s"].tolist(),
+                ),
+            )
+
+            summary_func_ids = [
+                func_ids[(file_ids[fn], func)] for fn, func in zip(summary["file"], summary["func"])
+            ]
+            self.conn.executemany(
+                "INSERT INTO function_stats (run_id, function_id, total_hits, total_time_s) "
+                "VALUES (?, ?, ?, ?)",
+                zip(
+                    [run_id] * len(summary),
+                    summary_func_ids,
+                    summary["total_hits"].tolist(),
+                    summary["total_time_s"].tolist(),
+                ),
+            )
+
+        return run_id
+
+    def delete_run(self, run_name: str) -> None:
+        """Удаляет прогон вместе со всей его статистикой."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM runs WHERE name = ?", (run_name,))
+
+    def runs(self) -> pd.DataFrame:
+        """Список прогонов: id, name, created_at в хронологическом порядке."""
+        return self._query("SELECT id, name, created_at FROM runs ORDER BY created_at, id")
+
+    def functions(self) -> pd.DataFrame:
+        """Список известных функций: id, file, func."""
+        return self._query(
+            "SELECT functions.id, files.path AS file, functions.name AS func "
+            "FROM functions JOIN files ON files.id = functions.file_id "
+            "ORDER BY files.path, functions.name",
+        )
+
+    def function_trend(self, file: str, func: str) -> pd.DataFrame:
+        """Время функции по прогонам.
+
+        Args:
+            file: путь к файлу из профиля
+            func: имя функции
+
+        Returns:
+            DataFrame с колонками: run, created_at, total_time_s, total_hits.
+        """
+        return self._query(
+            "SELECT runs.name AS run, runs.created_at, s.total_time_s, s.total_hits "
+            "FROM function_stats AS s "
+            "JOIN runs ON runs.id = s.run_id "
+            "WHERE s.function_id = ("
+            "  SELECT functions.id FROM functions JOIN files ON files.id = functions.file_id "
+            "  WHERE files.path = ? AND functions.name = ?"
+            ") "
+            "ORDER BY runs.created_at, runs.id",
+            params=(file, func),
+        )
+
+    def line_trend(self, file: str, lineno: int) -> pd.DataFrame:
+        """Время строки файла по прогонам.
+
+        Args:
+            file: путь к файлу из профиля
+            lineno: номер строки
+
+        Returns:
+            DataFrame с колонками: run, created_at, hits, time_s.
+        """
+        return self._query(
+            "SELECT runs.name AS run, runs.created_at, SUM(l.hits) AS hits, SUM(l.time_s) AS time_s "
+            "FROM line_stats AS l "
+            "JOIN runs ON runs.id = l.run_id "
+            "WHERE l.file_id = (SELECT id FROM files WHERE path = ?) AND l.lineno = ? "
+            "GROUP BY l.run_id "
+            "ORDER BY runs.created_at, runs.id",
+            params=(file, lineno),
+        )
+
+    def function_lines(self, file: str, func: str) -> pd.DataFrame:
+        """Номера строк функции, встречавшиеся в прогонах, с суммарным временем.
+
+        Args:
+            file: путь к файлу из профиля
+            func: имя функции
+
+        Returns:
+            DataFrame с колонками: lineno, time_s; отсортирован по lineno.
+        """
+        return self._query(
+            "SELECT l.lineno, SUM(l.time_s) AS time_s "
+            "FROM line_stats AS l "
+            "WHERE l.function_id = ("
+            "  SELECT functions.id FROM functions JOIN files ON files.id = functions.file_id "
+            "  WHERE files.path = ? AND functions.name = ?"
+            ") "
+            "GROUP BY l.lineno ORDER BY l.lineno",
+            params=(file, func),
+        )
+
+    def _query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def _ensure_files(self, paths: list[str]) -> dict[str, int]:
+        self.conn.executemany("INSERT OR IGNORE INTO files (path) VALUES (?)", ((p,) for p in paths))
+        return self._lookup_ids("SELECT path, id FROM files WHERE path IN ({})", paths)
+
+    def _ensure_functions(self, keys: list[tuple[int, str]]) -> dict[tuple[int, str], int]:
+        self.conn.executemany("INSERT OR IGNORE INTO functions (file_id, name) VALUES (?, ?)", keys)
+
+        ids: dict[tuple[int, str], int] = {}
+        file_ids = sorted({file_id for file_id, _ in keys})
+        for chunk in _chunks(file_ids):
+            rows = self.conn.execute(
+                f"SELECT file_id, name, id FROM functions WHERE file_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for file_id, name, func_id in rows:
+                ids[(file_id, name)] = func_id
+        return ids
+
+    def _lookup_ids(self, query: str, values: list[str]) -> dict[str, int]:
+        ids: dict[str, int] = {}
+        for chunk in _chunks(values):
+            rows = self.conn.execute(query.format(", ".join("?" * len(chunk))), chunk)
+            ids.update(rows)
+        return ids
+
+
+def _chunks(values: list, size: int = 500) -> list[list]:
+    # ограничение SQLite на число параметров в одном запросе
+    return [values[i : i + size] for i in range(0, len(values), size)]
@@ -0,0 +1,343 @@
+"""Фоновый разбор профилей: общий ограниченный пул, прогресс и отмена."""
+
+import io
+import multiprocessing
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from queue import Empty
+from typing import IO, Any, Callable
+
+import pandas as pd
+
+from cache import ParseCache
+from diagnostics import Recorder, count, current, recording, stage
+from parser import ProfileError, ProfileWarning, merge_profiles, open_lprof, parse_lprof
+
+
+DEFAULT_MAX_THREADS = 2
+DEFAULT_MAX_PROCESSES = 1
+# с этого размера разбор идёт в отдельном процессе: unpickle большого файла
+# держит GIL и тормозит остальные сессии, а процесс можно прервать сразу
+DEFAULT_PROCESS_THRESHOLD = 32 * 1024 * 1024
+# сколько завершённых задач помнить: их DataFrame обычно тот же объект,
+# что и в ParseCache, но переживает его вытеснение, пока задача не забыта
+MAX_FINISHED_JOBS = 8
+_POLL_INTERVAL = 0.1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+Source = bytes | Path
+
+
+class ParseCancelled(Exception):
+    """Разбор прерван пользователем."""
+
+
+class ParseJob:
+    """Задача разбора одного или нескольких файлов профиля.
+
+    Поля прогресса обновляет рабочий поток, читают их сессии Streamlit;
+    каждое поле пишется целиком, поэтому отдельная блокировка не нужна.
+    """
+
+    def __init__(self, key: str, sources: list[Source], process_threshold: int, recorder: Recorder | None) -> None:
+        """Создаёт задачу в состоянии QUEUED.
+
+        Args:
+            key: ключ кэша профиля (profiles_key)
+            sources: содержимое файлов или пути к ним на сервере
+            process_threshold: суммарный размер, с которого разбор идёт в процессе, байт
+            recorder: Recorder сессии, создавшей задачу, для самодиагностики
+        """
+        self.key = key
+        self.total_bytes = sum(len(s) if isinstance(s, bytes) else s.stat().st_size for s in sources)
+        self.use_process = self.total_bytes >= process_threshold
+
+        self.state = QUEUED
+        self.files_total = len(sources)
+        self.files_done = 0
+        # стадия разбора текущего файла: "read" (байты pickle) или "functions"
+        self.stage = "read"
+        self.done = 0
+        self.total = 0
+        self.df: pd.DataFrame | None = None
+        self.error = ""
+        self.messages: list[str] = []
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+        self._sources = sources
+        self._recorder = recorder
+        self._cancel = threading.Event()
+        self._future: Future | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Задача завершилась: успешно, с ошибкой или отменена."""
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def progress(self) -> float:
+        """Доля выполненной работы от 0 до 1."""
+        if self.state == DONE:
+            return 1.0
+        # чтение и обход функций считаются половинами работы над файлом
+        fraction = self.done / self.total if self.total else 0.0
+        current_file = fraction / 2 if self.stage == "read" else 0.5 + fraction / 2
+        return min((self.files_done + current_file) / max(self.files_total, 1), 1.0)
+
+    def cancel(self) -> None:
+        """Просит прервать разбор; задача из очереди снимается сразу."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def _report(self, stage: str, done: int, total: int) -> None:
+        # вызывается из parse_lprof по мере чтения и после каждой пачки функций
+        if self._cancel.is_set():
+            raise ParseCancelled()
+        self.stage, self.done, self.total = stage, done, total
+
+    def _finish(self, state: str) -> None:
+        self._sources = []
+        self.finished_at = time.time()
+        self.state = state
+
+
+def parse_source(
+    source: Source,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> tuple[pd.DataFrame | None, list[str]]:
+    """Разбирает один файл, возвращая предупреждения вместе с результатом.
+
+    Args:
+        source: содержимое .lprof/.lpb или путь к файлу на сервере
+        progress: обратный вызов прогресса для parse_lprof
+
+    Returns:
+        (df, messages) как у parse_payload: df равен None, если файл не прочитан.
+
+    Raises:
+        ParseCancelled: если progress прервал разбор
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ProfileWarning)
+        try:
+            if isinstance(source, Path):
+                with open_lprof(source) as mapped:
+                    df = parse_lprof(mapped, progress)
+            else:
+                df = parse_lprof(io.BytesIO(source), progress)
+        except ProfileError as e:
+            return None, [str(e)]
+    return df, [str(w.message) for w in caught]
+
+
+def _parse_in_child(source: Source, queue: Any) -> None:
+    def report(stage: str, done: int, total: int) -> None:
+        queue.put(("progress", stage, done, total))
+
+    try:
+        df, messages = parse_source(source, report)
+    except Exception as e:
+        queue.put(("failed", f"{type(e).__name__}: {e}"))
+        return
+    queue.put(("done", df, messages))
+
+
+class ParseExecutor:
+    """Общий для всех сессий исполнитель разбора профилей.
+
+    Задачи дедуплицируются по ключу профиля: несколько сессий, открывших
+    один и тот же файл, ждут одну задачу. Небольшие файлы разбираются
+    в пуле из max_threads потоков, крупные (от process_threshold байт) —
+    по одному в отдельном процессе, не больше max_processes одновременно.
+    Лимиты раздельные, поэтому огромная загрузка занимает только слот
+    крупных задач и не задерживает разбор обычных профилей в других сессиях.
+    Результат кладётся в ParseCache.
+    """
+
+    def __init__(
+        self,
+        cache: ParseCache | None = None,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_processes: int = DEFAULT_MAX_PROCESSES,
+        process_threshold: int = DEFAULT_PROCESS_THRESHOLD,
+    ) -> None:
+        """Создаёт исполнитель; потоки запускаются по мере поступления задач.
+
+        Args:
+            cache: кэш, в который кладутся разобранные профили
+            max_threads: сколько небольших файлов разбирается одновременно
+            max_processes: сколько крупных файлов разбирается одновременно
+            process_threshold: суммарный размер входа, с которого разбор идёт в процессе, байт
+        """
+        self.cache = cache
+        self.process_threshold = process_threshold
+
+        self._threads = ThreadPoolExecutor(max_threads, thread_name_prefix="lprof-parse")
+        # каждый поток этого пула сопровождает один дочерний процесс
+        self._processes = ThreadPoolExecutor(max_processes, thread_name_prefix="lprof-parse-process")
+        self._jobs: OrderedDict[str, ParseJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, inputs: list[IO[bytes] | Path | str], restart: bool = False) -> ParseJob:
+        """Ставит разбор в очередь или возвращает уже существующую задачу.
+
+        Отменённая или упавшая задача не перезапускается сама при каждом
+        перезапуске скрипта — только с restart=True.
+
+        Args:
+            key: ключ кэша профиля (profiles_key)
+            inputs: загруженные файлы или пути к файлам на сервере
+            restart: заново запустить отменённую или упавшую задачу
+
+        Returns:
+            ParseJob с этим ключом.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.state not in (FAILED, CANCELLED) or not restart):
+                self._jobs.move_to_end(key)
+                return job
+
+            sources = [_source(item) for item in inputs]
+            job = ParseJob(key, sources, self.process_threshold, current())
+            self._jobs[key] = job
+            self._forget_finished()
+
+        pool = self._processes if job.use_process else self._threads
+        job._future = pool.submit(self._run, job)
+        count("jobs.submitted")
+        return job
+
+    def job(self, key: str) -> ParseJob | None:
+        """Задача с ключом key, если она есть."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def queued_ahead(self, job: ParseJob) -> int:
+        """Сколько задач того же пула стоит в очереди раньше job."""
+        with self._lock:
+            return sum(
+                1
+                for other in self._jobs.values()
+                if other.state == QUEUED and other.use_process == job.use_process and other.created_at < job.created_at
+            )
+
+    def shutdown(self) -> None:
+        """Отменяет все задачи и останавливает пулы."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._threads.shutdown(cancel_futures=True)
+        self._processes.shutdown(cancel_futures=True)
+
+    def _forget_finished(self) -> None:
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[key]
+
+    def _run(self, job: ParseJob) -> None:
+        if job._cancel.is_set():
+            job._finish(CANCELLED)
+            return
+
+        job.state = RUNNING
+        job.started_at = time.time()
+
+        with recording(job._recorder), stage("jobs.parse"):
+            try:
+                job.df = self._parse(job)
+            except ParseCancelled:
+                job._finish(CANCELLED)
+                return
+            except ProfileError as e:
+                job.error = str(e)
+                job._finish(FAILED)
+                return
+            except Exception as e:
+                # задача не должна молча пропасть из-за неожиданной ошибки
+                job.error = f"Ошибка разбора: {type(e).__name__}: {e}"
+                job._finish(FAILED)
+                return
+
+        if self.cache is not None:
+            self.cache.put(job.key, job.df)
+        job._finish(DONE)
+
+    def _parse(self, job: ParseJob) -> pd.DataFrame:
+        frames = []
+        errors = []
+
+        for source in job._sources:
+            job.stage, job.done, job.total = "read", 0, 0
+            if job.use_process:
+                df, messages = self._parse_in_process(job, source)
+            else:
+                df, messages = parse_source(source, job._report)
+
+            if df is None:
+                errors.extend(messages)
+            else:
+                frames.append(df)
+                job.messages.extend(messages)
+            job.files_done += 1
+
+        if not frames:
+            raise ProfileError("; ".join(dict.fromkeys(errors)))
+
+        job.messages.extend(f"Файл пропущен. {message}" for message in errors)
+        return merge_profiles(frames)
+
+    def _parse_in_process(self, job: ParseJob, source: Source) -> tuple[pd.DataFrame | None, list[str]]:
+        # контекст по умолчанию, как у parse_lprof_many: при fork содержимое
+        # файла достаётся процессу без копирования через очередь
+        ctx = multiprocessing.get_context()
+        queue = ctx.Queue()
+        process = ctx.Process(target=_parse_in_child, args=(source, queue), daemon=True)
+        process.start()
+        count("jobs.processes")
+
+        try:
+            exited = False
+            while True:
+                if job._cancel.is_set():
+                    raise ParseCancelled()
+                try:
+                    message = queue.get(timeout=_POLL_INTERVAL)
+                except Empty:
+                    if exited:
+                        raise ProfileError(f"Процесс разбора завершился с кодом {process.exitcode}.")
+                    # последнее сообщение могло прийти сразу после проверки — ещё одна попытка
+                    exited = not process.is_alive()
+                    continue
+
+                if message[0] == "progress":
+                    job.stage, job.done, job.total = message[1:]
+                elif message[0] == "done":
+                    return message[1], message[2]
+                else:
+                    raise ProfileError(message[1])
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            queue.close()
+
+
+def _source(item: IO[bytes] | Path | str) -> Source:
+    if isinstance(item, (str, Path)):
+        return Path(item).expanduser()
+    item.seek(0)
+    return item.read()
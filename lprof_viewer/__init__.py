@@ -0,0 +1 @@
+"""Точка входа `python -m lprof_viewer`; модули приложения лежат в корне проекта."""
@@ -0,0 +1,171 @@
+"""Калибровка накладных расходов line_profiler на хит и исправленное время строк."""
+
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from cache import DEFAULT_CACHE_DIR
+from parser import CORRECTED_COLUMN
+
+
+DEFAULT_CALIBRATION_FILE = Path(
+    os.environ.get("LPROF_VIEWER_CALIBRATION", DEFAULT_CACHE_DIR / "overhead.json")
+)
+CALIBRATION_ITERATIONS = 200_000
+CALIBRATION_TRIALS = 5
+
+_HAS_LINE_PROFILER = importlib.util.find_spec("line_profiler") is not None
+
+
+class Calibration(NamedTuple):
+    """Результат калибровки на одной машине."""
+
+    overhead_s: float
+    machine: str
+    created_at: str
+    hits: int
+
+
+def machine_key() -> str:
+    """Ключ машины и окружения, для которых действительна калибровка."""
+    line_profiler_version = ""
+    if _HAS_LINE_PROFILER:
+        from importlib.metadata import version
+
+        line_profiler_version = version("line_profiler")
+    python = f"{platform.python_implementation()} {platform.python_version()}"
+    return f"{platform.node()}|{python}|{line_profiler_version}"
+
+
+def _empty_loop(n: int) -> None:
+    # эталонная нагрузка: собственная стоимость строк — наносекунды
+    for _ in range(n):
+        pass
+
+
+def calibrate(iterations: int = CALIBRATION_ITERATIONS, trials: int = CALIBRATION_TRIALS) -> Calibration:
+    """Меряет накладные расходы line_profiler на один хит строки.
+
+    Пустой цикл выполняется под LineProfiler и без него; разница между
+    временем, которое профилировщик приписал строкам цикла, и реальным
+    временем цикла, делённая на число хитов, — это стоимость трассировки
+    одного хита. Берётся медиана по trials прогонам.
+
+    Args:
+        iterations: число итераций пустого цикла в одном прогоне
+        trials: число прогонов
+
+    Returns:
+        Calibration для текущей машины.
+
+    Raises:
+        RuntimeError: если line_profiler не установлен
+    """
+    if not _HAS_LINE_PROFILER:
+        raise RuntimeError("Для калибровки нужен пакет line_profiler.")
+    from line_profiler import LineProfiler
+
+    estimates = []
+    hits = 0
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        _empty_loop(iterations)
+        plain_s = time.perf_counter() - t0
+
+        profiler = LineProfiler()
+        profiler(_empty_loop)(iterations)
+        stats = profiler.get_stats()
+        lines = [line for raw_lines in stats.timings.values() for line in raw_lines]
+        hits = sum(line_hits for _, line_hits, _ in lines)
+        reported_s = sum(line_time for _, _, line_time in lines) * stats.unit
+        if hits:
+            estimates.append(max(reported_s - plain_s, 0.0) / hits)
+
+    return Calibration(
+        overhead_s=statistics.median(estimates) if estimates else 0.0,
+        machine=machine_key(),
+        created_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        hits=hits,
+    )
+
+
+def load_calibration(path: Path | str = DEFAULT_CALIBRATION_FILE) -> Calibration | None:
+    """Читает сохранённую калибровку для текущей машины.
+
+    Args:
+        path: JSON-файл калибровок
+
+    Returns:
+        Calibration или None, если для этой машины калибровки нет.
+    """
+    try:
+        stored = json.loads(Path(path).read_text(encoding="utf-8"))
+        machine = machine_key()
+        entry = stored[machine]
+        return Calibration(float(entry["overhead_s"]), machine, str(entry["created_at"]), int(entry["hits"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_calibration(calibration: Calibration, path: Path | str = DEFAULT_CALIBRATION_FILE) -> None:
+    """Сохраняет калибровку, не трогая записи других машин.
+
+    Args:
+        calibration: результат calibrate
+        path: JSON-файл калибровок
+
+    Raises:
+        OSError: если файл не удалось записать
+    """
+    path = Path(path)
+    try:
+        stored = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        stored = {}
+    if not isinstance(stored, dict):
+        stored = {}
+
+    stored[calibration.machine] = {
+        "overhead_s": calibration.overhead_s,
+        "created_at": calibration.created_at,
+        "hits": calibration.hits,
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(json.dumps(stored, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def apply_overhead(df_profile: pd.DataFrame, overhead_s: float) -> pd.DataFrame:
+    """Добавляет колонку CORRECTED_COLUMN = time_s − hits × overhead_s.
+
+    Отрицательные значения (шум измерения на строках, почти целиком
+    состоящих из накладных расходов) обрезаются до нуля. Использованное
+    значение сохраняется в attrs["overhead_s"].
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        overhead_s: накладные расходы на хит, секунд
+
+    Returns:
+        Новый DataFrame с той же схемой плюс CORRECTED_COLUMN (float32).
+    """
+    times = df_profile["time_s"].to_numpy(dtype=np.float64)
+    corrected = times - df_profile["hits"].to_numpy(dtype=np.float64) * overhead_s
+    result = df_profile.assign(**{CORRECTED_COLUMN: np.maximum(corrected, 0.0).astype(np.float32)})
+    result.attrs["overhead_s"] = overhead_s
+    return result
@@ -0,0 +1,325 @@
+"""Компактный бинарный формат профиля (.lpb) с произвольным доступом по функциям.
+
+Формат не использует pickle, поэтому безопасен для чужих дампов, и читается
+через mmap без разбора: оглавление функций и колонки строк отображаются
+в массивы NumPy как есть. Все числа little-endian, секции выровнены по 8 байт:
+
+    заголовок          HEADER: magic, version, n_files, n_funcs, n_blocks, n_rows
+    смещения строк     uint64[n_files + n_funcs + 1] в таблице строк
+    таблица строк      UTF-8: сначала пути файлов, затем имена функций
+    оглавление         DIRECTORY_DTYPE[n_blocks] — по записи на функцию (file, start, func):
+                       индексы строк таблицы, первая строка и число строк в колонках,
+                       суммарные hits и time_s
+    lineno             int32[n_rows]
+    hits               int64[n_rows]
+    time_s             float32[n_rows], секунды
+
+Строки профиля лежат блоками по функциям в порядке оглавления, внутри
+блока — по возрастанию lineno.
+"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+import pandas as pd
+
+
+MAGIC = b"LPROFBIN"
+VERSION = 1
+EXTENSION = ".lpb"
+
+HEADER = struct.Struct("<8sIIIIQ")
+DIRECTORY_DTYPE = np.dtype(
+    [
+        ("file", "<u4"),
+        ("func", "<u4"),
+        ("start", "<i4"),
+        ("rows", "<u4"),
+        ("offset", "<u8"),
+        ("hits", "<i8"),
+        ("time_s", "<f8"),
+    ]
+)
+LINENO_DTYPE = np.dtype("<i4")
+HITS_DTYPE = np.dtype("<i8")
+TIME_DTYPE = np.dtype("<f4")
+
+_COLUMNS = ["file", "func", "start", "lineno", "hits", "time_s"]
+
+
+class PackedFormatError(ValueError):
+    """Данные не являются профилем .lpb поддерживаемой версии."""
+
+
+def is_packed(head: bytes) -> bool:
+    """Проверяет, начинаются ли данные с сигнатуры формата.
+
+    Args:
+        head: первые байты файла (достаточно len(MAGIC))
+    """
+    return bytes(head[: len(MAGIC)]) == MAGIC
+
+
+def _align(n: int) -> int:
+    return -(-n // 8) * 8
+
+
+def _codes(column: pd.Series) -> tuple[np.ndarray, list[str]]:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(dtype=np.int64), [str(c) for c in column.cat.categories]
+    codes, uniques = pd.factorize(column, sort=False)
+    return codes.astype(np.int64), [str(u) for u in uniques]
+
+
+def write_packed(df_profile: pd.DataFrame, f: IO[bytes]) -> int:
+    """Записывает профиль в формате .lpb.
+
+    Args:
+        df_profile: DataFrame из parse_lprof (колонки file, func, start, lineno, hits, time_s)
+        f: файл, открытый на запись в двоичном режиме
+
+    Returns:
+        Число записанных байт.
+    """
+    file_codes, files = _codes(df_profile["file"])
+    func_codes, funcs = _codes(df_profile["func"])
+    starts = df_profile["start"].to_numpy(dtype=np.int64)
+    linenos = df_profile["lineno"].to_numpy(dtype=np.int64)
+
+    order = np.lexsort((linenos, func_codes, starts, file_codes))
+    file_codes = file_codes[order]
+    func_codes = func_codes[order]
+    starts = starts[order]
+    lineno = linenos[order].astype(LINENO_DTYPE)
+    hits = df_profile["hits"].to_numpy(dtype=np.int64)[order].astype(HITS_DTYPE)
+    times = df_profile["time_s"].to_numpy(dtype=np.float32)[order].astype(TIME_DTYPE)
+
+    n_rows = len(order)
+    is_first = np.ones(n_rows, dtype=bool)
+    if n_rows:
+        is_first[1:] = (
+            (file_codes[1:] != file_codes[:-1]) | (starts[1:] != starts[:-1]) | (func_codes[1:] != func_codes[:-1])
+        )
+    first = np.flatnonzero(is_first)
+
+    directory = np.zeros(len(first), dtype=DIRECTORY_DTYPE)
+    directory["file"] = file_codes[first]
+    directory["func"] = func_codes[first]
+    directory["start"] = starts[first]
+    directory["rows"] = np.diff(np.append(first, n_rows))
+    directory["offset"] = first
+    if n_rows:
+        directory["hits"] = np.add.reduceat(hits.astype(np.int64), first)
+        directory["time_s"] = np.add.reduceat(times.astype(np.float64), first)
+
+    encoded = [s.encode("utf-8") for s in files + funcs]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    string_offsets[1:] = np.cumsum([len(s) for s in encoded])
+
+    sections = [
+        HEADER.pack(MAGIC, VERSION, len(files), len(funcs), len(directory), n_rows),
+        string_offsets.tobytes(),
+        b"".join(encoded),
+        directory.tobytes(),
+        lineno.tobytes(),
+        hits.tobytes(),
+        times.tobytes(),
+    ]
+
+    written = 0
+    for section in sections:
+        f.write(section)
+        padding = _align(len(section)) - len(section)
+        f.write(b"\0" * padding)
+        written += len(section) + padding
+    return written
+
+
+class PackedProfile:
+    """Профиль .lpb поверх буфера (bytes или mmap) без копирования данных.
+
+    Оглавление и колонки — представления NumPy над буфером, поэтому
+    открытие стоит O(число файлов и функций), а не O(строк профиля).
+    Сводка по функциям считается по оглавлению, строки одной функции
+    отдаются срезом колонок.
+    """
+
+    def __init__(self, buffer: bytes | memoryview | mmap.mmap) -> None:
+        """Читает заголовок, таблицу строк и оглавление.
+
+        Args:
+            buffer: содержимое файла .lpb
+
+        Raises:
+            PackedFormatError: если сигнатура, версия или размеры секций не сходятся
+        """
+        size = len(buffer)
+        if not is_packed(buffer[: len(MAGIC)]):
+            raise PackedFormatError("Нет сигнатуры формата .lpb.")
+        if size < HEADER.size:
+            raise PackedFormatError("Заголовок .lpb обрезан.")
+
+        _, version, n_files, n_funcs, n_blocks, n_rows = HEADER.unpack_from(buffer, 0)
+        if version != VERSION:
+            raise PackedFormatError(f"Неподдерживаемая версия .lpb: {version}.")
+
+        pos = HEADER.size
+        n_strings = n_files + n_funcs
+        try:
+            string_offsets = np.frombuffer(buffer, dtype="<u8", count=n_strings + 1, offset=pos)
+            pos += _align(string_offsets.nbytes)
+
+            strings_size = int(string_offsets[-1])
+            if pos + strings_size > size:
+                raise PackedFormatError("Таблица строк .lpb обрезана.")
+            table = bytes(buffer[pos : pos + strings_size])
+            pos += _align(strings_size)
+
+            self.directory = np.frombuffer(buffer, dtype=DIRECTORY_DTYPE, count=n_blocks, offset=pos)
+            pos += _align(self.directory.nbytes)
+            self.lineno = np.frombuffer(buffer, dtype=LINENO_DTYPE, count=n_rows, offset=pos)
+            pos += _align(self.lineno.nbytes)
+            self.hits = np.frombuffer(buffer, dtype=HITS_DTYPE, count=n_rows, offset=pos)
+            pos += _align(self.hits.nbytes)
+            self.time_s = np.frombuffer(buffer, dtype=TIME_DTYPE, count=n_rows, offset=pos)
+
+            bounds = string_offsets.tolist()
+            names = [table[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+        except PackedFormatError:
+            raise
+        except ValueError as e:
+            # frombuffer сообщает о выходе за границы буфера, а decode — о битых строках
+            # через ValueError (UnicodeDecodeError — его подкласс)
+            raise PackedFormatError(f"Файл .lpb обрезан или повреждён: {e}") from e
+
+        self.files = names[:n_files]
+        self.funcs = names[n_files:]
+        # имена становятся категориями Categorical и должны быть уникальны
+        if len(set(self.files)) != n_files or len(set(self.funcs)) != n_funcs:
+            raise PackedFormatError("Таблица строк .lpb содержит повторяющиеся имена.")
+
+        # оглавление проверяется целиком: чужой файл не должен давать выход за колонки
+        rows = self.directory["rows"].astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(rows)))
+        if (
+            offsets[-1] != n_rows
+            or not np.array_equal(self.directory["offset"], offsets[:-1])
+            or n_blocks
+            and (int(self.directory["file"].max()) >= n_files or int(self.directory["func"].max()) >= n_funcs)
+        ):
+            raise PackedFormatError("Оглавление .lpb не совпадает с колонками строк.")
+
+        self._buffer = buffer
+        self._func_codes: dict[str, int] | None = None
+        self._func_order = np.empty(0, dtype=np.int64)
+        self._func_sorted = np.empty(0, dtype=np.uint32)
+
+    @classmethod
+    def open(cls, path: str | Path) -> "PackedProfile":
+        """Отображает файл .lpb в память только для чтения.
+
+        Отображение живёт, пока на него ссылаются объект и выданные им массивы.
+
+        Args:
+            path: путь к файлу
+
+        Raises:
+            OSError: если файл не открывается
+            PackedFormatError: если файл не в формате .lpb
+        """
+        with open(Path(path).expanduser(), "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise PackedFormatError(f"Пустой файл {path}.") from e
+        return cls(mapped)
+
+    def __len__(self) -> int:
+        return len(self.lineno)
+
+    def summary(self) -> pd.DataFrame:
+        """Статистика по функциям только по оглавлению.
+
+        Returns:
+            DataFrame той же схемы, что build_func_summary: file, func,
+            total_time_s, total_hits, pct.
+        """
+        directory = self.directory
+        key = directory["file"].astype(np.int64) * max(len(self.funcs), 1) + directory["func"]
+        codes, uniques = pd.factorize(key, sort=False)
+
+        summary = pd.DataFrame(
+            {
+                "file": np.array(self.files, dtype=object)[uniques // max(len(self.funcs), 1)],
+                "func": np.array(self.funcs, dtype=object)[uniques % max(len(self.funcs), 1)],
+                "total_time_s": np.bincount(codes, weights=directory["time_s"], minlength=len(uniques)),
+                "total_hits": np.bincount(codes, weights=directory["hits"], minlength=len(uniques)).astype(np.int64),
+            }
+        ).sort_values("total_time_s", ascending=False)
+
+        total = summary["total_time_s"].sum()
+        summary["pct"] = (summary["total_time_s"] / total * 100).round(2) if total > 0 else 0.0
+
+        return summary
+
+    def function_rows(self, func: str) -> pd.DataFrame:
+        """Строки профиля функций с именем func (во всех файлах).
+
+        Если функция с таким именем одна, колонки lineno, hits и time_s —
+        представления над буфером без копирования.
+
+        Args:
+            func: имя функции, как в колонке func
+
+        Returns:
+            DataFrame схемы parse_lprof; пустой, если функции нет.
+        """
+        if self._func_codes is None:
+            self._func_codes = {name: code for code, name in enumerate(self.funcs)}
+            self._func_order = np.argsort(self.directory["func"], kind="stable")
+            self._func_sorted = self.directory["func"][self._func_order]
+
+        code = self._func_codes.get(func)
+        lo, hi = np.searchsorted(self._func_sorted, [code, code + 1]) if code is not None else (0, 0)
+        blocks = self._func_order[lo:hi]
+        if len(blocks) == 0:
+            # функции нет или на неё не ссылается ни один блок оглавления
+            return self._frame(self.directory[:0], slice(0, 0))
+
+        if len(blocks) == 1:
+            block = self.directory[blocks]
+            offset = int(block["offset"][0])
+            return self._frame(block, slice(offset, offset + int(block["rows"][0])))
+
+        block = self.directory[blocks]
+        rows = np.concatenate([np.arange(o, o + r) for o, r in zip(block["offset"].tolist(), block["rows"].tolist())])
+        return self._frame(block, rows)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Весь профиль как DataFrame схемы parse_lprof (колонки копируются из буфера)."""
+        return self._frame(self.directory, slice(0, len(self)), copy=True)
+
+    def _frame(self, block: np.ndarray, rows: slice | np.ndarray, copy: bool = False) -> pd.DataFrame:
+        counts = block["rows"].astype(np.int64)
+        file_idx = np.repeat(block["file"].astype(np.int32), counts)
+        func_idx = np.repeat(block["func"].astype(np.int32), counts)
+
+        lineno, hits, times = self.lineno[rows], self.hits[rows], self.time_s[rows]
+        if copy:
+            lineno, hits, times = lineno.copy(), hits.copy(), times.copy()
+
+        return pd.DataFrame(
+            {
+                "file": pd.Categorical.from_codes(file_idx, categories=self.files),
+                "func": pd.Categorical.from_codes(func_idx, categories=self.funcs),
+                "start": np.repeat(block["start"].astype(np.int32), counts),
+                "lineno": lineno.astype(np.int32, copy=False),
+                "hits": hits.astype(np.int64, copy=False),
+                "time_s": times.astype(np.float32, copy=False),
+            },
+            columns=_COLUMNS,
+            copy=False,
+        )
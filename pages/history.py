@@ -0,0 +1,63 @@
+"""Страница истории профилей: время функций и строк по прогонам."""
+
+import plotly.express as px
+import streamlit as st
+
+from history import ProfileStore
+from parser import ProfileError, parse_lprof
+
+
+st.set_page_config(page_title="LProf Viewer — история", layout="wide")
+st.title("История профилей по прогонам")
+
+
+@st.cache_resource
+def get_store() -> ProfileStore:
+    """Общее для всех сессий подключение к базе истории."""
+    return ProfileStore()
+
+
+store = get_store()
+
+with st.sidebar:
+    st.markdown("### Добавить прогон")
+    new_lprof = st.file_uploader("Профиль прогона", type="lprof")
+    run_name = st.text_input("Имя прогона (сборка, коммит)")
+    if st.button("Сохранить", disabled=not (new_lprof and run_name)):
+        try:
+            store.ingest(parse_lprof(new_lprof), run_name)
+            st.success(f"Прогон {run_name} сохранён.")
+        except ProfileError as e:
+            st.error(str(e))
+        except Exception as e:
+            st.error(f"Не удалось сохранить прогон: {e}")
+
+runs = store.runs()
+if runs.empty:
+    st.info("💡 В истории пока нет прогонов. Добавьте профиль в боковой панели или командой ingest.")
+    st.stop()
+
+st.caption(f"Прогонов в истории: {len(runs)}")
+
+functions = store.functions()
+labels = functions["func"] + " — " + functions["file"]
+choice = st.selectbox("Функция", range(len(functions)), format_func=lambda i: labels.iloc[i])
+file_name = functions["file"].iloc[choice]
+func_name = functions["func"].iloc[choice]
+
+trend = store.function_trend(file_name, func_name)
+fig = px.line(trend, x="run", y="total_time_s", markers=True, hover_data=["total_hits", "created_at"])
+fig.update_layout(title=f"Время {func_name} по прогонам (сек)")
+st.plotly_chart(fig, use_container_width=True)
+
+func_lines = store.function_lines(file_name, func_name)
+if not func_lines.empty:
+    lineno = st.selectbox(
+        "Строка",
+        func_lines["lineno"].tolist(),
+        index=int(func_lines["time_s"].to_numpy().argmax()),
+    )
+    line_trend = store.line_trend(file_name, int(lineno))
+    fig = px.line(line_trend, x="run", y="time_s", markers=True, hover_data=["hits", "created_at"])
+    fig.update_layout(title=f"Время строки {lineno} по прогонам (сек)")
+    st.plotly_chart(fig, use_container_width=True)
@@ -1,83 +1,578 @@
 """Парсинг .lprof файлов line_profiler."""
 
+import io
+import mmap
+import os
 import pickle
-from typing import IO
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator
 
+import numpy as np
 import pandas as pd
-import streamlit as st
 
+from diagnostics import count, timed
+from packed import MAGIC, PackedFormatError, PackedProfile, is_packed
 
-def parse_lprof(uploaded_lprof: IO[bytes]) -> pd.DataFrame | None:
+# line_profiler до появления LineStats.unit писал время в микросекундах
+DEFAULT_UNIT = 1e-6
+
+PROFILE_COLUMNS = ["file", "func", "start", "lineno", "hits", "time_s"]
+PROFILE_KEY = ["file", "start", "func", "lineno"]
+
+# пути и имена функций повторяются на каждой строке, поэтому хранятся словарём;
+# float32 даёт относительную погрешность ~1e-7 — много меньше шума таймера,
+# а суммы по строкам считаются в float64
+PROFILE_DTYPES = {
+    "file": "category",
+    "func": "category",
+    "start": np.int32,
+    "lineno": np.int32,
+    "hits": np.int64,
+    "time_s": np.float32,
+}
+CATEGORY_COLUMNS = ["file", "func"]
+
+# необязательная колонка: время без накладных расходов профилировщика (overhead.apply_overhead);
+# если она есть, сводка, таблица строк и тепловые карты ранжируют по ней
+CORRECTED_COLUMN = "corrected_time_s"
+
+# как часто parse_lprof сообщает о прогрессе: функций и прочитанных байт
+PROGRESS_BATCH = 2000
+PROGRESS_READ_BYTES = 1024 * 1024
+
+
+class ProfileError(Exception):
+    """Файл профиля не удалось прочитать или в нём нет данных."""
+
+
+class ProfileWarning(UserWarning):
+    """Часть данных профиля пропущена при разборе."""
+
+
+class _ProgressReader:
+    """Обёртка файла для pickle.load, сообщающая о прочитанных байтах."""
+
+    def __init__(self, f: IO[bytes], progress: Callable[[str, int, int], None]) -> None:
+        self._f = f
+        self._progress = progress
+        # mmap.seek ничего не возвращает, поэтому размер — через tell
+        f.seek(0, os.SEEK_END)
+        self._total = f.tell()
+        f.seek(0)
+        self._reported = 0
+        # исключение из progress, прервавшее чтение: его не надо выдавать за битый файл
+        self.interrupted: BaseException | None = None
+
+    def read(self, n: int = -1) -> bytes:
+        return self._report(self._f.read(n))
+
+    def readline(self) -> bytes:
+        return self._report(self._f.readline())
+
+    def _report(self, data: bytes) -> bytes:
+        position = self._f.tell()
+        if position - self._reported >= PROGRESS_READ_BYTES or position >= self._total:
+            self._reported = position
+            try:
+                self._progress("read", position, self._total)
+            except BaseException as e:
+                self.interrupted = e
+                raise
+        return data
+
+
+def _iter_line_items(raw_lines: Any) -> Iterable[tuple[int, int, float]] | None:
+    """Приводит данные одной функции к последовательности (lineno, hits, time).
+
+    Args:
+        raw_lines: список кортежей (lineno, hits, time) или словарь {lineno: (hits, time)}
+
+    Returns:
+        Последовательность троек или None, если формат неизвестен.
+    """
+    if isinstance(raw_lines, list):
+        return raw_lines
+
+    try:
+        items = raw_lines.items()
+    except Exception:
+        return None
+
+    return [(ln, h, t) for ln, (h, t) in items]
+
+
+@timed("parser.parse_lprof")
+def parse_lprof(
+    uploaded_lprof: IO[bytes],
+    progress: Callable[[str, int, int], None] | None = None,
+) -> pd.DataFrame:
     """Парсинг lprof файла.
 
+    Файлы в компактном формате .lpb (см. packed) распознаются по сигнатуре
+    и читаются без pickle. Для pickle данные собираются сразу
+    в преаллоцированные колонки NumPy: тройки (lineno, hits, time)
+    читаются одним np.fromiter, а имена файлов
+    и функций кодируются целыми индексами и становятся категориальными
+    колонками без промежуточных строк. Время переводится в секунды
+    с учётом LineStats.unit.
+
     Args:
         uploaded_lprof: файловый объект с содержимым .lprof
+        progress: вызывается как progress(stage, done, total): на стадии "read"
+            по мере чтения pickle (байты), на стадии "functions" после каждых
+            PROGRESS_BATCH функций; исключение из него прерывает разбор
+            (так работает отмена)
 
     Returns:
         DataFrame с колонками: file, func, start, lineno, hits, time_s
-        или None при ошибке чтения.
+        и типами из PROFILE_DTYPES.
+
+    Raises:
+        ProfileError: если файл не читается или данных профилирования нет
     """
+    uploaded_lprof.seek(0)
+    if is_packed(uploaded_lprof.read(len(MAGIC))):
+        return _parse_packed(uploaded_lprof)
+
+    reader = uploaded_lprof if progress is None else _ProgressReader(uploaded_lprof, progress)
     try:
         uploaded_lprof.seek(0)
-        data = pickle.load(uploaded_lprof)
-        timings = data.timings if hasattr(data, "timings") else data["timings"]
+        data = pickle.load(reader)
+        if hasattr(data, "timings"):
+            timings = data.timings
+            unit = getattr(data, "unit", None)
+        else:
+            timings = data["timings"]
+            unit = data.get("unit")
     except Exception as e:
-        st.error(f"Ошибка чтения .lprof: {e}")
-        return None
+        if isinstance(reader, _ProgressReader) and e is reader.interrupted:
+            raise
+        raise ProfileError(f"Ошибка чтения .lprof: {e}") from e
 
-    result = []
+    unit = float(unit) if unit else DEFAULT_UNIT
 
-    for (fn, start, func), raw_lines in timings.items():
-        if isinstance(raw_lines, dict):
-            items = raw_lines.items()
-        elif isinstance(raw_lines, list):
-            items = [(ln, (h, t)) for (ln, h, t) in raw_lines]
-        else:
-            try:
-                items = raw_lines.items()
-            except Exception:
-                st.warning(f"Неизвестный формат данных для {func} в {fn}, пропускаем.")
-                continue
-
-        for lineno, (hits, time_us) in items:
-            result.append(
-                {
-                    "file": fn,
-                    "func": func,
-                    "start": start,
-                    "lineno": lineno,
-                    "hits": hits,
-                    "time_s": time_us / 1_000_000,
-                }
+    blocks: list[Any] = []
+    block_file: list[int] = []
+    block_func: list[int] = []
+    block_start: list[int] = []
+    block_len: list[int] = []
+    file_codes: dict[str, int] = {}
+    func_codes: dict[str, int] = {}
+
+    n_functions = len(timings)
+    for i, ((fn, start, func), raw_lines) in enumerate(timings.items()):
+        if progress is not None and i % PROGRESS_BATCH == 0:
+            progress("functions", i, n_functions)
+
+        items = _iter_line_items(raw_lines)
+        if items is None:
+            warnings.warn(
+                f"Неизвестный формат данных для {func} в {fn}, пропускаем.",
+                ProfileWarning,
+                stacklevel=2,
             )
+            continue
+        if not items:
+            continue
 
-    if not result:
-        st.warning("Файл прочитан, но данных профилирования не найдено.")
-        return None
+        blocks.append(items)
+        block_file.append(file_codes.setdefault(fn, len(file_codes)))
+        block_func.append(func_codes.setdefault(func, len(func_codes)))
+        block_start.append(start)
+        block_len.append(len(items))
+
+    total = sum(block_len)
+    if total == 0:
+        raise ProfileError("Файл прочитан, но данных профилирования не найдено.")
+
+    if progress is not None:
+        progress("functions", n_functions, n_functions)
+
+    count("parser.functions", len(blocks))
+    count("parser.rows", total)
+
+    # все тройки (lineno, hits, time) одним проходом в заранее выделенный буфер
+    flat = np.fromiter(
+        chain.from_iterable(chain.from_iterable(blocks)),
+        dtype=np.float64,
+        count=total * 3,
+    ).reshape(total, 3)
+
+    lengths = np.array(block_len, dtype=np.int64)
+    file_idx = np.repeat(np.array(block_file, dtype=np.int32), lengths)
+    func_idx = np.repeat(np.array(block_func, dtype=np.int32), lengths)
+    starts = np.repeat(np.array(block_start, dtype=np.int32), lengths)
+    linenos = flat[:, 0].astype(np.int32)
+    hits = flat[:, 1].astype(np.int64)
+    times = (flat[:, 2] * unit).astype(np.float32)
+
+    return pd.DataFrame(
+        {
+            "file": pd.Categorical.from_codes(file_idx, categories=list(file_codes)),
+            "func": pd.Categorical.from_codes(func_idx, categories=list(func_codes)),
+            "start": starts,
+            "lineno": linenos,
+            "hits": hits,
+            "time_s": times,
+        },
+        columns=PROFILE_COLUMNS,
+    )
+
+
+def _parse_packed(uploaded_lprof: IO[bytes]) -> pd.DataFrame:
+    uploaded_lprof.seek(0)
+    # mmap читается без копии, остальные файловые объекты — целиком
+    buffer = uploaded_lprof if isinstance(uploaded_lprof, mmap.mmap) else uploaded_lprof.read()
+    try:
+        df = PackedProfile(buffer).to_frame()
+    except PackedFormatError as e:
+        raise ProfileError(f"Ошибка чтения .lpb: {e}") from e
+
+    if df.empty:
+        raise ProfileError("Файл прочитан, но данных профилирования не найдено.")
+
+    count("parser.rows", len(df))
+    return df
+
+
+@contextmanager
+def open_lprof(path: str | Path) -> Iterator[mmap.mmap]:
+    """Открывает .lprof или .lpb на сервере как отображение в память.
+
+    Файл не копируется в память целиком, как при загрузке через браузер:
+    mmap поддерживает read/seek, поэтому его можно передавать в parse_lprof
+    и profile_key вместо загруженного файла. Страницы читаются ядром
+    по мере обращения.
+
+    Args:
+        path: путь к .lprof
+
+    Yields:
+        mmap только для чтения; закрывается при выходе из блока with.
+
+    Raises:
+        ProfileError: если файл не открывается или пуст
+    """
+    path = Path(path).expanduser()
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise ProfileError(f"Не удалось открыть {path}: {e}") from e
+
+    with f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            # ValueError — пустой файл, его нельзя отобразить
+            raise ProfileError(f"Не удалось прочитать {path}: {e}") from e
+
+        try:
+            yield mapped
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # на буфер ещё ссылаются массивы (например, из PackedProfile) —
+                # отображение закроется вместе с ними
+                pass
+
+
+def compact_profile(df_profile: pd.DataFrame) -> pd.DataFrame:
+    """Приводит DataFrame профиля к типам PROFILE_DTYPES.
+
+    Нужен для профилей, собранных не через parse_lprof (например,
+    старые записи кэша или таблицы, построенные вручную).
+
+    Args:
+        df_profile: DataFrame с колонками PROFILE_COLUMNS
+
+    Returns:
+        Тот же DataFrame, если типы уже совпадают, иначе приведённую копию.
+    """
+    dtypes = {
+        col: dtype
+        for col, dtype in PROFILE_DTYPES.items()
+        if col in df_profile.columns and not _has_dtype(df_profile[col], dtype)
+    }
+    return df_profile.astype(dtypes) if dtypes else df_profile
+
+
+def _has_dtype(column: pd.Series, dtype: Any) -> bool:
+    if dtype == "category":
+        return isinstance(column.dtype, pd.CategoricalDtype)
+    return column.dtype == dtype
+
+
+def align_categories(frames: list[pd.DataFrame], columns: list[str] = CATEGORY_COLUMNS) -> list[pd.DataFrame]:
+    """Приводит категориальные колонки нескольких профилей к общему словарю.
+
+    После этого concat и merge по file и func работают по целым кодам
+    и сохраняют категориальный тип, а не откатываются к строкам.
+
+    Args:
+        frames: DataFrame профилей
+        columns: колонки, словари которых объединяются
+
+    Returns:
+        Новые DataFrame (данные не копируются, перекодируются только коды).
+    """
+    frames = [compact_profile(df) for df in frames]
+
+    for col in columns:
+        categories = pd.Index(pd.unique(np.concatenate([df[col].cat.categories.to_numpy() for df in frames])))
+        frames = [
+            df if df[col].cat.categories.equals(categories)
+            else df.assign(**{col: df[col].cat.set_categories(categories)})
+            for df in frames
+        ]
+
+    return frames
+
+
+def category_codes(column: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """Возвращает целые коды и словарь значений колонки.
+
+    Для категориальной колонки это её готовые codes и categories,
+    для строковой — результат pd.factorize.
+
+    Args:
+        column: колонка file или func
+
+    Returns:
+        (codes, uniques): uniques.take(codes) восстанавливает колонку.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+
+    codes, uniques = pd.factorize(column)
+    return codes, pd.Index(uniques)
+
+
+def group_codes(df: pd.DataFrame, columns: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Нумерует группы строк по набору колонок без groupby.
+
+    Категориальные колонки дают свои коды, целые — значения со сдвигом
+    к нулю; колонки упаковываются в один int64 (со сжатием через
+    pd.factorize, только если упаковка не помещается в int64),
+    и результат один раз перенумеровывается pd.factorize. Номера групп
+    идут в порядке первого появления.
+
+    Args:
+        df: DataFrame профиля
+        columns: колонки ключа группировки
+
+    Returns:
+        (codes, first): номер группы для каждой строки и индекс первой
+        строки каждой группы (first[k] — первая строка группы k).
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    bound = 1
+
+    for col in columns:
+        column = df[col]
+        if pd.api.types.is_integer_dtype(column.dtype):
+            values = column.to_numpy(dtype=np.int64)
+            if len(values):
+                values = values - values.min()
+            size = int(values.max()) + 1 if len(values) else 1
+        else:
+            values, uniques = category_codes(column)
+            size = max(len(uniques), 1)
+
+        if bound * size >= 2**62:
+            codes = pd.factorize(codes)[0]
+            bound = int(codes.max()) + 1 if len(codes) else 1
+
+        codes = codes * size + values
+        bound *= size
+
+    codes = pd.factorize(codes)[0]
+
+    if not len(codes):
+        return codes, codes
+
+    # номера выдаются по первому появлению: строка первая в группе, если её номер больше всех предыдущих
+    is_first = np.empty(len(codes), dtype=bool)
+    is_first[0] = True
+    np.greater(codes[1:], np.maximum.accumulate(codes)[:-1], out=is_first[1:])
+
+    return codes, np.flatnonzero(is_first)
+
+
+def memory_report(df_profile: pd.DataFrame) -> pd.DataFrame:
+    """Объём памяти DataFrame по колонкам.
+
+    Args:
+        df_profile: DataFrame профиля
+
+    Returns:
+        DataFrame с колонками: column, dtype, bytes, bytes_per_row, pct;
+        последняя строка — итог по всем колонкам.
+    """
+    usage = df_profile.memory_usage(index=False, deep=True)
+    rows = max(len(df_profile), 1)
+    total = int(usage.sum())
+
+    report = pd.DataFrame(
+        {
+            "column": list(usage.index) + ["total"],
+            "dtype": [str(df_profile[col].dtype) for col in usage.index] + [""],
+            "bytes": np.append(usage.to_numpy(dtype=np.int64), total),
+        }
+    )
+    report["bytes_per_row"] = (report["bytes"] / rows).round(2)
+    report["pct"] = (report["bytes"] / total * 100).round(2) if total else 0.0
+
+    return report
 
-    return pd.DataFrame(result)
 
+@timed("parser.merge_profiles")
+def merge_profiles(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Складывает несколько профилей в один.
 
+    Словари file и func объединяются через align_categories, после чего
+    hits и time_s суммируются по (file, start, func, lineno) через
+    group_codes и np.bincount.
+
+    Args:
+        frames: DataFrame из parse_lprof
+
+    Returns:
+        DataFrame той же схемы, что у parse_lprof.
+    """
+    if len(frames) == 1:
+        return frames[0]
+
+    combined = pd.concat(align_categories(frames), ignore_index=True)
+    codes, first = group_codes(combined, PROFILE_KEY)
+
+    merged = combined.iloc[first].reset_index(drop=True)
+    merged["hits"] = np.bincount(codes, weights=combined["hits"].to_numpy(dtype=np.float64)).astype(np.int64)
+    merged["time_s"] = np.bincount(codes, weights=combined["time_s"].to_numpy(dtype=np.float64)).astype(np.float32)
+
+    return merged[PROFILE_COLUMNS]
+
+
+def parse_payload(payload: bytes) -> tuple[pd.DataFrame | None, list[str]]:
+    """Парсит байты .lprof, возвращая предупреждения вместе с результатом.
+
+    Не бросает ProfileError, поэтому подходит для запуска в другом
+    процессе: ошибки и ProfileWarning передаются как текст.
+
+    Args:
+        payload: содержимое .lprof
+
+    Returns:
+        (df, messages): df равен None, если файл не прочитан,
+        тогда messages содержит текст ошибки.
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ProfileWarning)
+        try:
+            df = parse_lprof(io.BytesIO(payload))
+        except ProfileError as e:
+            return None, [str(e)]
+    return df, [str(w.message) for w in caught]
+
+
+@timed("parser.parse_lprof_many")
+def parse_lprof_many(
+    uploaded_lprofs: list[IO[bytes]],
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """Парсит несколько lprof файлов параллельно и объединяет их.
+
+    Используется, например, для дампов разных воркеров одного сервиса.
+    Файлы разбираются в пуле процессов, результаты складываются
+    через merge_profiles. Нечитаемые файлы пропускаются с ProfileWarning.
+
+    Args:
+        uploaded_lprofs: файловые объекты с содержимым .lprof
+        max_workers: размер пула процессов, по умолчанию по числу CPU
+
+    Returns:
+        Объединённый DataFrame.
+
+    Raises:
+        ProfileError: если не прочитан ни один файл
+    """
+    if len(uploaded_lprofs) == 1:
+        return parse_lprof(uploaded_lprofs[0])
+
+    payloads = []
+    for f in uploaded_lprofs:
+        f.seek(0)
+        payloads.append(f.read())
+    count("parser.files", len(payloads))
+
+    workers = min(len(payloads), max_workers or os.cpu_count() or 1)
+
+    if workers <= 1:
+        results = [parse_payload(p) for p in payloads]
+    else:
+        # крупные файлы первыми, чтобы самый долгий парсинг не оказался в хвосте
+        order = sorted(range(len(payloads)), key=lambda i: -len(payloads[i]))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_payload, [payloads[i] for i in order]))
+
+    frames = []
+    errors = []
+    for df, messages in results:
+        if df is None:
+            errors.extend(messages)
+            continue
+        frames.append(df)
+        for message in messages:
+            warnings.warn(message, ProfileWarning, stacklevel=2)
+
+    if not frames:
+        raise ProfileError("; ".join(dict.fromkeys(errors)))
+
+    for message in errors:
+        warnings.warn(f"Файл пропущен. {message}", ProfileWarning, stacklevel=2)
+
+    return merge_profiles(frames)
+
+
+@timed("parser.build_func_summary")
 def build_func_summary(df_profile: pd.DataFrame) -> pd.DataFrame:
     """Агрегация статистики по функциям.
 
+    Группировка идёт по целым кодам file и func (group_codes),
+    суммы считаются через np.bincount в float64.
+
     Args:
         df_profile: DataFrame из parse_lprof
 
     Returns:
-        DataFrame с колонками: file, func, total_time_s, total_hits, pct
+        DataFrame с колонками: file, func, total_time_s, total_hits, pct;
+        если в профиле есть CORRECTED_COLUMN — ещё total_corrected_s,
+        и тогда сортировка и pct считаются по исправленному времени.
     """
-    summary = (
-        df_profile.groupby(["file", "func"])
-        .agg(
-            total_time_s=("time_s", "sum"),
-            total_hits=("hits", "sum"),
-        )
-        .reset_index()
-        .sort_values("total_time_s", ascending=False)
-    )
+    codes, first = group_codes(df_profile, ["file", "func"])
+
+    total_time = np.bincount(codes, weights=df_profile["time_s"].to_numpy(dtype=np.float64))
+    total_hits = np.bincount(codes, weights=df_profile["hits"].to_numpy(dtype=np.float64))
+
+    columns = {
+        "file": df_profile["file"].take(first).to_numpy(dtype=object),
+        "func": df_profile["func"].take(first).to_numpy(dtype=object),
+        "total_time_s": total_time,
+        "total_hits": total_hits.astype(np.int64),
+    }
+    rank_column = "total_time_s"
+    if CORRECTED_COLUMN in df_profile.columns:
+        corrected = df_profile[CORRECTED_COLUMN].to_numpy(dtype=np.float64)
+        columns["total_corrected_s"] = np.bincount(codes, weights=corrected)
+        rank_column = "total_corrected_s"
+
+    summary = pd.DataFrame(columns).sort_values(rank_column, ascending=False)
 
-    total = summary["total_time_s"].sum()
-    summary["pct"] = (summary["total_time_s"] / total * 100).round(2) if total > 0 else 0.0
+    total = summary[rank_column].sum()
+    summary["pct"] = (summary[rank_column] / total * 100).round(2) if total > 0 else 0.0
 
-    return summary
\ No newline at end of file
+    return summary
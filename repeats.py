@@ -0,0 +1,214 @@
+"""Статистика по повторным прогонам одного и того же кода."""
+
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from parser import PROFILE_COLUMNS, PROFILE_KEY, align_categories, compact_profile, group_codes
+
+
+# строка шумная, если 95% доверительный интервал шире ±10% от среднего
+NOISE_REL_CI = 0.1
+# горячая — от 1% среднего времени всего профиля
+HOT_SHARE = 0.01
+# статистика считается блоками колонок, чтобы временные матрицы не росли с профилем
+STATS_BLOCK = 65536
+
+# двусторонние 95% квантили распределения Стьюдента для 1..30 степеней свободы
+_T_95 = np.array(
+    [
+        12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+    ]
+)
+# дальше — интерполяция по 1/df между 30, 40, 60, 120 и бесконечностью
+_T_95_TAIL_INV_DOF = np.array([0.0, 1 / 120, 1 / 60, 1 / 40, 1 / 30])
+_T_95_TAIL = np.array([1.960, 1.980, 2.000, 2.021, 2.042])
+
+STAT_COLUMNS = [
+    "runs",
+    "hits_mean",
+    "time_mean_s",
+    "time_median_s",
+    "time_std_s",
+    "time_ci_s",
+    "per_hit_mean_s",
+    "per_hit_median_s",
+    "per_hit_std_s",
+    "per_hit_ci_s",
+    "rel_ci",
+    "status",
+]
+
+
+class RunStack(NamedTuple):
+    """Профили N прогонов, выровненные в матрицы (прогоны × строки).
+
+    Строка, которой нет в прогоне (не исполнялась), даёт в нём 0 хитов
+    и 0 секунд.
+    """
+
+    keys: pd.DataFrame
+    time: np.ndarray
+    hits: np.ndarray
+
+
+def stack_runs(frames: list[pd.DataFrame]) -> RunStack:
+    """Выравнивает профили прогонов по (file, start, func, lineno).
+
+    Словари file и func приводятся к общему через align_categories, ключи
+    всех прогонов нумеруются одним group_codes, а матрицы заполняются
+    одним np.bincount по индексу прогон × строка.
+
+    Args:
+        frames: DataFrame из parse_lprof, по одному на прогон
+
+    Returns:
+        RunStack с матрицами time (float64) и hits (int64).
+
+    Raises:
+        ValueError: если прогонов меньше двух
+    """
+    if len(frames) < 2:
+        raise ValueError("Для статистики нужно хотя бы два прогона.")
+
+    combined = pd.concat(align_categories(frames), ignore_index=True)
+    codes, first = group_codes(combined, PROFILE_KEY)
+    n_runs, n_lines = len(frames), len(first)
+
+    run = np.repeat(np.arange(n_runs), [len(df) for df in frames])
+    cell = run * n_lines + codes
+    time = np.bincount(cell, weights=combined["time_s"].to_numpy(dtype=np.float64), minlength=n_runs * n_lines)
+    hits = np.bincount(cell, weights=combined["hits"].to_numpy(dtype=np.float64), minlength=n_runs * n_lines)
+
+    keys = combined.iloc[first][["file", "func", "start", "lineno"]].reset_index(drop=True)
+    return RunStack(keys, time.reshape(n_runs, n_lines), hits.reshape(n_runs, n_lines).astype(np.int64))
+
+
+def line_stats(stack: RunStack) -> pd.DataFrame:
+    """Статистика времени и времени на хит по каждой строке.
+
+    Args:
+        stack: результат stack_runs
+
+    Returns:
+        DataFrame с колонками file, func, start, lineno и STAT_COLUMNS,
+        отсортированный по time_mean_s по убыванию. ci — полуширина 95%
+        доверительного интервала среднего; rel_ci — она же в долях
+        среднего; status — stable_hot, noisy или stable.
+    """
+    stats = _describe(stack.time, stack.hits)
+    result = pd.concat([stack.keys, pd.DataFrame(stats)], axis=1)
+    return result.sort_values("time_mean_s", ascending=False, ignore_index=True)
+
+
+def func_stats(stack: RunStack) -> pd.DataFrame:
+    """Статистика по функциям (file, func), как у build_func_summary.
+
+    Время функции в каждом прогоне — сумма её строк; время на хит —
+    отношение сумм времени и хитов.
+
+    Args:
+        stack: результат stack_runs
+
+    Returns:
+        DataFrame с колонками file, func и STAT_COLUMNS,
+        отсортированный по time_mean_s по убыванию.
+    """
+    codes, first = group_codes(stack.keys, ["file", "func"])
+    n_runs, n_funcs = len(stack.time), len(first)
+
+    cell = (np.arange(n_runs)[:, None] * n_funcs + codes[None, :]).ravel()
+    time = np.bincount(cell, weights=stack.time.ravel(), minlength=n_runs * n_funcs)
+    hits = np.bincount(cell, weights=stack.hits.ravel(), minlength=n_runs * n_funcs)
+
+    stats = _describe(time.reshape(n_runs, n_funcs), hits.reshape(n_runs, n_funcs).astype(np.int64))
+    keys = stack.keys.iloc[first][["file", "func"]].reset_index(drop=True)
+    result = pd.concat([keys, pd.DataFrame(stats)], axis=1)
+    return result.sort_values("time_mean_s", ascending=False, ignore_index=True)
+
+
+def mean_profile(stack: RunStack) -> pd.DataFrame:
+    """Средний по прогонам профиль в схеме parse_lprof.
+
+    Подходит для всех обычных представлений (сводка, иерархия, таблица
+    строк, тепловые карты); hits округляются до целых.
+
+    Args:
+        stack: результат stack_runs
+
+    Returns:
+        DataFrame с колонками PROFILE_COLUMNS.
+    """
+    df = stack.keys.assign(
+        hits=np.rint(stack.hits.mean(axis=0)).astype(np.int64),
+        time_s=stack.time.mean(axis=0),
+    )
+    return compact_profile(df[PROFILE_COLUMNS])
+
+
+def t_critical(dof: np.ndarray) -> np.ndarray:
+    """Двусторонний 95% квантиль распределения Стьюдента (NaN при dof < 1).
+
+    Args:
+        dof: число степеней свободы
+
+    Returns:
+        Массив квантилей той же формы.
+    """
+    dof = np.asarray(dof)
+    out = np.full(dof.shape, np.nan)
+    exact = (dof >= 1) & (dof <= len(_T_95))
+    out[exact] = _T_95[dof[exact].astype(np.int64) - 1]
+    tail = dof > len(_T_95)
+    out[tail] = np.interp(1.0 / dof[tail], _T_95_TAIL_INV_DOF, _T_95_TAIL)
+    return out
+
+
+def _describe(time: np.ndarray, hits: np.ndarray) -> dict[str, np.ndarray]:
+    """Считает STAT_COLUMNS по столбцам матриц (прогоны × объекты)."""
+    n_runs, n_items = time.shape
+    stats = {col: np.empty(n_items) for col in STAT_COLUMNS if col not in ("runs", "status")}
+    runs = np.empty(n_items, dtype=np.int64)
+    t_runs = t_critical(np.array(n_runs - 1))
+
+    for lo in range(0, n_items, STATS_BLOCK):
+        hi = min(lo + STATS_BLOCK, n_items)
+        t, h = time[:, lo:hi], hits[:, lo:hi]
+        block = slice(lo, hi)
+
+        stats["hits_mean"][block] = h.mean(axis=0)
+        stats["time_mean_s"][block] = t.mean(axis=0)
+        stats["time_median_s"][block] = np.median(t, axis=0)
+        stats["time_std_s"][block] = t.std(axis=0, ddof=1)
+        stats["time_ci_s"][block] = t_runs * stats["time_std_s"][block] / np.sqrt(n_runs)
+
+        # время на хит — только по прогонам, где строка исполнялась
+        executed = h > 0
+        per_hit = np.divide(t, h, out=np.full(t.shape, np.nan), where=executed)
+        n = executed.sum(axis=0)
+        runs[block] = n
+        with warnings.catch_warnings():
+            # строки без хитов и с одним прогоном дают NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            stats["per_hit_mean_s"][block] = np.nanmean(per_hit, axis=0)
+            stats["per_hit_median_s"][block] = np.nanmedian(per_hit, axis=0)
+            stats["per_hit_std_s"][block] = np.nanstd(per_hit, axis=0, ddof=1)
+        stats["per_hit_ci_s"][block] = t_critical(n - 1) * stats["per_hit_std_s"][block] / np.sqrt(np.maximum(n, 1))
+
+    mean = stats["time_mean_s"]
+    ci = stats["time_ci_s"]
+    rel_ci = np.full(n_items, np.nan)
+    np.divide(ci, mean, out=rel_ci, where=mean > 0)
+    stats["rel_ci"] = rel_ci
+
+    total = mean.sum()
+    # интервал шире порога или задевает ноль — стоимость строки в пределах шума
+    noisy = (mean > 0) & ((rel_ci > NOISE_REL_CI) | (mean - ci <= 0))
+    hot = mean >= HOT_SHARE * total if total > 0 else np.zeros(n_items, dtype=bool)
+    status = np.select([noisy, hot], ["noisy", "stable_hot"], default="stable")
+
+    return {"runs": runs, **{col: stats[col] for col in STAT_COLUMNS[1:-1]}, "status": status}
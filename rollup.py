@@ -0,0 +1,356 @@
+"""Иерархическая свёртка профиля: пакет → модуль → класс → функция → строка."""
+
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from parser import group_codes
+
+
+ROOT, PACKAGE, MODULE, CLASS, FUNCTION, LINE = range(6)
+KIND_NAMES = ("корень", "пакет", "модуль", "класс", "функция", "строка")
+
+# по qualname функции: (file, start) -> "Class.method" или None, если исходник не найден
+QualnameResolver = Callable[[str, int], str | None]
+
+
+class _Node:
+    __slots__ = ("kind", "label", "children", "time", "function")
+
+    def __init__(self, kind: int, label: str, function: int = -1) -> None:
+        self.kind = kind
+        self.label = label
+        self.children: dict[tuple, _Node] = {}
+        self.time = 0.0
+        self.function = function
+
+    def child(self, kind: int, label: str, function: int = -1) -> "_Node":
+        key = (kind, label, function)
+        node = self.children.get(key)
+        if node is None:
+            node = self.children[key] = _Node(kind, label, function)
+        return node
+
+
+class RollupTree:
+    """Дерево свёртки в плоских массивах в порядке обхода в глубину.
+
+    Узел i — индекс во всех массивах; его поддерево занимает непрерывный
+    отрезок [i, end[i]), а дети упорядочены по убыванию времени. Суммы
+    поддеревьев посчитаны один раз при построении разностью префиксных
+    сумм, поэтому раскрытие узла и выборка видимой части стоят
+    O(видимых узлов), без перегруппировки профиля.
+
+    Attributes:
+        kind: тип узла (ROOT, PACKAGE, MODULE, CLASS, FUNCTION, LINE), int8
+        parent: родитель, -1 у корня, int32
+        depth: глубина от корня, int16
+        end: конец поддерева (не включая), int32
+        row: строка df_profile для узлов-строк, -1 у остальных, int64
+        lineno: номер строки для узлов-строк, 0 у остальных, int32
+        time: суммарное время поддерева, float64
+        hits: суммарные хиты поддерева, int64
+    """
+
+    def __init__(
+        self,
+        kind: np.ndarray,
+        parent: np.ndarray,
+        depth: np.ndarray,
+        end: np.ndarray,
+        row: np.ndarray,
+        lineno: np.ndarray,
+        labels: np.ndarray,
+        self_time: np.ndarray,
+        self_hits: np.ndarray,
+    ) -> None:
+        """Собирает дерево из массивов в порядке обхода (см. build_rollup).
+
+        Args:
+            kind: тип узла
+            parent: индекс родителя
+            depth: глубина узла
+            end: конец поддерева
+            row: строка df_profile у узлов-строк
+            lineno: номер строки у узлов-строк
+            labels: имена узлов-групп (у строк — None)
+            self_time: собственное время узла (у групп — 0)
+            self_hits: собственные хиты узла (у групп — 0)
+        """
+        self.kind = kind
+        self.parent = parent
+        self.depth = depth
+        self.end = end
+        self.row = row
+        self.lineno = lineno
+        self._labels = labels
+
+        starts = np.arange(len(kind))
+        time_prefix = np.concatenate(([0.0], np.cumsum(self_time)))
+        hits_prefix = np.concatenate(([0], np.cumsum(self_hits)))
+        self.time = time_prefix[end] - time_prefix[starts]
+        self.hits = hits_prefix[end] - hits_prefix[starts]
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def name(self, node: int) -> str:
+        """Имя узла для подписи: путь пакета, модуль, класс, функция или номер строки."""
+        if self.kind[node] == LINE:
+            return f"строка {self.lineno[node]}"
+        return self._labels[node]
+
+    def children(self, node: int, limit: int | None = None) -> np.ndarray:
+        """Дети узла по убыванию времени.
+
+        Args:
+            node: индекс узла
+            limit: вернуть не больше стольких самых долгих детей
+
+        Returns:
+            Массив индексов.
+        """
+        end = int(self.end[node])
+        if self.kind[node] == FUNCTION:
+            # строки — листья, они идут сплошным отрезком
+            stop = end if limit is None else min(end, node + 1 + limit)
+            return np.arange(node + 1, stop)
+
+        out = []
+        child = node + 1
+        while child < end and (limit is None or len(out) < limit):
+            out.append(child)
+            child = int(self.end[child])
+        return np.asarray(out, dtype=np.int64)
+
+    def path(self, node: int) -> list[int]:
+        """Узлы от корня до node включительно."""
+        out = [node]
+        while self.parent[out[-1]] >= 0:
+            out.append(int(self.parent[out[-1]]))
+        return out[::-1]
+
+    def window(self, node: int, depth: int, max_nodes: int) -> np.ndarray:
+        """Узел и его потомки не глубже depth уровней, не больше max_nodes узлов.
+
+        Уровни добираются по очереди; если уровень не помещается целиком,
+        берутся самые долгие узлы. Родитель каждого узла, кроме node,
+        тоже входит в результат.
+
+        Args:
+            node: корень окна
+            depth: сколько уровней ниже node показать
+            max_nodes: предел числа узлов
+
+        Returns:
+            Индексы узлов в порядке уровней.
+        """
+        out = [np.asarray([node], dtype=np.int64)]
+        taken = 1
+        frontier = out[0]
+
+        for _ in range(depth):
+            room = max_nodes - taken
+            if room <= 0 or not len(frontier):
+                break
+            level = np.concatenate([self.children(int(p), room) for p in frontier])
+            if len(level) > room:
+                level = np.sort(level[np.argpartition(-self.time[level], room - 1)[:room]])
+            out.append(level)
+            taken += len(level)
+            frontier = level
+
+        return np.concatenate(out)
+
+    def frame(self, nodes: np.ndarray) -> pd.DataFrame:
+        """Таблица узлов для показа.
+
+        Args:
+            nodes: индексы узлов
+
+        Returns:
+            DataFrame с колонками: node, parent, level, name, time_s, hits, pct
+            (pct — доля от времени всего профиля).
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        total = float(self.time[0]) if len(self) else 0.0
+        time = self.time[nodes]
+        return pd.DataFrame(
+            {
+                "node": nodes,
+                "parent": self.parent[nodes],
+                "level": [KIND_NAMES[k] for k in self.kind[nodes]],
+                "name": [self.name(int(i)) for i in nodes],
+                "time_s": time,
+                "hits": self.hits[nodes],
+                "pct": (time / total * 100).round(2) if total > 0 else 0.0,
+            }
+        )
+
+
+def build_rollup(df_profile: pd.DataFrame, qualname: QualnameResolver | None = None) -> RollupTree:
+    """Строит дерево свёртки профиля.
+
+    Каталоги файла (без общего для всех файлов префикса) становятся
+    вложенными пакетами, файл — модулем. Класс и имя функции берутся
+    из qualname по исходнику, поэтому одноимённые методы разных классов
+    разделяются; без исходника узел функции назван по имени из профиля
+    и висит прямо под модулем. Разные определения функции (по start)
+    всегда остаются разными узлами.
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        qualname: функция (file, start) -> qualname из исходника или None
+
+    Returns:
+        RollupTree; для пустого профиля — из одного корня.
+    """
+    fcodes, ffirst = group_codes(df_profile, ["file", "func", "start"])
+    n_funcs = len(ffirst)
+    if n_funcs == 0:
+        return RollupTree(
+            np.array([ROOT], dtype=np.int8),
+            np.array([-1], dtype=np.int32),
+            np.zeros(1, dtype=np.int16),
+            np.ones(1, dtype=np.int32),
+            np.full(1, -1, dtype=np.int64),
+            np.zeros(1, dtype=np.int32),
+            np.array(["профиль"], dtype=object),
+            np.zeros(1, dtype=np.float64),
+            np.zeros(1, dtype=np.int64),
+        )
+    times = df_profile["time_s"].to_numpy(dtype=np.float64)
+    hits = df_profile["hits"].to_numpy(dtype=np.int64)
+    func_time = np.bincount(fcodes, weights=times, minlength=n_funcs)
+
+    files = df_profile["file"].take(ffirst).to_numpy(dtype=object)
+    funcs = df_profile["func"].take(ffirst).to_numpy(dtype=object)
+    starts = df_profile["start"].take(ffirst).to_numpy(dtype=np.int64)
+
+    split = {f: _split_path(str(f)) for f in dict.fromkeys(files)}
+    prefix = _common_prefix([dirs for dirs, _ in split.values()])
+
+    absolute = len(files) and all(str(f).startswith("/") for f in split)
+    root = _Node(ROOT, ("/" if absolute else "") + "/".join(prefix) or "профиль")
+    for k in range(n_funcs):
+        dirs, module = split[files[k]]
+        chain = [root]
+        for directory in dirs[len(prefix) :]:
+            chain.append(chain[-1].child(PACKAGE, directory))
+        chain.append(chain[-1].child(MODULE, module))
+
+        func = str(funcs[k])
+        name = qualname(str(files[k]), int(starts[k])) if qualname is not None else None
+        # устаревший исходник может указать на другую функцию
+        if not name or name.rsplit(".", 1)[-1] != func:
+            name = func
+        owner, label = _split_qualname(name)
+        if owner:
+            chain.append(chain[-1].child(CLASS, owner))
+        chain.append(chain[-1].child(FUNCTION, label, k))
+
+        for node in chain:
+            node.time += func_time[k]
+
+    # обход групп в глубину, дети по убыванию времени
+    kinds: list[int] = []
+    labels: list[str] = []
+    parents: list[int] = []
+    depths: list[int] = []
+    function_of: list[int] = []
+    group_end: list[int] = []
+
+    stack: list[tuple[_Node | None, int, int]] = [(root, -1, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        if node is None:
+            group_end[parent] = len(kinds)
+            continue
+        index = len(kinds)
+        kinds.append(node.kind)
+        labels.append(node.label)
+        parents.append(parent)
+        depths.append(depth)
+        function_of.append(node.function)
+        group_end.append(index + 1)
+        # маркер выхода из поддерева, затем дети: первым снимается самый долгий
+        stack.append((None, index, 0))
+        for child in sorted(node.children.values(), key=lambda c: c.time):
+            stack.append((child, index, depth + 1))
+
+    # строки профиля вставляются сразу за своей функцией
+    n_groups = len(kinds)
+    function_of_arr = np.asarray(function_of, dtype=np.int64)
+    lines_per_func = np.bincount(fcodes, minlength=n_funcs)
+    group_lines = np.where(function_of_arr >= 0, lines_per_func[np.maximum(function_of_arr, 0)], 0)
+    shift = np.concatenate(([0], np.cumsum(group_lines)))
+    group_pos = np.arange(n_groups) + shift[:-1]
+    group_pos_ext = np.append(group_pos, n_groups + len(df_profile))
+
+    size = n_groups + len(df_profile)
+    kind = np.full(size, LINE, dtype=np.int8)
+    parent = np.empty(size, dtype=np.int32)
+    depth = np.empty(size, dtype=np.int16)
+    end = np.empty(size, dtype=np.int32)
+    row = np.full(size, -1, dtype=np.int64)
+    lineno = np.zeros(size, dtype=np.int32)
+    label = np.empty(size, dtype=object)
+    self_time = np.zeros(size, dtype=np.float64)
+    self_hits = np.zeros(size, dtype=np.int64)
+
+    parents_arr = np.asarray(parents, dtype=np.int64)
+    kind[group_pos] = kinds
+    parent[group_pos] = np.where(parents_arr >= 0, group_pos[np.maximum(parents_arr, 0)], -1)
+    depth[group_pos] = depths
+    end[group_pos] = group_pos_ext[np.asarray(group_end, dtype=np.int64)]
+    label[group_pos] = labels
+
+    func_node = np.empty(n_funcs, dtype=np.int64)
+    is_function = function_of_arr >= 0
+    func_node[function_of_arr[is_function]] = group_pos[is_function]
+
+    order = np.lexsort((-times, fcodes))
+    group_start = np.concatenate(([0], np.cumsum(lines_per_func)))
+    ordered_funcs = fcodes[order]
+    rank = np.arange(len(order)) - group_start[ordered_funcs]
+    owner = func_node[ordered_funcs]
+    line_pos = owner + 1 + rank
+
+    parent[line_pos] = owner
+    depth[line_pos] = depth[owner] + 1
+    end[line_pos] = line_pos + 1
+    row[line_pos] = order
+    lineno[line_pos] = df_profile["lineno"].to_numpy()[order]
+    self_time[line_pos] = times[order]
+    self_hits[line_pos] = hits[order]
+
+    return RollupTree(kind, parent, depth, end, row, lineno, label, self_time, self_hits)
+
+
+def _split_path(file_name: str) -> tuple[list[str], str]:
+    parts = [part for part in file_name.replace("\\", "/").split("/") if part]
+    if not parts:
+        return [], file_name
+    module = parts[-1]
+    return parts[:-1], module[:-3] if module.endswith(".py") else module
+
+
+def _common_prefix(paths: list[list[str]]) -> list[str]:
+    if not paths:
+        return []
+    prefix = paths[0]
+    for path in paths[1:]:
+        n = 0
+        while n < min(len(prefix), len(path)) and prefix[n] == path[n]:
+            n += 1
+        prefix = prefix[:n]
+    return prefix
+
+
+def _split_qualname(qualname: str) -> tuple[str, str]:
+    # "A.B.method" -> ("A.B", "method"); "A.outer.<locals>.inner" -> ("A", "outer.<locals>.inner")
+    parts = qualname.split(".")
+    cut = parts.index("<locals>") - 1 if "<locals>" in parts else len(parts) - 1
+    cut = max(cut, 0)
+    return ".".join(parts[:cut]), ".".join(parts[cut:])
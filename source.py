@@ -1,16 +1,132 @@
 """Утилиты для работы с исходными .py файлами."""
 
-from pathlib import Path
+import ast
+import hashlib
+from bisect import bisect_right
+from pathlib import Path, PurePosixPath
+from typing import Iterable, Mapping, NamedTuple
 
+import numpy as np
+import pandas as pd
 
-SrcFilesDict = dict[str, list[str]]
+from archive import SourceArchive
+from diagnostics import count, stage, timed
+
+# словарь загруженных файлов или SourceArchive, читающий файлы из архива по требованию
+SrcFilesDict = Mapping[str, list[str]]
+
+
+class UploadedSources(dict[str, list[str]]):
+    """Загруженные .py файлы {имя: строки} с хэшем содержимого в key.
+
+    key позволяет сравнивать наборы исходников между перезапусками
+    без хэширования всех строк, как SourceArchive.key для архивов.
+    """
+
+    def __init__(self, files: Mapping[str, bytes]) -> None:
+        """Декодирует файлы и считает ключ набора.
+
+        Args:
+            files: содержимое файлов по именам
+
+        Raises:
+            UnicodeDecodeError: если файл не в UTF-8
+        """
+        super().__init__((name, data.decode("utf-8").splitlines()) for name, data in files.items())
+        digest = hashlib.blake2b(digest_size=16)
+        for name in sorted(files):
+            digest.update(name.encode())
+            digest.update(b"\0")
+            digest.update(hashlib.blake2b(files[name], digest_size=16).digest())
+        self.key = digest.hexdigest()
+
+
+# маркер конца ключа в узле trie; не может совпасть с компонентом пути
+_TRIE_KEY = "/"
+
+
+class SourceIndex:
+    """Индекс ключей src_files для быстрого сопоставления с путями из профиля.
+
+    Строится один раз по набору загруженных файлов: хранит trie по
+    компонентам пути в обратном порядке (от имени файла к корню)
+    и словарь имён файлов в нижнем регистре. Результаты resolve
+    запоминаются.
+    """
+
+    def __init__(self, src_files: Iterable[str]) -> None:
+        """Строит индекс.
+
+        Args:
+            src_files: ключи словаря загруженных исходников (или сам словарь)
+        """
+        self._keys: set[str] = set()
+        self._trie: dict = {}
+        self._lower_names: dict[str, str] = {}
+        self._memo: dict[str, str] = {}
+
+        for key in src_files:
+            self._keys.add(key)
+
+            node = self._trie
+            for part in reversed(key.split("/")):
+                node = node.setdefault(part, {})
+            node[_TRIE_KEY] = key
+
+            self._lower_names.setdefault(Path(key).name.lower(), key)
+
+    def resolve(self, profile_filename: str) -> str:
+        """Находит ключ src_files, соответствующий пути из профиля.
+
+        Порядок проверки: полный путь, имя файла, самый длинный суффикс пути,
+        имя файла без учёта регистра. Сложность O(глубина пути).
+
+        Args:
+            profile_filename: путь к файлу из данных профилировщика
+
+        Returns:
+            Ключ из src_files или исходный путь, если не найден.
+        """
+        resolved = self._memo.get(profile_filename)
+        if resolved is None:
+            resolved = self._resolve(profile_filename)
+            self._memo[profile_filename] = resolved
+        return resolved
+
+    def _resolve(self, profile_filename: str) -> str:
+        p = Path(profile_filename)
+        pf = p.as_posix()
+        base = p.name
+
+        if pf in self._keys:
+            return pf
+
+        if base in self._keys:
+            return base
+
+        # самый глубокий ключ на пути по trie — самый длинный совпавший суффикс
+        longest = None
+        node = self._trie
+        for part in reversed(pf.split("/")):
+            node = node.get(part)
+            if node is None:
+                break
+            longest = node.get(_TRIE_KEY, longest)
+
+        if longest is not None:
+            return longest
+
+        return self._lower_names.get(base.lower(), pf)
 
 
 def resolve_source_file(profile_filename: str, src_files: SrcFilesDict) -> str:
     """Находит ключ в src_files, соответствующий пути из профиля.
 
     Пробует сопоставление от полного пути до имени файла,
-    с учётом регистра и суффиксов пути.
+    с учётом регистра и суффиксов пути. Точные совпадения проверяются
+    O(глубина пути) поисками в словаре; SourceIndex строится, только
+    если нужно сравнение без учёта регистра. Для множества вызовов
+    по одному набору файлов используйте SourceIndex.
 
     Args:
         profile_filename: путь к файлу из данных профилировщика
@@ -19,53 +135,97 @@ def resolve_source_file(profile_filename: str, src_files: SrcFilesDict) -> str:
     Returns:
         Ключ из src_files или исходный profile_filename, если не найден.
     """
-    p = Path(profile_filename)
-    pf = p.as_posix()
-    base = p.name
-
-    if pf in src_files:
-        return pf
+    pf = Path(profile_filename).as_posix()
+    parts = pf.split("/")
+    # тот же порядок, что в SourceIndex: полный путь, имя файла, суффиксы от длинных
+    for candidate in (pf, parts[-1], *("/".join(parts[-length:]) for length in range(len(parts) - 1, 1, -1))):
+        if candidate in src_files:
+            return candidate
 
-    if base in src_files:
-        return base
+    return SourceIndex(src_files).resolve(profile_filename)
 
-    parts = pf.split("/")
-    for length in range(len(parts), 0, -1):
-        sub = "/".join(parts[-length:])
-        if sub in src_files:
-            return sub
 
-    for key in src_files.keys():
-        if base.lower() == Path(key).name.lower():
-            return key
+def find_under_root(profile_filename: str, source_root: str | Path) -> Path | None:
+    """Ищет файл из профиля внутри каталога исходников на сервере.
 
-    return pf
+    Профиль обычно снят на другой машине или в другом каталоге, поэтому
+    к корню по очереди приставляются суффиксы пути от самого длинного
+    к имени файла. Каталог не обходится целиком: на файл приходится
+    не больше O(глубина пути) проверок существования.
 
+    Args:
+        profile_filename: путь к файлу из данных профилировщика
+        source_root: корень исходников на сервере
 
-def load_src_lines(file_name: str, src_files: SrcFilesDict) -> list[str] | None:
+    Returns:
+        Путь к найденному файлу или None.
+    """
+    root = Path(source_root).expanduser()
+    # пути из профиля с Windows тоже разбираются по компонентам
+    parts = [p for p in PurePosixPath(profile_filename.replace("\\", "/")).parts if p not in ("/", "..")]
+    if parts and parts[0].endswith(":"):
+        parts = parts[1:]
+
+    for i in range(len(parts)):
+        candidate = root.joinpath(*parts[i:])
+        if candidate.is_file():
+            return candidate
+
+    return None
+
+
+def load_src_lines(
+    file_name: str,
+    src_files: SrcFilesDict,
+    index: SourceIndex | None = None,
+    source_root: str | Path | None = None,
+) -> list[str] | None:
     """Загружает строки исходного файла.
 
-    Сначала ищет в src_files (загруженные пользователем),
-    затем пробует прочитать с диска.
+    Сначала ищет в src_files (загруженные пользователем), затем
+    в каталоге source_root, если он задан, и наконец пробует прочитать
+    файл с диска по пути из профиля.
 
     Args:
         file_name: путь из данных профилировщика
         src_files: словарь загруженных исходников
+        index: готовый SourceIndex по src_files, если есть
+        source_root: корень исходников на сервере
 
     Returns:
         Список строк файла или None, если файл не найден.
     """
-    resolved = resolve_source_file(file_name, src_files)
+    return _load_src_lines(file_name, src_files, index, source_root)[0]
+
+
+def _load_src_lines(
+    file_name: str,
+    src_files: SrcFilesDict,
+    index: SourceIndex | None,
+    source_root: str | Path | None,
+) -> tuple[list[str] | None, str]:
+    """load_src_lines, возвращающий ещё и источник: uploaded, from_disk или missing."""
+    if index is None:
+        resolved = resolve_source_file(file_name, src_files)
+    else:
+        resolved = index.resolve(file_name)
     src_lines = src_files.get(resolved)
 
-    if not src_lines:
-        try:
-            with open(resolved, "r", encoding="utf-8") as f:
-                src_lines = f.read().splitlines()
-        except OSError:
-            return None
+    if src_lines:
+        return src_lines, "uploaded"
+
+    if source_root is not None:
+        found = find_under_root(file_name, source_root)
+        if found is not None:
+            resolved = found
 
-    return src_lines
+    try:
+        with open(resolved, "r", encoding="utf-8") as f:
+            src_lines = f.read().splitlines()
+    except OSError:
+        return None, "missing"
+
+    return src_lines, "from_disk"
 
 
 def get_source_line(fn: str, lineno: int, src_files: SrcFilesDict) -> str:
@@ -90,6 +250,248 @@ def get_source_line(fn: str, lineno: int, src_files: SrcFilesDict) -> str:
     return ""
 
 
+class FunctionSpan(NamedTuple):
+    """Границы функции или метода в исходнике (номера строк 1-based)."""
+
+    start: int
+    def_line: int
+    end: int
+    qualname: str
+
+
+class FunctionIndex:
+    """Интервальный индекс всех функций и методов одного файла.
+
+    Строится одним проходом ast по исходнику. Поддерживает async def,
+    многострочные сигнатуры, однострочные def и вложенные функции;
+    имена квалифицируются как __qualname__ (Class.method, outer.<locals>.inner).
+    """
+
+    def __init__(self, src_lines: list[str]) -> None:
+        """Строит индекс.
+
+        Args:
+            src_lines: список строк исходника
+
+        Raises:
+            SyntaxError: если исходник не разбирается ast
+        """
+        tree = ast.parse("\n".join(src_lines))
+
+        found: list[FunctionSpan] = []
+        _collect_spans(tree.body, "", found)
+        found.sort(key=lambda span: (span.start, -span.end))
+
+        self.spans = found
+        self._starts = [span.start for span in found]
+        self._parents: list[int] = []
+        self._by_line: dict[int, int] = {}
+
+        stack: list[int] = []
+        for i, span in enumerate(found):
+            while stack and found[stack[-1]].end < span.start:
+                stack.pop()
+            self._parents.append(stack[-1] if stack else -1)
+            stack.append(i)
+
+            self._by_line.setdefault(span.start, i)
+            self._by_line.setdefault(span.def_line, i)
+
+    def find(self, start_line: int) -> FunctionSpan | None:
+        """Ищет функцию по строке начала из профилировщика.
+
+        Строка может указывать как на первый декоратор, так и на сам def;
+        если точного совпадения нет, возвращается самая вложенная функция,
+        содержащая строку.
+
+        Args:
+            start_line: строка начала функции из профилировщика (1-based)
+
+        Returns:
+            FunctionSpan или None.
+        """
+        i = self._by_line.get(start_line)
+        if i is not None:
+            return self.spans[i]
+        return self.containing(start_line)
+
+    def containing(self, lineno: int) -> FunctionSpan | None:
+        """Возвращает самую вложенную функцию, содержащую строку, за O(log n).
+
+        Args:
+            lineno: номер строки (1-based)
+
+        Returns:
+            FunctionSpan или None, если строка вне функций.
+        """
+        i = bisect_right(self._starts, lineno) - 1
+        while i >= 0:
+            if self.spans[i].end >= lineno:
+                return self.spans[i]
+            i = self._parents[i]
+        return None
+
+
+# поля с вложенными списками операторов (if/for/while/with/try и т.п.)
+_STMT_BODIES = ("body", "orelse", "finalbody")
+# поля со списками узлов, у каждого из которых есть body (except, case)
+_CLAUSE_BODIES = ("handlers", "cases")
+
+
+def _collect_spans(body: list[ast.stmt], prefix: str, out: list[FunctionSpan]) -> None:
+    # def может стоять только среди операторов, поэтому выражения не обходятся
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            qualname = prefix + node.name
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+            out.append(FunctionSpan(start, node.lineno, node.end_lineno, qualname))
+            _collect_spans(node.body, qualname + ".<locals>.", out)
+        elif isinstance(node, ast.ClassDef):
+            _collect_spans(node.body, prefix + node.name + ".", out)
+        else:
+            for field in _STMT_BODIES:
+                nested = getattr(node, field, None)
+                if nested:
+                    _collect_spans(nested, prefix, out)
+            for field in _CLAUSE_BODIES:
+                for clause in getattr(node, field, None) or ():
+                    _collect_spans(clause.body, prefix, out)
+
+
+def span_lines(src_lines: list[str], span: FunctionSpan) -> list[tuple[int, str]]:
+    """Возвращает строки функции (с декораторами) по её границам.
+
+    Args:
+        src_lines: список строк исходника
+        span: границы функции из FunctionIndex
+
+    Returns:
+        Список пар (номер_строки, текст_строки).
+    """
+    end = min(span.end, len(src_lines))
+    return [(ln, src_lines[ln - 1]) for ln in range(span.start, end + 1)]
+
+
+class SourceLineStore:
+    """Кэш строк исходников, загружаемых по одному разу на файл профиля.
+
+    Файл резолвится и читается (из src_files, source_root или с диска)
+    при первом обращении, дальше используется сохранённый массив строк.
+    Объект предназначен для хранения между перезапусками скрипта Streamlit.
+    """
+
+    def __init__(self, src_files: SrcFilesDict, source_root: str | Path | None = None) -> None:
+        """Создаёт хранилище.
+
+        Args:
+            src_files: словарь загруженных исходников
+            source_root: корень исходников на сервере; файлы из него
+                читаются только при первом обращении
+        """
+        self.src_files = src_files
+        self.source_root = source_root
+        self.index = SourceIndex(src_files)
+        self._arrays: dict[str, np.ndarray] = {}
+        self._lines: dict[str, list[str] | None] = {}
+        self._func_indexes: dict[str, FunctionIndex | None] = {}
+        # файлы, уже учтённые в счётчиках диагностики
+        self._counted: set[str] = set()
+
+    def lines(self, file_name: str) -> list[str] | None:
+        """Возвращает строки файла, загружая их при первом обращении.
+
+        Args:
+            file_name: путь из данных профилировщика
+
+        Returns:
+            Список строк файла или None, если файл не найден.
+        """
+        if file_name in self._lines:
+            return self._lines[file_name]
+
+        src_lines, origin = _load_src_lines(file_name, self.src_files, self.index, self.source_root)
+        # файлы из архива перечитываются из его LRU при каждом обращении, а считаются один раз
+        if file_name not in self._counted:
+            self._counted.add(file_name)
+            count(f"source.files_{origin}")
+        # строки из архива держит его LRU-кэш с бюджетом памяти, здесь их не копим
+        if not self._from_archive(file_name):
+            self._lines[file_name] = src_lines
+        return src_lines
+
+    def function_index(self, file_name: str) -> FunctionIndex | None:
+        """Возвращает FunctionIndex файла, строя его при первом обращении.
+
+        Args:
+            file_name: путь из данных профилировщика
+
+        Returns:
+            FunctionIndex или None, если файл не найден или не разбирается ast.
+        """
+        if file_name not in self._func_indexes:
+            src_lines = self.lines(file_name)
+            try:
+                with stage("source.function_index"):
+                    index = FunctionIndex(src_lines) if src_lines else None
+            except (SyntaxError, ValueError):
+                count("source.syntax_errors")
+                index = None
+            self._func_indexes[file_name] = index
+        return self._func_indexes[file_name]
+
+    def line_array(self, file_name: str) -> np.ndarray:
+        """Возвращает строки файла как object-массив NumPy (пустой, если файла нет).
+
+        Args:
+            file_name: путь из данных профилировщика
+        """
+        arr = self._arrays.get(file_name)
+        if arr is None:
+            arr = np.array(self.lines(file_name) or [], dtype=object)
+            if file_name in self._lines:
+                self._arrays[file_name] = arr
+        return arr
+
+    def _from_archive(self, file_name: str) -> bool:
+        return isinstance(self.src_files, SourceArchive) and self.index.resolve(file_name) in self.src_files
+
+    @timed("source.lookup")
+    def lookup(self, files: Iterable[str], linenos: Iterable[int]) -> np.ndarray:
+        """Векторно достаёт строки кода для пар (файл, номер строки).
+
+        Строки всех встреченных файлов склеиваются в один массив, после чего
+        для каждой пары вычисляется смещение и делается один take.
+        Стоимость загрузки пропорциональна числу различных файлов.
+
+        Args:
+            files: пути к файлам из профиля
+            linenos: номера строк (1-based)
+
+        Returns:
+            object-массив строк кода; "" там, где строка не найдена.
+        """
+        codes, uniques = pd.factorize(pd.Series(files), sort=False)
+        linenos = np.asarray(linenos, dtype=np.int64)
+        count("source.lookup_rows", len(linenos))
+
+        if isinstance(self.src_files, SourceArchive):
+            self.src_files.prefetch(self.index.resolve(fn) for fn in uniques if fn not in self._lines)
+
+        chunks = [self.line_array(fn) for fn in uniques]
+        lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        missing = int(lengths.sum())
+
+        # последний элемент — заглушка для строк вне диапазона файла
+        flat = np.concatenate(chunks + [np.array([""], dtype=object)])
+
+        row_len = lengths[codes]
+        valid = (codes >= 0) & (linenos >= 1) & (linenos <= row_len)
+        idx = np.where(valid, offsets[codes] + linenos - 1, missing)
+
+        return flat[idx]
+
+
 def extract_function_by_indent(src_lines: list[str], start_line: int) -> list[tuple[int, str]]:
     """Извлекает строки функции из исходника по отступу.
 
@@ -0,0 +1,303 @@
+"""Живой режим: слежение за периодически сбрасываемыми .lprof файлами."""
+
+import glob
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from packed import EXTENSION
+from parser import merge_profiles, parse_payload
+
+
+DEFAULT_POLL_INTERVAL = 1.0
+# у каждого наблюдателя свой поток и, возможно, процесс разбора
+MAX_WATCHERS = 8
+PROFILE_SUFFIXES = (".lprof", EXTENSION)
+
+
+class TailSnapshot(NamedTuple):
+    """Состояние живого профиля на момент последнего изменения.
+
+    key — хэш содержимого всех файлов (как у profiles_key), version растёт
+    при каждом изменении профиля, messages — ошибки и предупреждения
+    последнего разбора по файлам.
+    """
+
+    key: str
+    df: pd.DataFrame | None
+    files: int
+    version: int
+    updated_at: float
+    messages: tuple[str, ...] = ()
+
+
+class _TailedFile(NamedTuple):
+    signature: tuple[int, int]
+    digest: str
+    df: pd.DataFrame
+
+
+_EMPTY = TailSnapshot(key="", df=None, files=0, version=0, updated_at=0.0)
+
+
+class ProfileWatcher:
+    """Следит за путём или glob и держит актуальный объединённый профиль.
+
+    Фоновый поток раз в poll_interval проверяет файлы: по (mtime, size)
+    отбрасываются неизменённые, по хэшу содержимого — перезаписанные
+    без изменений; разбирается только то, что действительно поменялось.
+    Разбор идёт в отдельном процессе, поэтому unpickle большого файла
+    не держит GIL процесса со Streamlit. Профили файлов складываются
+    через merge_profiles; читатели получают готовый TailSnapshot
+    и никогда не ждут разбора.
+    """
+
+    def __init__(
+        self,
+        pattern: str,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_processes: bool = True,
+    ) -> None:
+        """Создаёт наблюдатель; поток запускается через start().
+
+        Args:
+            pattern: путь к .lprof, каталог (берутся все *.lprof и *.lpb) или glob
+            poll_interval: период проверки файлов, секунд
+            use_processes: разбирать в отдельном процессе, а не в потоке наблюдателя
+        """
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.use_processes = use_processes
+
+        self._files: dict[str, _TailedFile] = {}
+        self._failed: dict[str, tuple[int, int]] = {}
+        self._messages: dict[str, list[str]] = {}
+        self._snapshot = _EMPTY
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pool: ProcessPoolExecutor | None = None
+
+    def start(self) -> "ProfileWatcher":
+        """Запускает фоновый поток (повторный вызов ничего не делает)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"lprof-tail:{self.pattern}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает поток и процесс разбора."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def snapshot(self) -> TailSnapshot:
+        """Возвращает последнее состояние профиля без ожидания разбора."""
+        with self._lock:
+            return self._snapshot
+
+    def poll(self) -> bool:
+        """Один проход проверки файлов.
+
+        Returns:
+            True, если объединённый профиль изменился.
+        """
+        paths = self._paths()
+        changed = False
+
+        for name in set(self._files) - set(paths):
+            del self._files[name]
+            self._messages.pop(name, None)
+            changed = True
+        for name in set(self._failed) - set(paths):
+            del self._failed[name]
+            self._messages.pop(name, None)
+
+        for name in paths:
+            changed |= self._check(name)
+
+        if changed:
+            self._publish()
+
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                # поток не должен умирать из-за одного неудачного прохода
+                with self._lock:
+                    self._snapshot = self._snapshot._replace(messages=(f"{self.pattern}: {e}",))
+            self._stop.wait(self.poll_interval)
+
+    def _paths(self) -> list[str]:
+        path = Path(self.pattern).expanduser()
+        if path.is_dir():
+            return sorted(str(p) for p in path.iterdir() if p.suffix in PROFILE_SUFFIXES)
+        if path.is_file():
+            return [str(path)]
+        return sorted(glob.glob(str(path)))
+
+    def _check(self, name: str) -> bool:
+        """Перечитывает файл, если он изменился; возвращает True при новом профиле."""
+        try:
+            stat = os.stat(name)
+        except OSError:
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        known = self._files.get(name)
+        if known is not None and known.signature == signature or self._failed.get(name) == signature:
+            return False
+
+        try:
+            with open(name, "rb") as f:
+                payload = f.read()
+        except OSError:
+            return False
+
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        if known is not None and known.digest == digest:
+            self._files[name] = known._replace(signature=signature)
+            return False
+
+        df, messages = self._parse(payload)
+        self._messages[name] = [f"{Path(name).name}: {m}" for m in messages]
+
+        if df is None:
+            # файл мог быть недописан: прежний профиль остаётся, повтор — когда файл изменится
+            self._failed[name] = signature
+            self._publish_messages()
+            return False
+
+        self._failed.pop(name, None)
+        self._files[name] = _TailedFile(signature, digest, df)
+        return True
+
+    def _parse(self, payload: bytes) -> tuple[pd.DataFrame | None, list[str]]:
+        if not self.use_processes:
+            return parse_payload(payload)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1)
+
+        try:
+            return self._pool.submit(parse_payload, payload).result()
+        except BrokenProcessPool:
+            # процесс разбора не поднялся (например, spawn заново исполняет скрипт
+            # Streamlit как __main__) — дальше разбираем в потоке наблюдателя
+            self._pool = None
+            self.use_processes = False
+            return parse_payload(payload)
+
+    def _publish(self) -> None:
+        files = [self._files[name] for name in sorted(self._files)]
+        df = merge_profiles([f.df for f in files]) if files else None
+        key = hashlib.blake2b("".join(sorted(f.digest for f in files)).encode(), digest_size=16).hexdigest()
+
+        with self._lock:
+            self._snapshot = TailSnapshot(
+                key=key,
+                df=df,
+                files=len(files),
+                version=self._snapshot.version + 1,
+                updated_at=time.time(),
+                messages=self._all_messages(),
+            )
+
+    def _publish_messages(self) -> None:
+        with self._lock:
+            self._snapshot = self._snapshot._replace(messages=self._all_messages())
+
+    def _all_messages(self) -> tuple[str, ...]:
+        return tuple(m for name in sorted(self._messages) for m in self._messages[name])
+
+
+class WatcherLease:
+    """Ссылка одного владельца (сессии) на общий ProfileWatcher."""
+
+    def __init__(self, pool: "WatcherPool", pattern: str, watcher: ProfileWatcher) -> None:
+        self.pattern = pattern
+        self.watcher = watcher
+        self._pool = pool
+        self._released = False
+
+    def release(self) -> None:
+        """Освобождает ссылку; повторный вызов ничего не делает."""
+        if not self._released:
+            self._released = True
+            self._pool.release(self.pattern)
+
+
+class WatcherPool:
+    """Наблюдатели, разделяемые владельцами, с подсчётом ссылок.
+
+    На каждый путь или glob работает один ProfileWatcher, сколько бы
+    владельцев за ним ни следило. Когда последняя ссылка освобождена,
+    наблюдатель останавливается вместе с потоком и процессом разбора.
+    Одновременно работает не больше max_watchers наблюдателей.
+    """
+
+    def __init__(self, max_watchers: int = MAX_WATCHERS, **watcher_options) -> None:
+        """Создаёт пустой пул.
+
+        Args:
+            max_watchers: максимум одновременно работающих наблюдателей
+            **watcher_options: аргументы ProfileWatcher (poll_interval, use_processes)
+        """
+        self.max_watchers = max_watchers
+        self.watcher_options = watcher_options
+        self._lock = threading.Lock()
+        self._watchers: dict[str, tuple[ProfileWatcher, int]] = {}
+
+    def acquire(self, pattern: str) -> WatcherLease:
+        """Берёт ссылку на наблюдатель за pattern, запуская его при необходимости.
+
+        Args:
+            pattern: путь к .lprof, каталог или glob
+
+        Returns:
+            WatcherLease; её нужно освободить через release().
+
+        Raises:
+            RuntimeError: если уже работает max_watchers наблюдателей за другими путями
+        """
+        with self._lock:
+            watcher, refs = self._watchers.get(pattern, (None, 0))
+            if watcher is None:
+                if len(self._watchers) >= self.max_watchers:
+                    raise RuntimeError(
+                        f"Уже отслеживается {len(self._watchers)} путей — это максимум. "
+                        "Выключите живой режим в других сессиях или используйте тот же путь."
+                    )
+                watcher = ProfileWatcher(pattern, **self.watcher_options).start()
+            self._watchers[pattern] = (watcher, refs + 1)
+        return WatcherLease(self, pattern, watcher)
+
+    def release(self, pattern: str) -> None:
+        """Освобождает одну ссылку; последняя останавливает наблюдатель."""
+        with self._lock:
+            watcher, refs = self._watchers[pattern]
+            if refs > 1:
+                self._watchers[pattern] = (watcher, refs - 1)
+                return
+            del self._watchers[pattern]
+        # остановка ждёт текущий проход, поэтому идёт вне блокировки пула
+        watcher.stop()
+
+    def active(self) -> dict[str, int]:
+        """Работающие наблюдатели и число ссылок на каждый."""
+        with self._lock:
+            return {pattern: refs for pattern, (_, refs) in self._watchers.items()}
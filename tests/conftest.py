@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# модули приложения лежат в корне репозитория, а не в пакете
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser import PROFILE_COLUMNS, compact_profile  # noqa: E402
+
+
+@pytest.fixture
+def make_profile():
+    """Строит профиль схемы parse_lprof из кортежей (file, func, start, lineno, hits, time_s)."""
+
+    def make(rows: list[tuple[str, str, int, int, int, float]]) -> pd.DataFrame:
+        return compact_profile(pd.DataFrame(rows, columns=PROFILE_COLUMNS))
+
+    return make
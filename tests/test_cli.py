@@ -0,0 +1,27 @@
+import argparse
+
+import pytest
+
+from cli import _overhead_s, _positive_int
+
+
+@pytest.mark.parametrize("value", ["-50", "nan", "inf", "-inf", "1e400", "abc"])
+def test_overhead_rejects_invalid_values(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        _overhead_s(value)
+
+
+def test_overhead_is_given_in_nanoseconds():
+    assert _overhead_s("120") == pytest.approx(120e-9)
+    assert _overhead_s("0") == 0.0
+
+
+@pytest.mark.parametrize("value", ["0", "-3", "2.5", "abc"])
+def test_top_rejects_values_below_one(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        _positive_int(value)
+
+
+def test_top_accepts_positive_values():
+    assert _positive_int("1") == 1
+    assert _positive_int("50") == 50
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from diff import diff_func_summaries, diff_profiles
+
+
+def test_line_growing_from_zero_time_is_regression(make_profile):
+    before = make_profile([("a.py", "f", 1, 2, 10, 1.0), ("a.py", "f", 1, 3, 10, 0.0)])
+    after = make_profile([("a.py", "f", 1, 2, 10, 1.0), ("a.py", "f", 1, 3, 10, 0.5)])
+
+    diff = diff_profiles(before, after).set_index("lineno")
+
+    assert diff.loc[3, "status"] == "regression"
+    assert pd.isna(diff.loc[3, "rel_time"])
+    assert diff.loc[2, "status"] == "same"
+
+
+def test_line_staying_at_zero_time_is_same(make_profile):
+    before = make_profile([("a.py", "f", 1, 2, 10, 0.0)])
+    after = make_profile([("a.py", "f", 1, 2, 20, 0.0)])
+
+    assert diff_profiles(before, after)["status"].tolist() == ["same"]
+
+
+def test_function_growing_from_zero_time_is_regression(make_profile):
+    before = make_profile([("a.py", "f", 1, 2, 10, 1.0), ("a.py", "g", 5, 6, 10, 0.0)])
+    after = make_profile([("a.py", "f", 1, 2, 10, 0.5), ("a.py", "g", 5, 6, 10, 0.2)])
+
+    diff = diff_func_summaries(before, after).set_index("func")
+
+    assert diff.loc["g", "status"] == "regression"
+    assert diff.loc["f", "status"] == "improvement"
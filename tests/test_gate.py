@@ -0,0 +1,64 @@
+import json
+import pickle
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from cli import main
+from gate import GateThresholds, check_regressions
+
+
+def test_growth_from_zero_base_is_regression(make_profile):
+    baseline = make_profile([("a.py", "f", 1, 2, 100, 0.0), ("a.py", "g", 5, 6, 100, 1.0)])
+    candidate = make_profile([("a.py", "f", 1, 2, 100, 5.0), ("a.py", "g", 5, 6, 100, 1.0)])
+
+    report = check_regressions(baseline, candidate).set_index("func")
+
+    assert report.loc["f", "status"] == "regression"
+    assert report.loc["f", "verdict"] == "regression"
+    assert report.loc["g", "verdict"] == "ok"
+
+
+def test_zero_base_growth_below_absolute_threshold_is_ok(make_profile):
+    baseline = make_profile([("a.py", "f", 1, 2, 100, 0.0)])
+    candidate = make_profile([("a.py", "f", 1, 2, 100, 0.0005)])
+
+    report = check_regressions(baseline, candidate, GateThresholds(max_abs_s=0.001))
+
+    assert report["verdict"].tolist() == ["ok"]
+
+
+def test_few_hits_are_noise(make_profile):
+    baseline = make_profile([("a.py", "f", 1, 2, 5, 1.0)])
+    candidate = make_profile([("a.py", "f", 1, 2, 5, 3.0)])
+
+    report = check_regressions(baseline, candidate, GateThresholds(min_hits=10))
+
+    assert report["verdict"].tolist() == ["noise"]
+
+
+def _write_lprof(path, timings: dict) -> str:
+    path.write_bytes(pickle.dumps({"timings": timings, "unit": 1.0}))
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt", ["json", "junit"])
+def test_check_exit_code_and_report(tmp_path, capsys, fmt):
+    base = _write_lprof(tmp_path / "base.lprof", {("a.py", 1, "f"): [(2, 100, 0.0)], ("a.py", 5, "g"): [(6, 100, 1.0)]})
+    new = _write_lprof(tmp_path / "new.lprof", {("a.py", 1, "f"): [(2, 100, 5.0)], ("a.py", 5, "g"): [(6, 100, 1.0)]})
+    output = tmp_path / f"report.{fmt}"
+
+    code = main(["check", "--baseline", base, "--candidate", new, "--format", fmt, "-o", str(output)])
+
+    assert code == 1
+    assert "REGRESSION a.py:f" in capsys.readouterr().err
+    if fmt == "json":
+        payload = json.loads(output.read_text(encoding="utf-8"))
+        assert payload["passed"] is False
+        assert payload["regressions"] == 1
+    else:
+        suite = ET.fromstring(output.read_text(encoding="utf-8"))
+        assert suite.get("failures") == "1"
+        assert suite.find("testcase[@name='f']/failure") is not None
+
+    assert main(["check", "--baseline", base, "--candidate", base, "--format", fmt, "-o", str(output)]) == 0
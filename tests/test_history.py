@@ -0,0 +1,30 @@
+import threading
+
+from history import ProfileStore
+
+
+def test_concurrent_ingest_and_reads(tmp_path, make_profile):
+    store = ProfileStore(tmp_path / "history.sqlite")
+    rows = [(f"f{i % 5}.py", f"fn{i % 50}", i % 50, i, 1, 0.1) for i in range(5000)]
+    df = make_profile(rows)
+    errors = []
+
+    def work(worker: int) -> None:
+        try:
+            for run in range(4):
+                store.ingest(df, f"run{worker}-{run}")
+                store.runs()
+                store.function_trend("f1.py", "fn1")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(store.runs()) == 16
+    assert store.function_trend("f1.py", "fn1")["total_hits"].tolist() == [100] * 16
+    store.close()
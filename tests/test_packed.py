@@ -0,0 +1,50 @@
+import io
+import random
+
+import pytest
+
+from packed import PackedFormatError, PackedProfile, write_packed
+
+
+@pytest.fixture
+def packed_bytes(make_profile) -> bytes:
+    rows = [(f"mod{i % 3}.py", f"func{i % 7}", (i % 7) * 10, i, i + 1, 0.001 * i) for i in range(200)]
+    buf = io.BytesIO()
+    write_packed(make_profile(rows), buf)
+    return buf.getvalue()
+
+
+def test_roundtrip(packed_bytes):
+    profile = PackedProfile(packed_bytes)
+    assert len(profile.to_frame()) == 200
+    assert len(profile.function_rows("func3")) > 0
+    assert profile.function_rows("missing").empty
+
+
+def test_duplicate_names_are_format_errors(packed_bytes):
+    data = packed_bytes.replace(b"mod1.py", b"mod0.py", 1)
+    with pytest.raises(PackedFormatError):
+        PackedProfile(data)
+
+
+def test_invalid_utf8_name_is_format_error(packed_bytes):
+    data = packed_bytes.replace(b"func1", b"\xf8unc1", 1)
+    with pytest.raises(PackedFormatError):
+        PackedProfile(data)
+
+
+def test_corrupted_bytes_raise_only_format_errors(packed_bytes):
+    data = packed_bytes
+    rng = random.Random(0)
+    for _ in range(500):
+        mutated = bytearray(data)
+        for _ in range(rng.randint(1, 4)):
+            mutated[rng.randrange(8, len(mutated))] = rng.randrange(256)
+        try:
+            profile = PackedProfile(bytes(mutated))
+            profile.to_frame()
+            profile.summary()
+            for func in profile.funcs[:2]:
+                profile.function_rows(func)
+        except PackedFormatError:
+            pass
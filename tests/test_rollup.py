@@ -0,0 +1,18 @@
+from rollup import FUNCTION, LINE, ROOT, build_rollup
+
+
+def test_empty_profile_gives_root_only_tree(make_profile):
+    tree = build_rollup(make_profile([]))
+
+    assert tree.kind.tolist() == [ROOT]
+    assert len(tree.children(0)) == 0
+    assert tree.frame(tree.window(0, 3, 100))["time_s"].tolist() == [0.0]
+
+
+def test_lines_follow_their_function(make_profile):
+    tree = build_rollup(make_profile([("pkg/a.py", "f", 1, 2, 1, 0.5), ("pkg/a.py", "f", 1, 3, 1, 1.5)]))
+
+    functions = [node for node in range(len(tree.kind)) if tree.kind[node] == FUNCTION]
+    assert len(functions) == 1
+    assert tree.kind[functions[0] + 1 : functions[0] + 3].tolist() == [LINE, LINE]
+    assert tree.frame([0])["time_s"].tolist() == [2.0]
@@ -0,0 +1,23 @@
+import io
+import zipfile
+
+from archive import SourceArchive
+from diagnostics import Recorder, recording
+from source import SourceLineStore
+
+
+def test_files_are_counted_once_per_file():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr("pkg/a.py", "x = 1\ny = 2\n")
+    store = SourceLineStore(SourceArchive(buf))
+    recorder = Recorder()
+
+    with recording(recorder):
+        for _ in range(5):
+            codes = store.lookup(["/src/pkg/a.py", "/missing/b.py"], [2, 1])
+
+    counters = recorder.snapshot()["counters"]
+    assert codes.tolist() == ["y = 2", ""]
+    assert counters["source.files_uploaded"] == 1
+    assert counters["source.files_missing"] == 1
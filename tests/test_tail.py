@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from tail import WatcherPool
+
+
+def _tail_threads() -> set[str]:
+    return {t.name for t in threading.enumerate() if t.name.startswith("lprof-tail:")}
+
+
+def test_watcher_stops_when_last_lease_is_released(tmp_path):
+    pool = WatcherPool(poll_interval=0.01, use_processes=False)
+    pattern = str(tmp_path / "*.lprof")
+
+    first = pool.acquire(pattern)
+    second = pool.acquire(pattern)
+    assert first.watcher is second.watcher
+    assert pool.active() == {pattern: 2}
+
+    first.release()
+    first.release()
+    assert pool.active() == {pattern: 1}
+    assert f"lprof-tail:{pattern}" in _tail_threads()
+
+    second.release()
+    assert pool.active() == {}
+    assert f"lprof-tail:{pattern}" not in _tail_threads()
+
+
+def test_pool_limits_distinct_patterns(tmp_path):
+    pool = WatcherPool(max_watchers=1, poll_interval=0.01, use_processes=False)
+    lease = pool.acquire(str(tmp_path / "a"))
+
+    with pytest.raises(RuntimeError):
+        pool.acquire(str(tmp_path / "b"))
+
+    # тот же путь в пределах лимита
+    pool.acquire(str(tmp_path / "a")).release()
+    lease.release()
+    pool.acquire(str(tmp_path / "b")).release()
+    assert pool.active() == {}
@@ -1,23 +1,375 @@
 """UI-компоненты Streamlit для LProf Viewer."""
 
+import functools
+import html
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, TypeVar
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
-from source import SrcFilesDict, extract_function_by_indent, get_source_line, load_src_lines
-from parser import build_func_summary
+from archive import SourceArchive
+from diagnostics import Recorder, count, current, recording, stage, timed
+from source import SourceLineStore, SrcFilesDict, UploadedSources, extract_function_by_indent, span_lines
+from tail import ProfileWatcher
+from diff import diff_func_summaries, diff_profiles
+from jobs import ParseJob
+from overhead import Calibration, apply_overhead, calibrate, load_calibration, save_calibration
+from packed import PackedProfile
+from parser import CORRECTED_COLUMN, build_func_summary, memory_report
+from repeats import func_stats, line_stats, mean_profile, stack_runs
+from rollup import FUNCTION, RollupTree, build_rollup
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+LINE_PAGE_SIZES = [50, 100, 500, 1000]
+
+# функции длиннее рендерятся в оконном режиме
+HEATMAP_FULL_LIMIT = 500
+HEATMAP_WINDOW = 200
+HEATMAP_HOT_LINES = 20
+
+_HEATMAP_ROW_STYLE = "font-family: monospace; padding: 1px 6px; white-space: pre;"
+
+DIAGNOSTICS_KEY = "diagnostics"
+
+# живой режим перезапускает страницу не чаще, чем раз в столько секунд
+LIVE_MIN_REFRESH = 1.0
+LIVE_DEFAULT_REFRESH = 2.0
+# период опроса фонового разбора, секунд
+PARSE_PROGRESS_REFRESH = 0.5
+
+# сколько узлов иерархии рисуется на диаграмме и предлагается в списке
+ROLLUP_MAX_NODES = 400
+ROLLUP_MAX_OPTIONS = 200
+
+
+class LiveSettings(NamedTuple):
+    """Настройки живого режима из боковой панели."""
+
+    pattern: str
+    refresh_s: float
+
+
+class _FunctionView(NamedTuple):
+    """Подготовленные данные одного определения функции для отображения."""
+
+    file: str
+    start: int
+    title: str
+    code: pd.DataFrame | None
+    figure: Any = None
+
+
+def _memo(name: str, key: tuple, compute: Callable[[], Any], maxsize: int = 1) -> Any:
+    """Кэширует производные данные в session_state по ключу.
+
+    Ключ включает хэш профиля и параметры, от которых зависит результат,
+    поэтому перезапуск фрагмента без смены этих параметров ничего
+    не пересчитывает.
+
+    Args:
+        name: имя кэша (по одному на вид данных)
+        key: ключ результата
+        compute: функция без аргументов, вычисляющая результат
+        maxsize: сколько последних результатов хранить
+
+    Returns:
+        Сохранённый или только что вычисленный результат.
+    """
+    cache = st.session_state.setdefault("memo", {}).setdefault(name, OrderedDict())
+
+    if key in cache:
+        cache.move_to_end(key)
+        count("ui.memo_hits")
+        return cache[key]
+
+    count("ui.memo_misses")
+    with stage(f"ui.{name}"):
+        value = compute()
+    cache[key] = value
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+    return value
+
+
+def _fragment(name: str) -> Callable[[F], F]:
+    """st.fragment, внутри которого активна диагностика сессии.
+
+    Перезапуск фрагмента идёт в новом потоке без кода app.py, поэтому
+    Recorder сессии активируется заново, а весь вызов замеряется
+    как стадия name.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with recording(st.session_state.get(DIAGNOSTICS_KEY)), stage(name):
+                return func(*args, **kwargs)
+
+        return st.fragment(wrapper)  # type: ignore[return-value]
+
+    return decorator
+
+
+def enable_diagnostics() -> Recorder | None:
+    """Показывает переключатель диагностики и возвращает Recorder сессии.
+
+    Returns:
+        Recorder, если диагностика включена, иначе None.
+    """
+    if not st.sidebar.toggle("🩺 Диагностика", key="diagnostics_enabled"):
+        st.session_state.pop(DIAGNOSTICS_KEY, None)
+        return None
+
+    return st.session_state.setdefault(DIAGNOSTICS_KEY, Recorder())
+
+
+@st.fragment
+def render_diagnostics() -> None:
+    """Отображает таймеры стадий и счётчики сессии с выгрузкой в JSON.
+
+    Вызывается внутри `with st.sidebar`. Секция — фрагмент: кнопка
+    «Обновить» перечитывает замеры без перезапуска страницы.
+    """
+    recorder: Recorder | None = st.session_state.get(DIAGNOSTICS_KEY)
+    if recorder is None:
+        return
+
+    with st.expander("🩺 Диагностика", expanded=True):
+        cols = st.columns(2)
+        with cols[0]:
+            st.button("Обновить", key="diagnostics_refresh")
+        with cols[1]:
+            if st.button("Сбросить", key="diagnostics_reset"):
+                recorder.reset()
+
+        snapshot = recorder.snapshot()
+        st.caption(f"С {snapshot['started_at'][:19].replace('T', ' ')} UTC")
+
+        if snapshot["stages"]:
+            st.dataframe(
+                pd.DataFrame(snapshot["stages"]).set_index("name"),
+                use_container_width=True,
+                column_config={
+                    "total_s": st.column_config.NumberColumn(format="%.4f"),
+                    "mean_s": st.column_config.NumberColumn(format="%.4f"),
+                    "max_s": st.column_config.NumberColumn(format="%.4f"),
+                },
+            )
+        if snapshot["counters"]:
+            st.dataframe(
+                pd.Series(snapshot["counters"], name="value").rename_axis("counter"),
+                use_container_width=True,
+            )
+
+        st.download_button(
+            "📥 Скачать JSON",
+            recorder.to_json,
+            file_name="lprof_viewer_diagnostics.json",
+            mime="application/json",
+        )
+
+
+def live_controls() -> LiveSettings | None:
+    """Показывает в боковой панели настройки живого режима.
+
+    Returns:
+        LiveSettings, если слежение включено и путь задан, иначе None.
+    """
+    with st.sidebar.expander("📡 Живой режим"):
+        pattern = st.text_input(
+            "Путь, каталог или glob с .lprof",
+            key="live_pattern",
+            placeholder="/var/tmp/profiles/*.lprof",
+        ).strip()
+        refresh_s = st.number_input(
+            "Обновлять не чаще, чем раз в (с)",
+            min_value=LIVE_MIN_REFRESH,
+            value=LIVE_DEFAULT_REFRESH,
+            step=1.0,
+            key="live_refresh",
+        )
+        enabled = st.toggle("Следить за файлами", key="live_enabled", disabled=not pattern)
+
+    if not (enabled and pattern):
+        return None
+    return LiveSettings(pattern, float(refresh_s))
+
+
+def overhead_controls() -> float | None:
+    """Показывает в боковой панели калибровку накладных расходов line_profiler.
+
+    Калибровка текущей машины читается из файла при первом показе
+    и перезаписывается кнопкой; значение можно поправить вручную
+    (например, для профиля, снятого на другой машине).
+
+    Returns:
+        Накладные расходы на хит в секундах, если вычитание включено, иначе None.
+    """
+    with st.sidebar.expander("⏱ Накладные расходы line_profiler"):
+        if "overhead_calibration" not in st.session_state:
+            st.session_state["overhead_calibration"] = load_calibration()
+
+        if st.button("Откалибровать на этой машине", key="overhead_calibrate"):
+            with st.spinner("Калибровка…"):
+                try:
+                    calibration = calibrate()
+                except RuntimeError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state["overhead_calibration"] = calibration
+                    st.session_state["overhead_ns"] = calibration.overhead_s * 1e9
+                    try:
+                        save_calibration(calibration)
+                    except OSError as e:
+                        st.warning(f"Калибровка не сохранена: {e}")
+
+        calibration: Calibration | None = st.session_state["overhead_calibration"]
+        if calibration is not None:
+            st.caption(f"Калибровка от {calibration.created_at}: {calibration.overhead_s * 1e9:.0f} нс на хит")
+            st.session_state.setdefault("overhead_ns", calibration.overhead_s * 1e9)
+
+        overhead_ns = st.number_input("Нс на хит", min_value=0.0, step=10.0, key="overhead_ns")
+        enabled = st.toggle("Вычитать из времени строк", key="overhead_enabled", disabled=overhead_ns <= 0)
+
+    if not (enabled and overhead_ns > 0):
+        return None
+    return overhead_ns * 1e-9
+
 
+def render_live_status(watcher: ProfileWatcher, refresh_s: float) -> None:
+    """Показывает состояние живого профиля и перезапускает страницу при его изменении.
 
-def render_func_summary(df_profile: pd.DataFrame) -> pd.DataFrame:
+    Статус — фрагмент с run_every=refresh_s: он только читает готовый
+    снимок наблюдателя и вызывает полный перезапуск, когда версия профиля
+    выросла, поэтому страница обновляется не чаще refresh_s и никогда
+    не ждёт разбора файлов. Вызывается внутри `with st.sidebar`.
+
+    Args:
+        watcher: запущенный ProfileWatcher
+        refresh_s: минимальный период обновления страницы, секунд
+    """
+    st.fragment(_live_status, run_every=refresh_s)(watcher)
+
+
+def _live_status(watcher: ProfileWatcher) -> None:
+    snapshot = watcher.snapshot()
+
+    if snapshot.version != st.session_state.get("live_version", snapshot.version):
+        st.rerun()
+
+    if snapshot.version:
+        age = max(0.0, time.time() - snapshot.updated_at)
+        st.caption(f"📡 Файлов: {snapshot.files}, обновление №{snapshot.version}, {age:.0f} с назад")
+    else:
+        st.caption(f"📡 Ожидание файлов: {watcher.pattern}")
+
+    for message in snapshot.messages:
+        st.warning(message)
+
+
+def render_parse_progress(job: ParseJob, queued_ahead: int) -> None:
+    """Показывает ход фонового разбора с кнопкой отмены.
+
+    Фрагмент с run_every=PARSE_PROGRESS_REFRESH только читает поля задачи
+    и перезапускает страницу, когда она завершилась; сам разбор идёт
+    в ParseExecutor и перезапусками скрипта не прерывается.
+
+    Args:
+        job: задача разбора
+        queued_ahead: сколько задач стоит в очереди раньше неё
+    """
+    st.fragment(_parse_progress, run_every=PARSE_PROGRESS_REFRESH)(job, queued_ahead)
+
+
+def _parse_progress(job: ParseJob, queued_ahead: int) -> None:
+    if job.finished:
+        st.rerun()
+
+    if job.started_at is None:
+        text = f"⏳ В очереди на разбор, задач впереди: {queued_ahead}"
+    else:
+        size_mb = job.total_bytes / 2**20
+        text = f"⏳ Разбор профиля ({size_mb:.1f} МБ"
+        text += ", в отдельном процессе)" if job.use_process else ")"
+        if job.files_total > 1:
+            text += f": файл {min(job.files_done + 1, job.files_total)} из {job.files_total}"
+        if job.stage == "functions" and job.total:
+            text += f", функций {job.done:,} из {job.total:,}"
+        elif job.total:
+            text += f", прочитано {job.done / 2**20:.1f} из {job.total / 2**20:.1f} МБ"
+    st.progress(job.progress, text=text)
+
+    if st.button("Отменить разбор", key=f"cancel_{job.key}"):
+        job.cancel()
+        st.rerun()
+
+
+def _get_line_store(src_files: SrcFilesDict, source_root: str | None = None) -> SourceLineStore:
+    """Возвращает SourceLineStore сессии, пересоздавая его при смене исходников.
+
+    Args:
+        src_files: словарь загруженных исходников
+        source_root: корень исходников на сервере, если задан
+
+    Returns:
+        Хранилище строк, переживающее перезапуски скрипта.
+    """
+    store = st.session_state.get("line_store")
+    if store is not None and store.src_files is src_files and store.source_root == source_root:
+        return store
+
+    if isinstance(src_files, (SourceArchive, UploadedSources)):
+        # хэш загрузки посчитан один раз при её чтении, строки заново не хэшируются
+        content: Any = src_files.key
+    else:
+        content = tuple((name, tuple(lines)) for name, lines in sorted(src_files.items()))
+    fingerprint = hash((source_root, content))
+
+    if store is None or st.session_state.get("line_store_fingerprint") != fingerprint:
+        store = SourceLineStore(src_files, source_root)
+        st.session_state["line_store_fingerprint"] = fingerprint
+    else:
+        store.src_files = src_files
+
+    st.session_state["line_store"] = store
+    return store
+
+
+def _sources_key() -> int:
+    """Отпечаток текущих исходников для ключей _memo; вызывать после _get_line_store."""
+    return st.session_state["line_store_fingerprint"]
+
+
+@timed("ui.render_func_summary")
+def render_func_summary(
+    df_profile: pd.DataFrame,
+    profile_key: str,
+    packed: PackedProfile | None = None,
+) -> pd.DataFrame:
     """Отображает таблицу и бар-чарт статистики по функциям.
 
     Args:
         df_profile: DataFrame из parse_lprof
+        profile_key: хэш профиля для кэширования производных данных
+        packed: тот же профиль в формате .lpb — сводка тогда считается по его оглавлению
 
     Returns:
         func_summary DataFrame для использования в других секциях.
     """
-    func_summary = build_func_summary(df_profile)
+
+    def compute() -> tuple[pd.DataFrame, Any]:
+        return _func_summary_view(packed.summary() if packed is not None else build_func_summary(df_profile))
+
+    func_summary, fig = _memo("func_summary", (profile_key,), compute)
 
     cols = st.columns(2)
 
@@ -26,64 +378,266 @@ def render_func_summary(df_profile: pd.DataFrame) -> pd.DataFrame:
         st.dataframe(func_summary, use_container_width=True)
 
     with cols[1]:
-        fig = px.bar(
-            func_summary,
-            x="func",
-            y="total_time_s",
-            color="file",
-            title="Время исполнения по функциям (сек)",
-        )
         st.plotly_chart(fig, use_container_width=True)
 
     return func_summary
 
 
-def render_line_details(df_profile: pd.DataFrame, src_files: SrcFilesDict) -> None:
+@_fragment("ui.render_rollup")
+def render_rollup(
+    df_profile: pd.DataFrame,
+    src_files: SrcFilesDict,
+    profile_key: str,
+    source_root: str | None = None,
+) -> None:
+    """Отображает иерархию пакет → модуль → класс → функция → строка.
+
+    Дерево строится один раз на профиль и исходники (классы берутся
+    из FunctionIndex), дальше переход по узлам и диаграмма берут только
+    видимые узлы. Секция — фрагмент: навигация перезапускает только её.
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        src_files: словарь загруженных исходников
+        profile_key: хэш профиля для кэширования дерева
+        source_root: корень исходников на сервере, если задан
+    """
+    st.markdown("## 🌳 Иерархия времени")
+
+    line_store = _get_line_store(src_files, source_root)
+    tree = _memo(
+        "rollup",
+        (profile_key, _sources_key()),
+        lambda: build_rollup(df_profile, functools.partial(_qualname, line_store)),
+    )
+
+    focus = st.session_state.get("rollup_focus", 0)
+    if not 0 <= focus < len(tree):
+        focus = st.session_state["rollup_focus"] = 0
+
+    st.caption(" / ".join(tree.name(i) for i in tree.path(focus)))
+
+    children = tree.children(focus, ROLLUP_MAX_OPTIONS)
+    cols = st.columns([3, 1, 1, 2])
+    with cols[0]:
+        st.selectbox(
+            "Раскрыть узел",
+            [focus, *children.tolist()],
+            format_func=lambda i: "—" if i == focus else f"{tree.name(i)} ({tree.time[i]:.3f} s)",
+            key=f"rollup_child_{focus}",
+            on_change=_rollup_open,
+            args=(f"rollup_child_{focus}",),
+            disabled=not len(children),
+        )
+    with cols[1]:
+        st.button(
+            "⬆ Выше",
+            on_click=_rollup_set_focus,
+            args=(int(tree.parent[focus]),),
+            disabled=focus == 0,
+        )
+    with cols[2]:
+        depth = st.number_input("Уровней", min_value=1, max_value=5, value=2, key="rollup_depth")
+    with cols[3]:
+        chart = st.radio("Вид", ["Treemap", "Icicle"], horizontal=True, key="rollup_chart")
+
+    nodes = tree.window(focus, int(depth), ROLLUP_MAX_NODES)
+    st.plotly_chart(_rollup_figure(tree, nodes, chart), use_container_width=True)
+
+    if not len(children):
+        return
+    table = tree.frame(children)
+    if tree.kind[focus] == FUNCTION:
+        rows = df_profile.iloc[tree.row[children]]
+        table["Code"] = line_store.lookup(rows["file"], rows["lineno"])
+    st.dataframe(table.drop(columns=["node", "parent"]), use_container_width=True, hide_index=True)
+
+
+def _qualname(line_store: SourceLineStore, file_name: str, start: int) -> str | None:
+    index = line_store.function_index(file_name)
+    span = index.find(start) if index is not None else None
+    return span.qualname if span is not None else None
+
+
+def _rollup_open(widget_key: str) -> None:
+    _rollup_set_focus(st.session_state[widget_key])
+
+
+def _rollup_set_focus(node: int) -> None:
+    st.session_state["rollup_focus"] = max(int(node), 0)
+
+
+def _rollup_figure(tree: RollupTree, nodes: np.ndarray, chart: str) -> Any:
+    with stage("ui.plotly_figure"):
+        # собственное значение узла — остаток после показанных детей: с branchvalues="remainder"
+        # плотли не отбрасывает родителя из-за погрешности сумм или обрезанных детей
+        values = tree.time[nodes].copy()
+        if len(nodes) > 1:
+            # позиции родителей внутри окна, без массивов размером со всё дерево
+            order = np.argsort(nodes)
+            parents = order[np.searchsorted(nodes, tree.parent[nodes[1:]], sorter=order)]
+            np.subtract.at(values, parents, tree.time[nodes[1:]])
+        values = np.maximum(values, 0.0)
+
+        ids = nodes.astype(str)
+        parents_ids = np.where(np.arange(len(nodes)) == 0, "", tree.parent[nodes].astype(str))
+        labels = [tree.name(int(i)) for i in nodes]
+        trace = go.Treemap if chart == "Treemap" else go.Icicle
+        fig = go.Figure(
+            trace(
+                ids=ids,
+                labels=labels,
+                parents=parents_ids,
+                values=values,
+                branchvalues="remainder",
+                customdata=tree.time[nodes],
+                hovertemplate="%{label}<br>%{customdata:.4f} s<extra></extra>",
+            )
+        )
+        fig.update_layout(margin={"t": 10, "l": 0, "r": 0, "b": 0})
+    return fig
+
+
+def render_memory_report(df_profile: pd.DataFrame, profile_key: str) -> None:
+    """Отображает в боковой панели объём памяти профиля по колонкам.
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        profile_key: хэш профиля для кэширования отчёта
+    """
+    report = _memo("memory_report", (profile_key,), lambda: memory_report(df_profile))
+
+    with st.sidebar.expander("💾 Память профиля"):
+        st.caption(f"{report['bytes'].iloc[-1] / 1024 / 1024:.1f} МБ на {len(df_profile):,} строк")
+        st.dataframe(report, use_container_width=True, hide_index=True)
+
+
+def _func_summary_view(func_summary: pd.DataFrame) -> tuple[pd.DataFrame, Any]:
+    if "total_corrected_s" in func_summary.columns:
+        y, title = "total_corrected_s", "Время без накладных расходов по функциям (сек)"
+    else:
+        y, title = "total_time_s", "Время исполнения по функциям (сек)"
+    with stage("ui.plotly_figure"):
+        fig = px.bar(func_summary, x="func", y=y, color="file", title=title)
+    return func_summary, fig
+
+
+@_fragment("ui.render_line_details")
+def render_line_details(
+    df_profile: pd.DataFrame,
+    src_files: SrcFilesDict,
+    profile_key: str,
+    source_root: str | None = None,
+) -> None:
     """Отображает таблицу деталей профилирования по строкам с фильтром.
 
+    Строки один раз сортируются по времени, порог слайдера переводится
+    в позицию через searchsorted, и в таблицу отправляется только
+    текущая страница. CSV собирается только при нажатии на кнопку.
+    Секция — фрагмент: её виджеты перезапускают только её.
+
     Args:
         df_profile: DataFrame из parse_lprof
         src_files: словарь загруженных исходников
+        profile_key: хэш профиля для кэширования производных данных
+        source_root: корень исходников на сервере, если задан
     """
     st.markdown("## 🔍 Детали по строкам")
 
-    if not src_files:
+    if not src_files and source_root is None:
         st.info("💡 Загрузите .py файлы, чтобы видеть код в колонке Code.")
 
-    min_time = st.slider("Мин время (s)", 0.0, float(df_profile["time_s"].max()), 0.0)
+    order, sorted_times = _memo("time_index", (profile_key,), lambda: _time_index(df_profile))
 
-    filtered = df_profile[df_profile["time_s"] >= min_time].copy()
-    filtered["Code"] = filtered.apply(
-        lambda r: get_source_line(r["file"], r["lineno"], src_files), axis=1
+    corrected = CORRECTED_COLUMN in df_profile.columns
+    min_time = st.slider(
+        "Мин исправленное время (s)" if corrected else "Мин время (s)",
+        0.0,
+        float(sorted_times[-1]),
+        0.0,
     )
 
+    # строки со временем >= min_time — хвост возрастающего индекса
+    first = int(np.searchsorted(sorted_times, min_time, side="left"))
+    selected = order[first:][::-1]
+    total = len(selected)
+
+    cols = st.columns([1, 1, 3])
+    with cols[0]:
+        page_size = st.selectbox("Строк на странице", LINE_PAGE_SIZES, key="line_page_size")
+    with cols[1]:
+        pages = max(1, -(-total // page_size))
+        # после сдвига порога страниц может стать меньше
+        if st.session_state.get("line_page", 1) > pages:
+            st.session_state["line_page"] = pages
+        page = st.number_input("Страница", min_value=1, max_value=pages, key="line_page")
+
+    lo = min((page - 1) * page_size, total)
+    hi = min(lo + page_size, total)
+    line_store = _get_line_store(src_files, source_root)
+
+    page_rows = df_profile.iloc[selected[lo:hi]]
+    page_rows = page_rows.assign(Code=line_store.lookup(page_rows["file"], page_rows["lineno"]))
+
+    with cols[2]:
+        st.caption(f"Строки {lo + 1 if total else 0}–{hi} из {total:,} (всего в профиле {len(df_profile):,})")
+
     st.dataframe(
-        filtered[["file", "func", "lineno", "hits", "time_s", "Code"]].sort_values(
-            by="time_s", ascending=False
-        ),
+        page_rows[["file", "func", "lineno", "hits", "time_s", *([CORRECTED_COLUMN] if corrected else []), "Code"]],
         use_container_width=True,
         hide_index=True,
     )
 
+    # CSV собирается по клику вне потока скрипта — замер пишется в Recorder сессии явно
+    recorder = current()
+
+    def build_csv() -> bytes:
+        with recording(recorder), stage("ui.csv_export"):
+            rows = df_profile.iloc[selected]
+            rows = rows.assign(Code=line_store.lookup(rows["file"], rows["lineno"]))
+            return rows.to_csv(index=False).encode("utf-8")
+
     st.download_button(
         "📥 Скачать CSV",
-        filtered.to_csv(index=False).encode("utf-8"),
+        build_csv,
         file_name="profile_lines.csv",
         mime="text/csv",
     )
 
 
+def _time_index(df_profile: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Возвращает порядок строк по возрастанию времени и отсортированные времена.
+
+    Если в профиле есть исправленное время, строки ранжируются по нему.
+    """
+    times = df_profile[CORRECTED_COLUMN if CORRECTED_COLUMN in df_profile.columns else "time_s"].to_numpy()
+    order = np.argsort(times, kind="stable")
+    return order, times[order]
+
+
+@_fragment("ui.render_function_viewer")
 def render_function_viewer(
     df_profile: pd.DataFrame,
     func_summary: pd.DataFrame,
     src_files: SrcFilesDict,
+    profile_key: str,
+    source_root: str | None = None,
+    packed: PackedProfile | None = None,
 ) -> None:
     """Отображает секцию просмотра кода выбранной функции.
 
+    Секция — фрагмент; таблицы строк и графики выбранной функции
+    кэшируются по хэшу профиля, исходникам и имени функции. Для профиля
+    .lpb строки функции берутся срезом его колонок, а не фильтром всего
+    DataFrame.
+
     Args:
         df_profile: DataFrame из parse_lprof
         func_summary: DataFrame из build_func_summary
         src_files: словарь загруженных исходников
+        profile_key: хэш профиля для кэширования производных данных
+        source_root: корень исходников на сервере, если задан
+        packed: тот же профиль в формате .lpb, если есть
     """
     st.markdown("## 📌 Просмотр кода функции")
 
@@ -92,23 +646,234 @@ def render_function_viewer(
     if not sel_func:
         return
 
-    df_func = df_profile[df_profile["func"] == sel_func]
+    line_store = _get_line_store(src_files, source_root)
+
+    def compute() -> list[_FunctionView]:
+        if packed is not None:
+            df_func = packed.function_rows(sel_func)
+        else:
+            df_func = df_profile[df_profile["func"] == sel_func]
+        views = _function_views(df_func, sel_func, line_store, _build_code_df)
+        return [view._replace(figure=_line_chart_figure(view.code)) for view in views]
 
-    for (file_name, start_line), df_one_func in df_func.groupby(["file", "start"]):
-        src_lines = load_src_lines(file_name, src_files)
+    views = _memo("function_views", (profile_key, _sources_key(), sel_func), compute, maxsize=16)
+
+    for view in views:
+        if view.code is None:
+            st.warning(f"Исходник для {view.file} не найден.")
+            continue
+
+        with st.expander(f"📂 {view.title} — {view.file}:{view.start}"):
+            _render_heatmap(view.code, key=f"{view.file}:{view.start}")
+            if view.figure is not None:
+                st.plotly_chart(view.figure, use_container_width=True)
+
+
+@_fragment("ui.render_diff")
+def render_diff(
+    df_before: pd.DataFrame,
+    df_after: pd.DataFrame,
+    src_files: SrcFilesDict,
+    before_key: str,
+    after_key: str,
+    source_root: str | None = None,
+) -> None:
+    """Отображает сравнение текущего профиля с базовым.
+
+    Args:
+        df_before: DataFrame из parse_lprof для базового прогона
+        df_after: DataFrame из parse_lprof для текущего прогона
+        src_files: словарь загруженных исходников
+        before_key: хэш базового профиля
+        after_key: хэш текущего профиля
+        source_root: корень исходников на сервере, если задан
+    """
+    st.markdown("## ⚖️ Сравнение с базовым профилем")
+
+    diff_key = (before_key, after_key)
+    func_diff, df_diff, top = _memo("diff", diff_key, lambda: _diff_view(df_before, df_after))
+
+    cols = st.columns(2)
+    with cols[0]:
+        st.markdown("#### По функциям")
+        st.dataframe(func_diff, use_container_width=True, hide_index=True)
+    with cols[1]:
+        st.markdown("#### Строки с наибольшим изменением")
+        st.dataframe(top, use_container_width=True, hide_index=True)
+
+    sel_func = st.selectbox("Функция для сравнения", func_diff["func"].unique(), key="diff_func")
+
+    if not sel_func:
+        return
+
+    line_store = _get_line_store(src_files, source_root)
+
+    def compute() -> list[_FunctionView]:
+        # удалённые строки пронумерованы по базовому прогону и в текущий код не ложатся
+        df_func = df_diff[(df_diff["func"] == sel_func) & (df_diff["status"] != "removed")]
+        return _function_views(df_func, sel_func, line_store, _build_diff_code_df)
+
+    views = _memo("diff_views", (*diff_key, _sources_key(), sel_func), compute, maxsize=16)
+
+    for view in views:
+        if view.code is None:
+            st.warning(f"Исходник для {view.file} не найден.")
+            continue
+
+        with st.expander(f"⚖️ {view.title} — {view.file}:{view.start}"):
+            st.markdown(_diff_heatmap_html(view.code), unsafe_allow_html=True)
+
+
+def profile_with_overhead(df_profile: pd.DataFrame, overhead_s: float, key: str) -> pd.DataFrame:
+    """Профиль с колонкой исправленного времени, закэшированный в сессии.
+
+    Args:
+        df_profile: DataFrame из parse_lprof
+        overhead_s: накладные расходы на хит, секунд
+        key: ключ профиля вместе со значением накладных расходов
+
+    Returns:
+        DataFrame из apply_overhead.
+    """
+    return _memo("overhead_profile", (key,), lambda: apply_overhead(df_profile, overhead_s))
+
+
+def runs_mean_profile(frames: list[pd.DataFrame], runs_key: str) -> pd.DataFrame:
+    """Средний по повторным прогонам профиль для обычных секций страницы.
+
+    Args:
+        frames: DataFrame прогонов из parse_lprof
+        runs_key: ключ набора прогонов для кэширования производных данных
+
+    Returns:
+        DataFrame в схеме parse_lprof.
+    """
+    return _runs_view(frames, runs_key)[0]
+
+
+@_fragment("ui.render_run_stats")
+def render_run_stats(
+    frames: list[pd.DataFrame],
+    src_files: SrcFilesDict,
+    runs_key: str,
+    source_root: str | None = None,
+) -> None:
+    """Отображает разброс времени по повторным прогонам.
+
+    Строки и функции делятся на стабильно горячие (stable_hot), шумные
+    (noisy — доверительный интервал шире NOISE_REL_CI от среднего или
+    задевает ноль) и стабильные остальные; тепловая карта выбранной
+    функции красит шумные строки серым, чтобы не гоняться за ними.
+
+    Args:
+        frames: DataFrame прогонов из parse_lprof
+        src_files: словарь загруженных исходников
+        runs_key: ключ набора прогонов для кэширования производных данных
+        source_root: корень исходников на сервере, если задан
+    """
+    st.markdown("## 📈 Повторные прогоны")
+
+    _, funcs, lines = _runs_view(frames, runs_key)
+    status_counts = lines["status"].value_counts()
+    st.caption(
+        f"Прогонов: {len(frames)}. Строк: стабильно горячих {status_counts.get('stable_hot', 0):,}, "
+        f"шумных {status_counts.get('noisy', 0):,}, стабильных {status_counts.get('stable', 0):,}. "
+        "Интервалы — 95% для среднего."
+    )
+
+    hide_noisy = st.toggle("Скрыть шумные", key="runs_hide_noisy")
+    if hide_noisy:
+        funcs = funcs[funcs["status"] != "noisy"]
+        lines = lines[lines["status"] != "noisy"]
+
+    cols = st.columns(2)
+    with cols[0]:
+        st.markdown("#### По функциям")
+        st.dataframe(funcs, use_container_width=True, hide_index=True)
+    with cols[1]:
+        st.markdown("#### Самые долгие строки")
+        st.dataframe(lines.head(50), use_container_width=True, hide_index=True)
+
+    sel_func = st.selectbox("Функция", funcs["func"].unique(), key="runs_func")
+
+    if not sel_func:
+        return
+
+    line_store = _get_line_store(src_files, source_root)
+
+    def compute() -> list[_FunctionView]:
+        _, _, all_lines = _runs_view(frames, runs_key)
+        return _function_views(all_lines[all_lines["func"] == sel_func], sel_func, line_store, _build_stats_code_df)
+
+    views = _memo("runs_views", (runs_key, _sources_key(), sel_func), compute, maxsize=16)
+
+    for view in views:
+        if view.code is None:
+            st.warning(f"Исходник для {view.file} не найден.")
+            continue
+
+        with st.expander(f"📈 {view.title} — {view.file}:{view.start}"):
+            st.markdown(_stats_heatmap_html(view.code), unsafe_allow_html=True)
+
+
+def _runs_view(frames: list[pd.DataFrame], runs_key: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    def compute() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        stack = stack_runs(frames)
+        return mean_profile(stack), func_stats(stack), line_stats(stack)
+
+    return _memo("runs", (runs_key,), compute)
+
+
+def _diff_view(df_before: pd.DataFrame, df_after: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    func_diff = diff_func_summaries(df_before, df_after)
+    df_diff = diff_profiles(df_before, df_after)
+    top = df_diff.iloc[np.argsort(-np.abs(df_diff["delta_time_s"].to_numpy()))[:50]]
+    return func_diff, df_diff, top
+
+
+def _function_views(
+    df_func: pd.DataFrame,
+    func_name: str,
+    line_store: SourceLineStore,
+    build_code_df: Callable[[list[tuple[int, str]], pd.DataFrame], pd.DataFrame],
+) -> list[_FunctionView]:
+    """Готовит таблицы строк для каждого определения функции (file, start).
+
+    Args:
+        df_func: строки профиля (или сравнения) только для этой функции
+        func_name: имя функции из профиля
+        line_store: хранилище исходников
+        build_code_df: сборщик таблицы строк (_build_code_df или _build_diff_code_df)
+
+    Returns:
+        Список _FunctionView; code равен None, если исходник не найден.
+    """
+    views = []
+
+    for (file_name, start_line), df_one_func in df_func.groupby(["file", "start"], observed=True):
+        src_lines = line_store.lines(file_name)
 
         if not src_lines:
-            st.warning(f"Исходник для {file_name} не найден.")
+            views.append(_FunctionView(file_name, int(start_line), func_name, None))
             continue
 
-        func_lines = extract_function_by_indent(src_lines, int(start_line))
-        df_code = _build_code_df(func_lines, df_one_func)
+        func_index = line_store.function_index(file_name)
+        span = func_index.find(int(start_line)) if func_index else None
+
+        if span is not None:
+            func_lines = span_lines(src_lines, span)
+            title = span.qualname
+        else:
+            # исходник не разбирается ast — остаётся эвристика по отступам
+            func_lines = extract_function_by_indent(src_lines, int(start_line))
+            title = func_name
 
-        with st.expander(f"📂 {sel_func} — {file_name}:{start_line}"):
-            _render_heatmap(df_code)
-            _render_line_chart(df_code)
+        views.append(_FunctionView(file_name, int(start_line), title, build_code_df(func_lines, df_one_func)))
 
+    return views
 
+
+@timed("ui.build_code_df")
 def _build_code_df(
     func_lines: list[tuple[int, str]],
     df_one_func: pd.DataFrame,
@@ -120,71 +885,367 @@ def _build_code_df(
         df_one_func: строки профиля только для этой функции
 
     Returns:
-        DataFrame с колонками: Line, Hits, Time (s), Code
+        DataFrame с колонками: Line, Hits, Time (s), Code; если в профиле
+        есть исправленное время — ещё Corrected (s) перед Code
+    """
+    line_numbers = np.fromiter((ln for ln, _ in func_lines), dtype=np.int64, count=len(func_lines))
+    value_columns = ["hits", "time_s"]
+    if CORRECTED_COLUMN in df_one_func.columns:
+        value_columns.append(CORRECTED_COLUMN)
+
+    # одно выравнивание по lineno вместо булевой маски на каждую строку
+    prof = (
+        df_one_func.drop_duplicates("lineno")
+        .set_index("lineno")[value_columns]
+        .reindex(line_numbers, fill_value=0)
+    )
+
+    columns = {
+        "Line": line_numbers,
+        "Hits": prof["hits"].to_numpy(dtype=np.int64),
+        "Time (s)": prof["time_s"].to_numpy(dtype=np.float64),
+    }
+    if CORRECTED_COLUMN in prof.columns:
+        columns["Corrected (s)"] = prof[CORRECTED_COLUMN].to_numpy(dtype=np.float64)
+    columns["Code"] = [text for _, text in func_lines]
+
+    return pd.DataFrame(columns)
+
+
+def _heat_column(df_code: pd.DataFrame) -> str:
+    """Колонка df_code, по которой красится тепловая карта: исправленное время, если оно есть."""
+    return "Corrected (s)" if "Corrected (s)" in df_code.columns else "Time (s)"
+
+
+@timed("ui.heatmap_html")
+def _heatmap_html(df_code: pd.DataFrame, max_time: float | None = None) -> str:
+    """Собирает HTML тепловой карты строк кода.
+
+    Цвета и подписи считаются векторно по колонкам, итоговый HTML
+    склеивается одним join.
+
+    Args:
+        df_code: DataFrame из _build_code_df (или его подмножество строк)
+        max_time: время, соответствующее максимальной яркости;
+            по умолчанию максимум по df_code
+
+    Returns:
+        HTML-строка для st.markdown.
+    """
+    if df_code.empty:
+        return ""
+
+    lines = df_code["Line"].to_numpy()
+    hits = df_code["Hits"].to_numpy()
+    times = df_code[_heat_column(df_code)].to_numpy()
+
+    if max_time is None:
+        max_time = float(times.max())
+
+    hot = times > 0
+    red = np.zeros(len(times), dtype=np.int64)
+    if max_time > 0:
+        red[hot] = (255 * times[hot] / max_time).astype(np.int64)
+
+    styles = np.where(hot, np.char.mod("background-color: rgba(%d, 80, 80, 0.35);", red), "")
+    time_labels = np.char.rjust(np.where(hot, np.char.mod("%.4fs", times), " " * 10), 10)
+    hits_labels = np.char.rjust(np.where(hits > 0, np.char.mod("×%d", hits), "   "), 6)
+    label_columns = [np.char.mod("%4d", lines), time_labels, hits_labels]
+    if "Corrected (s)" in df_code.columns:
+        # рядом с исправленным — исходное время из профиля
+        raw = df_code["Time (s)"].to_numpy()
+        label_columns.append(np.char.rjust(np.where(raw > 0, np.char.mod("(%.4fs)", raw), ""), 12))
+    labels = _join_labels(*label_columns)
+
+    return _join_heatmap_rows(lines, styles, labels, df_code["Code"])
+
+
+def _join_labels(*columns: np.ndarray) -> np.ndarray:
+    labels = columns[0]
+    for col in columns[1:]:
+        labels = np.char.add(np.char.add(labels, "  "), col)
+    return np.char.add(labels, "  ")
+
+
+def _join_heatmap_rows(
+    lines: np.ndarray,
+    styles: np.ndarray,
+    labels: np.ndarray,
+    codes: pd.Series,
+) -> str:
+    """Склеивает строки тепловой карты в HTML одним join.
+
+    Разрывы в номерах строк (когда показана только часть функции)
+    отмечаются строкой «⋯».
+    """
+    gaps = np.concatenate(([False], np.diff(lines) > 1))
+    gap_div = f"<div style='{_HEATMAP_ROW_STYLE} color: #888;'>   ⋯</div>"
+
+    return "".join(
+        (gap_div if gap else "")
+        + f"<div style='{style} {_HEATMAP_ROW_STYLE}'>"
+        f"<span style='color: #888; user-select: none;'>{label}</span>"
+        f"{html.escape(code)}"
+        "</div>"
+        for gap, style, label, code in zip(gaps, styles, labels, codes)
+    )
+
+
+def _heatmap_window(df_code: pd.DataFrame, first: int, size: int, hot_lines: int) -> pd.DataFrame:
+    """Выбирает строки для оконного режима: окно плюс самые горячие строки.
+
+    Args:
+        df_code: DataFrame из _build_code_df
+        first: позиция первой строки окна в df_code
+        size: размер окна в строках
+        hot_lines: сколько самых горячих строк показать вне окна
+
+    Returns:
+        Подмножество df_code в исходном порядке строк.
     """
-    rows = []
-    for ln, text in func_lines:
-        prof_row = df_one_func[df_one_func["lineno"] == ln]
-        time_s = float(prof_row["time_s"].iloc[0]) if not prof_row.empty else 0.0
-        hits = int(prof_row["hits"].iloc[0]) if not prof_row.empty else 0
-        rows.append({"Line": ln, "Hits": hits, "Time (s)": time_s, "Code": text})
+    mask = np.zeros(len(df_code), dtype=bool)
+    mask[first : first + size] = True
+
+    times = df_code[_heat_column(df_code)].to_numpy()
+    n_hot = min(hot_lines, int((times > 0).sum()))
+    if n_hot:
+        mask[np.argpartition(times, -n_hot)[-n_hot:]] = True
 
-    return pd.DataFrame(rows)
+    return df_code[mask]
+
+
+@timed("ui.build_diff_code_df")
+def _build_diff_code_df(
+    func_lines: list[tuple[int, str]],
+    df_one_func: pd.DataFrame,
+) -> pd.DataFrame:
+    """Собирает DataFrame строк функции с данными сравнения.
+
+    Args:
+        func_lines: список (номер_строки, текст) функции в текущем исходнике
+        df_one_func: строки из diff_profiles только для этой функции
+
+    Returns:
+        DataFrame с колонками: Line, Before (s), After (s), Delta (s), Rel, Code
+    """
+    line_numbers = np.fromiter((ln for ln, _ in func_lines), dtype=np.int64, count=len(func_lines))
+
+    prof = (
+        df_one_func.drop_duplicates("lineno")
+        .set_index("lineno")[["time_before_s", "time_after_s", "delta_time_s", "rel_time"]]
+        .reindex(line_numbers)
+    )
+
+    return pd.DataFrame(
+        {
+            "Line": line_numbers,
+            "Before (s)": prof["time_before_s"].fillna(0.0).to_numpy(),
+            "After (s)": prof["time_after_s"].fillna(0.0).to_numpy(),
+            "Delta (s)": prof["delta_time_s"].fillna(0.0).to_numpy(),
+            "Rel": prof["rel_time"].to_numpy(),
+            "Code": [text for _, text in func_lines],
+        }
+    )
+
+
+@timed("ui.diff_heatmap_html")
+def _diff_heatmap_html(df_code: pd.DataFrame) -> str:
+    """Собирает HTML тепловой карты изменений.
+
+    Замедлившиеся строки окрашиваются в красный, ускорившиеся — в зелёный,
+    яркость пропорциональна абсолютному изменению времени.
+
+    Args:
+        df_code: DataFrame из _build_diff_code_df
+
+    Returns:
+        HTML-строка для st.markdown.
+    """
+    if df_code.empty:
+        return ""
+
+    lines = df_code["Line"].to_numpy()
+    delta = df_code["Delta (s)"].to_numpy()
+    rel = df_code["Rel"].to_numpy()
+
+    max_abs = float(np.abs(delta).max())
+    alpha = 0.1 + 0.5 * np.abs(delta) / max_abs if max_abs > 0 else np.zeros(len(delta))
+
+    styles = np.select(
+        [delta > 0, delta < 0],
+        [
+            np.char.mod("background-color: rgba(255, 80, 80, %.2f);", alpha),
+            np.char.mod("background-color: rgba(80, 200, 120, %.2f);", alpha),
+        ],
+        default="",
+    )
+    delta_labels = np.char.rjust(np.where(delta != 0, np.char.mod("%+.4fs", delta), ""), 10)
+    rel_labels = np.char.rjust(
+        np.where(np.isfinite(rel) & (delta != 0), np.char.mod("%+.0f%%", np.nan_to_num(rel) * 100), ""),
+        6,
+    )
+    labels = _join_labels(np.char.mod("%4d", lines), delta_labels, rel_labels)
 
+    return _join_heatmap_rows(lines, styles, labels, df_code["Code"])
 
-def _render_heatmap(df_code: pd.DataFrame) -> None:
+
+@timed("ui.build_stats_code_df")
+def _build_stats_code_df(
+    func_lines: list[tuple[int, str]],
+    df_one_func: pd.DataFrame,
+) -> pd.DataFrame:
+    """Собирает DataFrame строк функции со статистикой по прогонам.
+
+    Args:
+        func_lines: список (номер_строки, текст) функции
+        df_one_func: строки из line_stats только для этой функции
+
+    Returns:
+        DataFrame с колонками: Line, Mean (s), CI (s), Rel CI, Status, Code
+    """
+    line_numbers = np.fromiter((ln for ln, _ in func_lines), dtype=np.int64, count=len(func_lines))
+
+    prof = (
+        df_one_func.drop_duplicates("lineno")
+        .set_index("lineno")[["time_mean_s", "time_ci_s", "rel_ci", "status"]]
+        .reindex(line_numbers)
+    )
+
+    return pd.DataFrame(
+        {
+            "Line": line_numbers,
+            "Mean (s)": prof["time_mean_s"].fillna(0.0).to_numpy(),
+            "CI (s)": prof["time_ci_s"].fillna(0.0).to_numpy(),
+            "Rel CI": prof["rel_ci"].to_numpy(),
+            "Status": prof["status"].fillna("").to_numpy(dtype=object),
+            "Code": [text for _, text in func_lines],
+        }
+    )
+
+
+@timed("ui.stats_heatmap_html")
+def _stats_heatmap_html(df_code: pd.DataFrame) -> str:
+    """Собирает HTML тепловой карты средних по прогонам.
+
+    Стабильные строки окрашиваются в красный пропорционально среднему
+    времени (стабильно горячие — ярче и с меткой ▲), шумные — в серый
+    с меткой ~: их стоимость в пределах разброса между прогонами.
+
+    Args:
+        df_code: DataFrame из _build_stats_code_df
+
+    Returns:
+        HTML-строка для st.markdown.
+    """
+    if df_code.empty:
+        return ""
+
+    lines = df_code["Line"].to_numpy()
+    mean = df_code["Mean (s)"].to_numpy()
+    rel_ci = df_code["Rel CI"].to_numpy()
+    status = df_code["Status"].to_numpy(dtype=str)
+
+    max_mean = float(mean.max())
+    alpha = 0.1 + 0.5 * mean / max_mean if max_mean > 0 else np.zeros(len(mean))
+    styles = np.select(
+        [status == "noisy", status == "stable_hot", mean > 0],
+        [
+            "background-color: rgba(150, 150, 150, 0.25);",
+            np.char.mod("background-color: rgba(255, 80, 80, %.2f);", np.minimum(alpha + 0.2, 0.8)),
+            np.char.mod("background-color: rgba(255, 80, 80, %.2f);", alpha),
+        ],
+        default="",
+    )
+    mean_labels = np.char.rjust(np.where(mean > 0, np.char.mod("%.4fs", mean), ""), 10)
+    ci_labels = np.char.rjust(
+        np.where(np.isfinite(rel_ci), np.char.mod("±%.0f%%", np.nan_to_num(rel_ci) * 100), ""),
+        6,
+    )
+    markers = np.select([status == "noisy", status == "stable_hot"], ["~", "▲"], default=" ")
+    labels = _join_labels(np.char.mod("%4d", lines), mean_labels, ci_labels, markers)
+
+    return _join_heatmap_rows(lines, styles, labels, df_code["Code"])
+
+
+def _render_heatmap(df_code: pd.DataFrame, key: str) -> None:
     """Рендерит HTML-тепловую карту строк кода.
 
     Строки окрашиваются в красный пропорционально времени исполнения.
     Рядом с каждой строкой показывается время и количество хитов.
+    Для больших функций отправляется только окно строк и самые
+    горячие строки; окно можно сдвигать и расширять.
 
     Args:
         df_code: DataFrame из _build_code_df
+        key: уникальный префикс ключей виджетов для этой функции
     """
-    max_time = df_code["Time (s)"].max()
-
-    highlighted = ""
-    for _, row in df_code.iterrows():
-        color_style = ""
-        if row["Time (s)"] > 0 and max_time > 0:
-            hue = row["Time (s)"] / max_time
-            red = int(255 * hue)
-            color_style = f"background-color: rgba({red}, 80, 80, 0.35);"
-
-        time_label = f"{row['Time (s)']:.4f}s" if row["Time (s)"] > 0 else " " * 10
-        hits_label = f"×{row['Hits']}" if row["Hits"] > 0 else "   "
-
-        highlighted += (
-            f"<div style='{color_style} font-family: monospace; padding: 1px 6px; white-space: pre;'>"
-            f"<span style='color: #888; user-select: none;'>"
-            f"{row['Line']:4d}  {time_label:>10}  {hits_label:>6}  "
-            f"</span>"
-            f"{row['Code']}"
-            f"</div>"
+    if len(df_code) <= HEATMAP_FULL_LIMIT:
+        st.markdown(_heatmap_html(df_code), unsafe_allow_html=True)
+        return
+
+    size_key = f"{key}_heatmap_size"
+    size = st.session_state.get(size_key, HEATMAP_WINDOW)
+
+    cols = st.columns([2, 1, 1])
+    with cols[0]:
+        first_line = st.number_input(
+            "Начало окна (строка)",
+            min_value=int(df_code["Line"].iloc[0]),
+            max_value=int(df_code["Line"].iloc[-1]),
+            step=HEATMAP_WINDOW,
+            key=f"{key}_heatmap_first",
         )
+    with cols[1]:
+        if st.button(f"Развернуть ещё на {HEATMAP_WINDOW}", key=f"{key}_heatmap_more"):
+            size += HEATMAP_WINDOW
+            st.session_state[size_key] = size
+    with cols[2]:
+        show_all = st.toggle("Вся функция", key=f"{key}_heatmap_all")
 
-    st.markdown(highlighted, unsafe_allow_html=True)
+    if show_all:
+        st.markdown(_heatmap_html(df_code), unsafe_allow_html=True)
+        return
+
+    first = int(np.searchsorted(df_code["Line"].to_numpy(), first_line))
+    visible = _heatmap_window(df_code, first, size, HEATMAP_HOT_LINES)
+
+    st.caption(
+        f"Показано {len(visible)} из {len(df_code)} строк: окно {size} строк "
+        f"и {HEATMAP_HOT_LINES} самых горячих."
+    )
+    st.markdown(
+        _heatmap_html(visible, max_time=float(df_code[_heat_column(df_code)].max())),
+        unsafe_allow_html=True,
+    )
 
 
-def _render_line_chart(df_code: pd.DataFrame) -> None:
-    """Рендерит бар-чарт нагрузки по строкам функции.
+def _line_chart_figure(df_code: pd.DataFrame | None) -> Any:
+    """Строит бар-чарт нагрузки по строкам функции.
 
     Args:
         df_code: DataFrame из _build_code_df
+
+    Returns:
+        Plotly-фигура или None, если у функции нет строк со временем.
     """
-    df_nonzero = df_code[df_code["Time (s)"] > 0]
+    if df_code is None:
+        return None
+
+    column = _heat_column(df_code)
+    df_nonzero = df_code[df_code[column] > 0]
 
     if df_nonzero.empty:
-        return
+        return None
 
-    fig = px.bar(
-        df_nonzero,
-        x="Line",
-        y="Time (s)",
-        hover_data=["Hits", "Code"],
-        title="Нагрузка по строкам",
-        color="Time (s)",
-        color_continuous_scale="Reds",
-    )
-    fig.update_layout(showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    with stage("ui.plotly_figure"):
+        fig = px.bar(
+            df_nonzero,
+            x="Line",
+            y=column,
+            hover_data=["Hits", "Code"],
+            title="Нагрузка по строкам",
+            color=column,
+            color_continuous_scale="Reds",
+        )
+        fig.update_layout(showlegend=False)
+    return fig